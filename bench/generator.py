@@ -0,0 +1,95 @@
+import argparse
+import random
+from datetime import datetime, timedelta, timezone
+from typing import List, Tuple
+
+HEADER = "Date                  Transaction     Asset Group    Asset Code      Asset Type      Volume  " \
+         "Taxable Unit Price   Original Unit Price\n"
+
+# Trades stay within the tax years config.TAX_RATES knows, sells moved 30 days later included
+START_AT = datetime(2018, 4, 6, tzinfo=timezone.utc)
+SPAN = datetime(2025, 3, 1, tzinfo=timezone.utc) - START_AT
+
+
+# Synthetic portfolio in the transactions.tsv layout, the same seed always gives the same file
+# - buy_ratio: share of trades that are buys, the first trade of every asset is always one
+# - same_day_ratio: share of sells moved onto the day of an earlier buy of the asset
+# - thirty_day_ratio: share of sells moved 1 to 30 days after an earlier buy of the asset
+# Other trades are spread evenly from START_AT over SPAN. Once an asset trades more often than every few weeks,
+# every sell falls within 30 days of a buy anyway and Section 104 disposals become rare
+class PortfolioGenerator(object):
+
+    def __init__(self, seed: int = 0, assets: int = 10, buy_ratio: float = 0.6, same_day_ratio: float = 0.1,
+                 thirty_day_ratio: float = 0.1):
+        if assets <= 0:
+            raise ValueError('At least one asset is required')
+
+        if not 0 < buy_ratio <= 1:
+            raise ValueError('Buy ratio has to be above 0 and at most 1')
+
+        if same_day_ratio < 0 or thirty_day_ratio < 0 or same_day_ratio + thirty_day_ratio > 1:
+            raise ValueError('Cluster ratios have to be positive and add up to at most 1')
+
+        self.seed = seed
+        self.assets = assets
+        self.buy_ratio = buy_ratio
+        self.same_day_ratio = same_day_ratio
+        self.thirty_day_ratio = thirty_day_ratio
+
+    def asset(self, idx: int) -> Tuple[str, str, str]:
+        return f"Bank{idx % 3 + 1}", f"SYM{idx}", 'CRYPTO' if idx % 4 == 3 else 'STOCK'
+
+    def rows(self, trades: int) -> List[Tuple[datetime, str, int, str, str]]:
+        rnd = random.Random(self.seed)
+        step = SPAN / max(1, trades)
+        last_buy_at: List[datetime] = [START_AT] * self.assets
+
+        rows = list()
+        for idx in range(trades):
+            asset_idx = idx % self.assets
+            date = START_AT + step * idx + timedelta(seconds=rnd.randint(0, 59))
+
+            if idx < self.assets or rnd.random() < self.buy_ratio:
+                volume = f"{rnd.randint(100, 100000) / 100:,.2f}"
+                last_buy_at[asset_idx] = date
+                rows.append((date, 'BUY', asset_idx, volume, f"{rnd.randint(100, 500000) / 100:,.2f}"))
+                continue
+
+            cluster = rnd.random()
+            if cluster < self.same_day_ratio:
+                date = last_buy_at[asset_idx] + timedelta(minutes=rnd.randint(1, 59))
+            elif cluster < self.same_day_ratio + self.thirty_day_ratio:
+                date = last_buy_at[asset_idx] + timedelta(days=rnd.randint(1, 30), minutes=rnd.randint(1, 59))
+
+            # Sells stay small next to buys, so pools rarely run empty
+            volume = f"{rnd.randint(1, 10000) / 100 * self.buy_ratio:,.2f}"
+            rows.append((date, 'SELL', asset_idx, volume, f"{rnd.randint(100, 500000) / 100:,.2f}"))
+
+        return rows
+
+    def write(self, filename: str, trades: int):
+        with open(filename, 'w') as fp:
+            fp.write(HEADER)
+            for date, kind, asset_idx, volume, price in self.rows(trades):
+                group, symbol, type = self.asset(asset_idx)
+                fp.write(f"{date.strftime('%Y-%m-%dT%H:%M:%SZ')}  {kind}  {group}  {symbol}  {type}  "
+                         f"{volume}  {price}  {price}\n")
+
+
+def main():
+    arguments = argparse.ArgumentParser(description="Writes a synthetic transactions.tsv")
+    arguments.add_argument("filename")
+    arguments.add_argument("--trades", type=int, default=10000)
+    arguments.add_argument("--assets", type=int, default=10)
+    arguments.add_argument("--seed", type=int, default=0)
+    arguments.add_argument("--buy-ratio", type=float, default=0.6)
+    arguments.add_argument("--same-day-ratio", type=float, default=0.1)
+    arguments.add_argument("--thirty-day-ratio", type=float, default=0.1)
+    args = arguments.parse_args()
+
+    PortfolioGenerator(args.seed, args.assets, args.buy_ratio, args.same_day_ratio, args.thirty_day_ratio) \
+        .write(args.filename, args.trades)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from config import DATE_TIME_FORMAT
+from src.business.parser import iter_rows
+from src.model.transaction import parse_date_time
+
+HEADER = "Date                  Transaction     Asset Group    Asset Code      Asset Type      Volume  " \
+         "Taxable Unit Price   Original Unit Price\n"
+
+
+def write_rows(filename, rows: int, seed: int):
+    rnd = random.Random(seed)
+    date = datetime(2015, 1, 1, tzinfo=timezone.utc)
+
+    with open(filename, 'w') as fp:
+        fp.write(HEADER)
+        for _ in range(rows):
+            date += timedelta(seconds=rnd.randint(0, 600))
+            fp.write(f"{date.strftime('%Y-%m-%dT%H:%M:%SZ')}  {rnd.choice(['BUY', 'SELL'])}  Bank1  AMZN  STOCK  "
+                     f"{rnd.randint(1, 1000)}  {rnd.randint(100, 200000) / 100:,.2f}  1.00\n")
+
+
+def measure(name, values, parse):
+    started_at = time.perf_counter()
+    for value in values:
+        parse(value)
+    elapsed = time.perf_counter() - started_at
+
+    print(f"{name:<20} {len(values) / elapsed:>12,.0f} rows/sec")
+
+
+def main():
+    arguments = argparse.ArgumentParser(description="Timestamp parsing throughput on a synthetic transactions file")
+    arguments.add_argument("--rows", type=int, default=1_000_000)
+    arguments.add_argument("--seed", type=int, default=0)
+    args = arguments.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "transactions.tsv")
+        write_rows(filename, args.rows, args.seed)
+        values = [row[0] for _, _, row in iter_rows(filename)]
+
+    measure("strptime", values, lambda x: datetime.strptime(x, DATE_TIME_FORMAT))
+    measure("parse_date_time", values, parse_date_time)
+
+
+if __name__ == '__main__':
+    main()
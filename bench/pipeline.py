@@ -0,0 +1,123 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from decimal import Decimal
+from typing import Callable, Dict, List, Tuple
+
+from bench.generator import PortfolioGenerator
+from src.business.html_formatter import HtmlFormatter
+from src.business.parser import parse
+from src.business.processor import TransactionProcessor
+
+DEFAULT_SCALES = [1000, 10000, 100000, 1000000]
+
+
+# Runs stage and returns its result, seconds taken and peak bytes allocated, peak is None when not traced
+def measure(stage: Callable[[], object], trace_memory: bool) -> Tuple[object, float, object]:
+    if trace_memory:
+        tracemalloc.start()
+
+    started_at = time.perf_counter()
+    result = stage()
+    elapsed = time.perf_counter() - started_at
+
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return result, elapsed, peak
+
+
+def max_rss_kb() -> int:
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return max_rss // 1024 if sys.platform == 'darwin' else max_rss
+
+
+def run(generator: PortfolioGenerator, trades: int, processor: TransactionProcessor, formatter: HtmlFormatter,
+        trace_memory: bool) -> Dict[str, object]:
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'transactions.tsv')
+        generator.write(filename, trades)
+
+        transactions, parse_sec, parse_peak = measure(lambda: parse(filename), trace_memory)
+
+    parse_rss = max_rss_kb()
+    processed, process_sec, process_peak = measure(lambda: processor.process(transactions), trace_memory)
+    process_rss = max_rss_kb()
+
+    # Prices are fixed, the benchmark never goes to the network
+    prices = {x.asset: Decimal('100.00') for x in processed}
+    html, render_sec, render_peak = measure(lambda: formatter.render(processed, prices), trace_memory)
+    render_rss = max_rss_kb()
+
+    return {
+        'trades': trades,
+        'assets': len(processed),
+        'hold_pools': sum(len(x.hold_pools) for x in processed),
+        'taxable_records': sum(len(x.taxable_records) for x in processed),
+        'html_bytes': len(html),
+        'seconds': {'parse': parse_sec, 'process': process_sec, 'render': render_sec},
+        'max_rss_kb': {'parse': parse_rss, 'process': process_rss, 'render': render_rss},
+        'traced_peak_bytes': {'parse': parse_peak, 'process': process_peak, 'render': render_peak},
+    }
+
+
+def main():
+    arguments = argparse.ArgumentParser(description="Times parse, process and render on synthetic portfolios, "
+                                                    "results are written as JSON")
+    arguments.add_argument("--scales", type=int, nargs='+', default=DEFAULT_SCALES, help="trade counts to run")
+    arguments.add_argument("--assets", type=int, default=10)
+    arguments.add_argument("--seed", type=int, default=0)
+    arguments.add_argument("--buy-ratio", type=float, default=0.6)
+    arguments.add_argument("--same-day-ratio", type=float, default=0.1)
+    arguments.add_argument("--thirty-day-ratio", type=float, default=0.1)
+    arguments.add_argument("--workers", type=int, default=1, help="processes for TransactionProcessor, 0 for all CPUs")
+    arguments.add_argument("--columnar-history", action='store_true')
+    arguments.add_argument("--trace-memory", action='store_true',
+                           help="also report tracemalloc peaks, stages run several times slower")
+    arguments.add_argument("--output", help="file to write results to instead of stdout")
+    args = arguments.parse_args()
+
+    generator = PortfolioGenerator(args.seed, args.assets, args.buy_ratio, args.same_day_ratio, args.thirty_day_ratio)
+    processor = TransactionProcessor(workers=args.workers or None, columnar_history=args.columnar_history)
+    formatter = HtmlFormatter()
+
+    results: List[Dict[str, object]] = list()
+    for trades in args.scales:
+        results.append(run(generator, trades, processor, formatter, args.trace_memory))
+        print(f"{trades:>10,} trades {results[-1]['seconds']}", file=sys.stderr)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {
+            'seed': args.seed,
+            'assets': args.assets,
+            'buy_ratio': args.buy_ratio,
+            'same_day_ratio': args.same_day_ratio,
+            'thirty_day_ratio': args.thirty_day_ratio,
+            'workers': args.workers,
+            'columnar_history': args.columnar_history,
+        },
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(report, fp, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
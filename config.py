@@ -1,3 +1,4 @@
+from datetime import timedelta
 from typing import Dict
 
 from src.model.tax import TaxRate, TaxPeriod
@@ -16,3 +17,41 @@ TAX_RATES: Dict[str, TaxRate] = {
 }
 
 TAX_PERIOD = TaxPeriod("UK", 4, 6, 4, 5)
+
+# Fetched prices are kept on disk, for how long depends on the asset type
+PRICE_CACHE_DIRECTORY = '.price_cache'
+PRICE_CACHE_TTL: Dict[str, timedelta] = {
+    'STOCK': timedelta(hours=12),
+    'CRYPTO': timedelta(minutes=15),
+    'FX': timedelta(hours=1),
+}
+
+# Local "symbol,date,price" file with GBP closes, used before any other price source when it exists
+PRICE_FILE = 'prices.csv'
+# Alpha Vantage is only asked for prices that neither the price file nor the static table know
+FETCH_PRICES_ONLINE = False
+
+# Per asset matching state kept between runs of main.py --incremental
+CHECKPOINT_DIRECTORY = '.checkpoints'
+
+# Results of assets whose trades did not change are reused from disk, least recently used are evicted first
+RESULT_CACHE_DIRECTORY = '.result_cache'
+RESULT_CACHE_MAX_SIZE = 64 * 1024 * 1024
+RESULT_CACHE_MAX_AGE = timedelta(days=30)
+
+# Snapshots per side file when hold history is written next to the report instead of into it
+HOLD_HISTORY_PAGE_SIZE = 500
+
+# Directory main.py --export writes machine readable results to
+EXPORT_DIRECTORY = 'export'
+
+# cProfile dump of main.py --profile
+PROFILE_FILE = 'profile.pstats'
+
+# Portfolio main.py reads when no input is given, and names of what it writes for every portfolio
+TRANSACTIONS_FILE = 'transactions.tsv'
+REPORT_FILE = 'tax_return.html'
+REPORT_FILES_DIRECTORY = 'tax_return_files'
+# Worker processes portfolios are calculated in. Reports are written on threads of the main process, so they share
+# one price cache and one request budget
+BATCH_WORKERS = 4
@@ -1,17 +1,88 @@
+import argparse
+import cProfile
+import os
+import sys
+
+from config import CHECKPOINT_DIRECTORY, RESULT_CACHE_DIRECTORY, EXPORT_DIRECTORY, PROFILE_FILE, TRANSACTIONS_FILE, \
+    REPORT_FILE, REPORT_FILES_DIRECTORY, BATCH_WORKERS
+from src.business.batch import BatchProcessor, find_portfolios
+from src.business.exporter import EXPORTERS
 from src.business.html_formatter import HtmlFormatter
-from src.business.parser import parse
+from src.business.paged_html_formatter import PagedHtmlFormatter
 from src.business.processor import TransactionProcessor
+from src.business.profiler import PROFILER
+from src.business.result_cache import ResultCache
+
+
+# Worker processes import this module again when they are spawned, so the run only starts when it is executed
+def main():
+    argument_parser = argparse.ArgumentParser()
+    argument_parser.add_argument('inputs', nargs='*', default=[TRANSACTIONS_FILE],
+                                 help=f'transactions files or directories of *.tsv files, {TRANSACTIONS_FILE} by '
+                                      f'default')
+    argument_parser.add_argument('--output-directory', default='.',
+                                 help=f'where {REPORT_FILE} is written, with several portfolios into a sub directory '
+                                      f'named after each transactions file')
+    argument_parser.add_argument('--workers', type=int, default=BATCH_WORKERS,
+                                 help='number of portfolios calculated at once, each in its own process, 1 with '
+                                      '--profile')
+    argument_parser.add_argument('--by-asset', action='store_true',
+                                 help='split transactions files by asset on disk and calculate one asset at a time, '
+                                      'memory is then bounded by the largest asset instead of the whole file')
+    argument_parser.add_argument('--incremental', action='store_true',
+                                 help='re-calculate only assets with trades added since the previous incremental run')
+    argument_parser.add_argument('--no-cache', action='store_true',
+                                 help='match all assets again instead of reusing results of unchanged ones')
+    argument_parser.add_argument('--paged-history', action='store_true',
+                                 help=f'write hold history to pages in {REPORT_FILES_DIRECTORY}, loaded when opened in '
+                                      f'the report')
+    argument_parser.add_argument('--export', action='append', default=[], choices=sorted(EXPORTERS.keys()),
+                                 help=f'also write taxable hold pools, hold pools, taxable records and matched '
+                                      f'disposals to {EXPORT_DIRECTORY}')
+    argument_parser.add_argument('--profile', action='store_true',
+                                 help=f'write a cProfile dump to {PROFILE_FILE} and print time spent per stage and '
+                                      f'asset, portfolios are then calculated one at a time in this process')
+    arguments = argument_parser.parse_args()
+
+    profile = None
+    if arguments.profile:
+        PROFILER.enable()
+        profile = cProfile.Profile()
+        profile.enable()
+
+    try:
+        portfolios = find_portfolios(arguments.inputs, arguments.output_directory, CHECKPOINT_DIRECTORY)
+    except ValueError as ex:
+        argument_parser.error(str(ex))
+
+    result_cache = None if arguments.no_cache else ResultCache(RESULT_CACHE_DIRECTORY)
+    processor = TransactionProcessor(result_cache=result_cache)
+
+    def create_formatter(portfolio):
+        if arguments.paged_history:
+            return PagedHtmlFormatter(os.path.join(portfolio.directory, REPORT_FILES_DIRECTORY))
+
+        return HtmlFormatter()
+
+    batch_processor = BatchProcessor(processor, create_formatter, arguments.export, arguments.incremental,
+                                     1 if arguments.profile else arguments.workers, by_asset=arguments.by_asset)
+    results = batch_processor.run(portfolios)
+
+    if profile is not None:
+        profile.disable()
+        profile.dump_stats(PROFILE_FILE)
+        print(PROFILER.summary())
+        print(f"cProfile dump written to {PROFILE_FILE}, e.g. python3 -m pstats {PROFILE_FILE}")
+
+    failed = [x for x in results if not x.is_success()]
+    if len(results) > 1:
+        print(f"{len(results) - len(failed)} of {len(results)} portfolios calculated")
 
-processor = TransactionProcessor()
-formatter = HtmlFormatter()
+    for result in failed:
+        print(f"{result.portfolio.name} failed: {result.error}")
 
-print("Reading transactions file")
-transactions = parse('transactions.tsv')
+    sys.exit(1 if len(failed) > 0 else 0)
 
-print("Calculating tax")
-processed = processor.process(transactions)
 
-print("Rendering results")
-html = formatter.render(processed)
-with open('tax_return.html', 'w') as fp:
-    fp.write(html)
+if __name__ == '__main__':
+    main()
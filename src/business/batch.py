@@ -0,0 +1,173 @@
+import os
+import traceback
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from config import REPORT_FILE, EXPORT_DIRECTORY, BATCH_WORKERS
+from src.business.checkpoint import CheckpointStore
+from src.business.exporter import export
+from src.business.html_formatter import HtmlFormatter
+from src.business.parser import parse, iter_parse_by_asset
+from src.business.processor import TransactionProcessor
+from src.business.profiler import PROFILER
+from src.model.hold_pool import TaxableHoldPool
+
+
+class Portfolio(object):
+    __slots__ = ('name', 'source', 'directory', 'checkpoint_directory')
+
+    def __init__(self, name: str, source: str, directory: str, checkpoint_directory: str):
+        self.name = name
+        # Transactions file
+        self.source = source
+        # Report and exports of the portfolio are written here
+        self.directory = directory
+        self.checkpoint_directory = checkpoint_directory
+
+    def __repr__(self) -> str:
+        return f"Portfolio(name={self.name},source={self.source},directory={self.directory})"
+
+
+class PortfolioResult(object):
+    __slots__ = ('portfolio', 'filenames', 'error')
+
+    def __init__(self, portfolio: Portfolio, filenames: List[str], error: Optional[str] = None):
+        self.portfolio = portfolio
+        self.filenames = filenames
+        self.error = error
+
+    def is_success(self) -> bool:
+        return self.error is None
+
+
+# Transactions files given directly or found as *.tsv in the given directories
+# A single portfolio is written straight to the output directory, several go to a sub directory named after each file
+def find_portfolios(paths: List[str], output_directory: str, checkpoint_directory: str) -> List[Portfolio]:
+    sources = list()
+    for path in paths:
+        if os.path.isdir(path):
+            sources.extend(sorted(os.path.join(path, x) for x in os.listdir(path) if x.endswith('.tsv')))
+        else:
+            sources.append(path)
+
+    if len(sources) <= 0:
+        raise ValueError(f"No transactions files found in: {', '.join(paths)}")
+
+    names = [os.path.splitext(os.path.basename(x))[0] for x in sources]
+    if len(sources) == 1:
+        return [Portfolio(names[0], sources[0], output_directory, checkpoint_directory)]
+
+    duplicates = sorted(set(x for x in names if names.count(x) > 1))
+    if len(duplicates) > 0:
+        raise ValueError(f"Transactions files have to be named differently, found more than one of: "
+                         f"{', '.join(duplicates)}")
+
+    return [Portfolio(name, source, os.path.join(output_directory, name), os.path.join(checkpoint_directory, name))
+            for name, source in zip(names, sources)]
+
+
+# Reads and matches the trades of one portfolio, picklable so it also runs in a worker process
+class PortfolioCalculator(object):
+
+    def __init__(self, processor: TransactionProcessor, incremental: bool = False, by_asset: bool = False):
+        self.processor = processor
+        self.incremental = incremental
+        # Transactions files are split by asset on disk and assets are read and matched one at a time, so memory is
+        # bounded by the largest asset rather than the whole file
+        self.by_asset = by_asset
+
+    def calculate(self, portfolio: Portfolio) -> List[TaxableHoldPool]:
+        if self.by_asset:
+            return self.__calculate_by_asset(portfolio)
+
+        with PROFILER.timer('read'):
+            transactions = parse(portfolio.source)
+
+        with PROFILER.timer('calculate'):
+            if self.incremental:
+                checkpoint_store = CheckpointStore(portfolio.checkpoint_directory)
+                processed, checkpoints = self.processor.process_incremental(transactions, checkpoint_store.load())
+                checkpoint_store.save(checkpoints)
+                return processed
+
+            return self.processor.process(transactions)
+
+    # Reading and matching interleave, they are timed together
+    def __calculate_by_asset(self, portfolio: Portfolio) -> List[TaxableHoldPool]:
+        with PROFILER.timer('read and calculate'):
+            asset_transactions = iter_parse_by_asset(portfolio.source)
+            if self.incremental:
+                checkpoint_store = CheckpointStore(portfolio.checkpoint_directory)
+                processed, checkpoints = self.processor.process_incremental_by_asset(asset_transactions,
+                                                                                     checkpoint_store.load())
+                checkpoint_store.save(checkpoints)
+                return processed
+
+            return self.processor.process_by_asset(asset_transactions)
+
+
+# Runs every portfolio, a failing one is reported in its result and the others still run
+# Matching is CPU bound, so with more than one worker portfolios are calculated in worker processes. Reports are
+# written in this process on threads, so price lookups of all reports go through the one price cache, fetched series
+# and rate limiter of the shared fetcher
+class BatchProcessor(object):
+
+    def __init__(self, processor: TransactionProcessor, formatter_factory: Callable[[Portfolio], HtmlFormatter],
+                 export_formats: Optional[List[str]] = None, incremental: bool = False,
+                 workers: int = BATCH_WORKERS, log: Callable[[str], None] = print, by_asset: bool = False):
+        self.calculator = PortfolioCalculator(processor, incremental, by_asset)
+        # Formatters keep state while rendering, every portfolio gets its own
+        self.formatter_factory = formatter_factory
+        self.export_formats = list() if export_formats is None else export_formats
+        self.workers = workers
+        self.log = log
+
+    def write_portfolio(self, portfolio: Portfolio, processed: List[TaxableHoldPool]) -> List[str]:
+        self.log(f"{portfolio.name}: Rendering results")
+        os.makedirs(portfolio.directory, exist_ok=True)
+        report_filename = os.path.join(portfolio.directory, REPORT_FILE)
+        with PROFILER.timer('render'), open(report_filename, 'w') as fp:
+            self.formatter_factory(portfolio).write(fp, processed)
+
+        filenames = [report_filename]
+        for export_format in self.export_formats:
+            self.log(f"{portfolio.name}: Exporting results as {export_format}")
+            with PROFILER.timer(f"export {export_format}"):
+                filenames.extend(export(os.path.join(portfolio.directory, EXPORT_DIRECTORY), export_format,
+                                        processed))
+
+        return filenames
+
+    def process_portfolio(self, portfolio: Portfolio) -> List[str]:
+        self.log(f"{portfolio.name}: Calculating tax from {portfolio.source}")
+        return self.write_portfolio(portfolio, self.calculator.calculate(portfolio))
+
+    def __result(self, portfolio: Portfolio, process: Callable[[], List[str]]) -> PortfolioResult:
+        try:
+            return PortfolioResult(portfolio, process())
+        except Exception as ex:
+            self.log(f"{portfolio.name}: Failed\n{traceback.format_exc()}")
+            return PortfolioResult(portfolio, list(), f"{type(ex).__name__}: {ex}")
+
+    def run_portfolio(self, portfolio: Portfolio) -> PortfolioResult:
+        return self.__result(portfolio, lambda: self.process_portfolio(portfolio))
+
+    # Waits for the calculation of the portfolio in a worker process and writes its report
+    def __write_calculated(self, portfolio: Portfolio, calculation: Future) -> PortfolioResult:
+        return self.__result(portfolio, lambda: self.write_portfolio(portfolio, calculation.result()))
+
+    # Results in the order of the portfolios
+    def run(self, portfolios: List[Portfolio]) -> List[PortfolioResult]:
+        if self.workers <= 1 or len(portfolios) <= 1:
+            return list(map(self.run_portfolio, portfolios))
+
+        workers = min(self.workers, len(portfolios))
+        with ProcessPoolExecutor(max_workers=workers) as processes, \
+                ThreadPoolExecutor(max_workers=workers) as threads:
+            calculations = list()
+            for portfolio in portfolios:
+                self.log(f"{portfolio.name}: Calculating tax from {portfolio.source}")
+                calculations.append(processes.submit(self.calculator.calculate, portfolio))
+
+            # Reports are written as soon as their portfolio is calculated
+            return list(threads.map(self.__write_calculated, portfolios, calculations))
@@ -0,0 +1,117 @@
+import hashlib
+import os
+import pickle
+from collections import Counter
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.model.hold_pool import TaxableHoldPool
+from src.model.tax import MatchRecord
+from src.model.transaction import Transaction, Asset
+
+
+def transaction_key(transaction: Transaction) -> str:
+    # Stable across processes, unlike hash() which is salted for strings
+    # Holds every field that ends up in a result, pools copy the asset of the trade with its group and match records
+    # keep the id of the trade
+    asset = transaction.asset
+    return f"{transaction.date.isoformat()}|{transaction.type}|{asset.group}|{asset.symbol}|{asset.type}|" \
+           f"{transaction.volume}|{transaction.taxable_price}|{transaction.original_price}|" \
+           f"{transaction.transaction_id}"
+
+
+def transactions_digest(transactions: Iterable[Transaction]) -> str:
+    digest = hashlib.sha256()
+    for key in sorted(transaction_key(x) for x in transactions):
+        digest.update(key.encode())
+        digest.update(b"\n")
+
+    return digest.hexdigest()
+
+
+class AssetCheckpoint(object):
+
+    # State of one asset after a run, enough to continue matching once trades are appended.
+    # - result: output of the run, its first settled_pools hold pools and settled_records records can no longer
+    #   change, whatever is appended after last_date. Neither can its first settled_same_day same day pairings and
+    #   first settled_matches 30 days pairings, the pairings of the two rules follow each other like in a full run
+    # - pending: trades dated from settled_at up to last_date, already matched by same day rule and by the
+    #   disposals whose 30 days window closed. Trades of last_date are left out, same day rule still applies to them
+    # - known_digest, last_moment and last_keys identify trades seen so far, to tell appended trades apart
+    def __init__(self, result: TaxableHoldPool, settled_pools: int, settled_records: int, settled_same_day: int,
+                 settled_matches: int, settled_at: date, last_date: date, pending: List[Transaction],
+                 known_digest: str, last_moment: datetime, last_keys: List[str]):
+        self.result = result
+        self.settled_pools = settled_pools
+        self.settled_records = settled_records
+        self.settled_same_day = settled_same_day
+        self.settled_matches = settled_matches
+        self.settled_at = settled_at
+        self.last_date = last_date
+        self.pending = pending
+        self.known_digest = known_digest
+        self.last_moment = last_moment
+        self.last_keys = last_keys
+
+    # Settled same day and 30 days pairings, new lists that the next run appends to
+    def settled_match_records(self) -> Tuple[List[MatchRecord], List[MatchRecord]]:
+        same_day = [x for x in self.result.match_records if x.rule == 'SAME_DAY']
+        days_30 = [x for x in self.result.match_records if x.rule == '30_DAYS']
+        return same_day[:self.settled_same_day], days_30[:self.settled_matches]
+
+    # Trades of the asset not seen by the checkpoint, None if any seen trade changed or a trade was back-dated
+    def appended(self, transactions: List[Transaction]) -> Optional[List[Transaction]]:
+        before = [x for x in transactions if x.date < self.last_moment]
+        at = [x for x in transactions if x.date == self.last_moment]
+        after = [x for x in transactions if x.date > self.last_moment]
+
+        if transactions_digest(before) != self.known_digest:
+            return None
+
+        unseen = Counter(transaction_key(x) for x in at)
+        unseen.subtract(self.last_keys)
+        if any(x < 0 for x in unseen.values()):
+            return None
+
+        appended = list()
+        for transaction in at:
+            key = transaction_key(transaction)
+            if unseen[key] > 0:
+                unseen[key] -= 1
+                appended.append(transaction)
+
+        appended.extend(after)
+        return appended
+
+
+class CheckpointStore(object):
+
+    FILENAME = 'checkpoints.pickle'
+    # Bumped whenever AssetCheckpoint changes, checkpoints of an other version are dropped and assets run in full
+    VERSION = 2
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.filename = os.path.join(directory, CheckpointStore.FILENAME)
+
+    def load(self) -> Dict[Asset, AssetCheckpoint]:
+        if not os.path.exists(self.filename):
+            return dict()
+
+        with open(self.filename, 'rb') as fp:
+            stored = pickle.load(fp)
+
+        if not isinstance(stored, tuple) or stored[0] != CheckpointStore.VERSION:
+            return dict()
+
+        return stored[1]
+
+    def save(self, checkpoints: Dict[Asset, AssetCheckpoint]):
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Written aside and renamed, an interrupted run leaves the previous checkpoints intact
+        temporary_filename = self.filename + ".tmp"
+        with open(temporary_filename, 'wb') as fp:
+            pickle.dump((CheckpointStore.VERSION, checkpoints), fp, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(temporary_filename, self.filename)
@@ -0,0 +1,129 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Dict, Optional, Tuple
+
+from config import TAX_RATES, TAX_PERIOD
+from src.model.hold_pool import TaxableHoldPool
+from src.model.tax import TaxRate, INCOME_QUANTIZATION, tax_year_key_of
+from src.model.transaction import Asset
+
+
+# Gain, a loss when negative, and the tax it adds to its tax year for every simulated disposal, in scenario order
+class DisposalSimulation(object):
+
+    def __init__(self, gains: List[Decimal], taxes: List[Decimal]):
+        self.gains = gains
+        self.taxes = taxes
+
+    def __len__(self):
+        return len(self.gains)
+
+    def __repr__(self) -> str:
+        return f"DisposalSimulation(size={len(self)},total_tax={sum(self.taxes)})"
+
+
+# What-if disposals out of the latest Section 104 hold pools
+# Every scenario is a disposal on its own, weighed against the net gain already realised in its tax year and the
+# allowance of that year. Pools and realised gains are read once, a scenario is then plain arithmetic on them
+# Like HoldPool.estimate, same day and 30 days matching against trades after the disposal is not foreseen
+class DisposalSimulator(object):
+
+    def __init__(self, taxable_hold_pools: List[TaxableHoldPool]):
+        # Date, volume and cost per unit of the latest hold pool of every asset
+        self.__pools: Dict[Asset, Tuple[datetime, Decimal, Decimal]] = dict()
+        # Net gain, a loss when negative, realised in every tax year by its key
+        self.__realised: Dict[int, Decimal] = dict()
+        # Rate, realised net gain and tax on it of every tax year scenarios fall in, filled when first needed
+        self.__tax_years: Dict[int, Tuple[TaxRate, Decimal, Decimal]] = dict()
+
+        for taxable_hold_pool in taxable_hold_pools:
+            if len(taxable_hold_pool.hold_pools) > 0:
+                hold_pool = taxable_hold_pool.latest_hold_pool()
+                cost_per_unit = hold_pool.cost / hold_pool.volume if hold_pool.volume > 0 else Decimal(0)
+                self.__pools[taxable_hold_pool.asset] = (hold_pool.date, hold_pool.volume, cost_per_unit)
+
+            for taxable_record in taxable_hold_pool.taxable_records:
+                amount = taxable_record.amount if taxable_record.is_gain() else -taxable_record.amount
+                key = taxable_record.tax_year_key
+                self.__realised[key] = self.__realised.get(key, Decimal(0)) + amount
+
+    # Tax on a net gain of a tax year, rounded like the tax year summary of the report
+    @staticmethod
+    def __tax(tax_rate: TaxRate, net_gain: Decimal) -> Decimal:
+        income = net_gain.quantize(INCOME_QUANTIZATION.precision, rounding=INCOME_QUANTIZATION.rounding)
+        return Decimal(tax_rate.calculate_tax_to_pay(income))
+
+    # Tax years after the last configured one take its rate, like the estimate of the report
+    def __tax_year(self, key: int) -> Tuple[TaxRate, Decimal, Decimal]:
+        tax_year = self.__tax_years.get(key)
+        if tax_year is None:
+            label = TAX_PERIOD.label(key)
+            tax_rate = TAX_RATES.get(label)
+            if tax_rate is None:
+                latest = max(TAX_RATES.keys())
+                if key <= tax_year_key_of(latest):
+                    raise ValueError(f"No tax rate for tax year: {label}")
+
+                tax_rate = TAX_RATES[latest]
+
+            realised = self.__realised.get(key, Decimal(0))
+            tax_year = self.__tax_years[key] = (tax_rate, realised, self.__tax(tax_rate, realised))
+
+        return tax_year
+
+    # Volume and cost per unit held when disposing at the moment
+    def __pool(self, asset: Asset, moment: datetime) -> Tuple[Decimal, Decimal]:
+        pool = self.__pools.get(asset)
+        if pool is None:
+            raise ValueError(f"No hold pool for asset: {asset}")
+
+        if moment < pool[0]:
+            raise ValueError(f"Disposal is only allowed after or at the latest pool date, got: {moment} for {asset}")
+
+        return pool[1], pool[2]
+
+    # Scenario i disposes volumes[i] of assets[i] at the taxable unit price prices[i] on dates[i], dates are now when
+    # not given
+    def simulate(self, assets: List[Asset], volumes: List[Decimal], prices: List[Decimal],
+                 dates: Optional[List[datetime]] = None) -> DisposalSimulation:
+        if dates is None:
+            dates = [datetime.now().astimezone()] * len(assets)
+
+        if not len(assets) == len(volumes) == len(prices) == len(dates):
+            raise ValueError(f"Scenarios need an asset, volume, price and date each, got: {len(assets)}, "
+                             f"{len(volumes)}, {len(prices)}, {len(dates)}")
+
+        gains: List[Decimal] = list()
+        taxes: List[Decimal] = list()
+        for asset, volume, price, moment, key in zip(assets, volumes, prices, dates, TAX_PERIOD.tax_year_keys(dates)):
+            held_volume, cost_per_unit = self.__pool(asset, moment)
+            if volume > held_volume:
+                raise ValueError(f"Disposal of {volume} is more than the {held_volume} held of {asset}")
+
+            tax_rate, realised, realised_tax = self.__tax_year(key)
+            gain = (price - cost_per_unit) * volume
+            gains.append(gain)
+            taxes.append(self.__tax(tax_rate, realised + gain) - realised_tax)
+
+        return DisposalSimulation(gains, taxes)
+
+    # Most of the held volume that can be disposed at the price with the net gain of the tax year staying within its
+    # allowance, in whole multiples of unit. All of it when disposing at a loss
+    def max_volume(self, asset: Asset, price: Decimal, moment: Optional[datetime] = None,
+                   unit: Decimal = Decimal(1)) -> Decimal:
+        if moment is None:
+            moment = datetime.now().astimezone()
+
+        held_volume, cost_per_unit = self.__pool(asset, moment)
+        tax_rate, realised, _ = self.__tax_year(TAX_PERIOD.tax_year_key(moment))
+
+        gain_per_unit = price - cost_per_unit
+        if gain_per_unit <= 0:
+            return held_volume
+
+        headroom = tax_rate.allowance - realised
+        if headroom <= 0:
+            return Decimal(0)
+
+        # Integer division is exact, a rounded quotient could step over the allowance
+        return min(headroom // (gain_per_unit * unit) * unit, held_volume)
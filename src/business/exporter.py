@@ -0,0 +1,182 @@
+import csv
+import json
+import os
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterator, List, Tuple, TextIO, Dict, Callable
+
+from src.model.hold_pool import TaxableHoldPool
+
+# Column name and kind, kinds are str, int, decimal and datetime
+Fields = List[Tuple[str, str]]
+Row = List[object]
+
+TAXABLE_HOLD_POOL_FIELDS: Fields = [
+    ('group', 'str'), ('symbol', 'str'), ('type', 'str'),
+    ('date', 'datetime'), ('volume', 'decimal'), ('cost', 'decimal'),
+    ('hold_pool_count', 'int'), ('taxable_record_count', 'int'),
+]
+
+HOLD_POOL_FIELDS: Fields = [
+    ('group', 'str'), ('symbol', 'str'), ('type', 'str'),
+    ('pool_id', 'str'), ('pool_index', 'int'),
+    ('date', 'datetime'), ('volume', 'decimal'), ('cost', 'decimal'),
+]
+
+TAXABLE_RECORD_FIELDS: Fields = [
+    ('group', 'str'), ('symbol', 'str'), ('type', 'str'),
+    ('date', 'datetime'), ('tax_year', 'str'), ('record_type', 'str'), ('amount', 'decimal'),
+]
+
+MATCH_RECORD_FIELDS: Fields = [
+    ('group', 'str'), ('symbol', 'str'), ('type', 'str'),
+    ('rule', 'str'), ('buy_date', 'datetime'), ('sell_date', 'datetime'), ('volume', 'decimal'),
+    ('buy_price', 'decimal'), ('sell_price', 'decimal'), ('buy_id', 'int'), ('sell_id', 'int'),
+]
+
+
+# One row per asset with the latest state of its Section 104 hold pool
+def taxable_hold_pool_rows(taxable_hold_pools: List[TaxableHoldPool]) -> Iterator[Row]:
+    for taxable_hold_pool in taxable_hold_pools:
+        asset = taxable_hold_pool.asset
+        hold_pool = taxable_hold_pool.latest_hold_pool()
+        yield [asset.group, asset.symbol, asset.type, hold_pool.date, hold_pool.volume, hold_pool.cost,
+               len(taxable_hold_pool.hold_pools), len(taxable_hold_pool.taxable_records)]
+
+
+def hold_pool_rows(taxable_hold_pools: List[TaxableHoldPool]) -> Iterator[Row]:
+    for taxable_hold_pool in taxable_hold_pools:
+        asset = taxable_hold_pool.asset
+        for hold_pool in taxable_hold_pool.hold_pools:
+            yield [asset.group, asset.symbol, asset.type, str(hold_pool.pool_id), hold_pool.pool_index,
+                   hold_pool.date, hold_pool.volume, hold_pool.cost]
+
+
+def taxable_record_rows(taxable_hold_pools: List[TaxableHoldPool]) -> Iterator[Row]:
+    for taxable_hold_pool in taxable_hold_pools:
+        asset = taxable_hold_pool.asset
+        for taxable_record in taxable_hold_pool.taxable_records:
+            yield [asset.group, asset.symbol, asset.type, taxable_record.date, taxable_record.tax_year,
+                   taxable_record.type, taxable_record.amount]
+
+
+def match_record_rows(taxable_hold_pools: List[TaxableHoldPool]) -> Iterator[Row]:
+    for taxable_hold_pool in taxable_hold_pools:
+        asset = taxable_hold_pool.asset
+        for match_record in taxable_hold_pool.match_records:
+            yield [asset.group, asset.symbol, asset.type, match_record.rule, match_record.buy_date,
+                   match_record.sell_date, match_record.volume, match_record.buy_price, match_record.sell_price,
+                   match_record.buy_id, match_record.sell_id]
+
+
+# Decimals are written as text with every digit they have, a float would round them
+def format_value(value) -> object:
+    if isinstance(value, Decimal):
+        return str(value)
+
+    if isinstance(value, datetime):
+        return value.isoformat()
+
+    return value
+
+
+class CsvExporter(object):
+
+    EXTENSION = 'csv'
+
+    def write(self, filename: str, fields: Fields, rows: Iterator[Row]):
+        with open(filename, 'w', newline='') as fp:
+            self.write_to(fp, fields, rows)
+
+    def write_to(self, fp: TextIO, fields: Fields, rows: Iterator[Row]):
+        writer = csv.writer(fp)
+        writer.writerow([name for name, _ in fields])
+
+        for row in rows:
+            writer.writerow(['' if x is None else format_value(x) for x in row])
+
+
+class NdjsonExporter(object):
+
+    EXTENSION = 'ndjson'
+
+    def write(self, filename: str, fields: Fields, rows: Iterator[Row]):
+        with open(filename, 'w') as fp:
+            self.write_to(fp, fields, rows)
+
+    def write_to(self, fp: TextIO, fields: Fields, rows: Iterator[Row]):
+        names = [name for name, _ in fields]
+
+        for row in rows:
+            fp.write(json.dumps({name: format_value(value) for name, value in zip(names, row)}, separators=(',', ':')))
+            fp.write("\n")
+
+
+class ParquetExporter(object):
+
+    EXTENSION = 'parquet'
+    # Rows kept in memory before they are written out as one row group
+    BATCH_SIZE = 65536
+
+    def __init__(self, batch_size: int = BATCH_SIZE):
+        self.batch_size = batch_size
+
+    def write(self, filename: str, fields: Fields, rows: Iterator[Row]):
+        try:
+            import pyarrow
+            import pyarrow.parquet as parquet
+        except ImportError:
+            raise ValueError(f"Writing {filename} requires pyarrow to be installed")
+
+        # Decimals are kept as text like in the other formats, a fixed scale decimal column would round them
+        kind_to_type = {
+            'str': pyarrow.string(),
+            'int': pyarrow.int64(),
+            'decimal': pyarrow.string(),
+            'datetime': pyarrow.timestamp('us', tz='UTC'),
+        }
+        schema = pyarrow.schema([(name, kind_to_type[kind]) for name, kind in fields])
+        kinds = [kind for _, kind in fields]
+
+        with parquet.ParquetWriter(filename, schema) as writer:
+            columns = [list() for _ in fields]
+            for row in rows:
+                for idx, value in enumerate(row):
+                    columns[idx].append(str(value) if kinds[idx] == 'decimal' and value is not None else value)
+
+                if len(columns[0]) >= self.batch_size:
+                    writer.write_table(pyarrow.Table.from_arrays(columns, schema=schema))
+                    columns = [list() for _ in fields]
+
+            if len(columns[0]) > 0:
+                writer.write_table(pyarrow.Table.from_arrays(columns, schema=schema))
+
+
+EXPORTERS: Dict[str, Callable[[], object]] = {
+    'csv': CsvExporter,
+    'ndjson': NdjsonExporter,
+    'parquet': ParquetExporter,
+}
+
+
+# Writes taxable_hold_pools, hold_pools, taxable_records and match_records files of the given format, returns their
+# names
+def export(directory: str, format: str, taxable_hold_pools: List[TaxableHoldPool]) -> List[str]:
+    if format not in EXPORTERS:
+        raise ValueError(f"Unsupported export format: {format}")
+
+    exporter = EXPORTERS[format]()
+    os.makedirs(directory, exist_ok=True)
+
+    filenames = list()
+    for name, fields, rows in [
+        ('taxable_hold_pools', TAXABLE_HOLD_POOL_FIELDS, taxable_hold_pool_rows(taxable_hold_pools)),
+        ('hold_pools', HOLD_POOL_FIELDS, hold_pool_rows(taxable_hold_pools)),
+        ('taxable_records', TAXABLE_RECORD_FIELDS, taxable_record_rows(taxable_hold_pools)),
+        ('match_records', MATCH_RECORD_FIELDS, match_record_rows(taxable_hold_pools)),
+    ]:
+        filename = os.path.join(directory, f"{name}.{exporter.EXTENSION}")
+        exporter.write(filename, fields, rows)
+        filenames.append(filename)
+
+    return filenames
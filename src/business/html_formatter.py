@@ -1,23 +1,53 @@
+import threading
 from datetime import datetime
 from decimal import Decimal, ROUND_HALF_UP
-from typing import List
+from typing import List, Dict, Optional, Iterator, TextIO
 
-import api_keys
-from config import TAX_RATES
+from config import TAX_RATES, PRICE_CACHE_DIRECTORY, FETCH_PRICES_ONLINE
+from src.business.price_cache import PriceCache
 from src.business.stock_fetcher import StockFetcher
+from src.business.tax_summary import TaxSummary
 from src.model.hold_pool import TaxableHoldPool
-from src.model.tax import TaxableRecord
+from src.model.tax import TaxableRecord, MatchRecord
+from src.model.transaction import Asset
 
 DISPLAY_PRECISION = Decimal('.01')
 DISPLAY_ROUND = ROUND_HALF_UP
 DISPLAY_DATE_FORMAT = '%Y-%m-%d'
 
+default_stock_fetcher: Optional[StockFetcher] = None
+default_stock_fetcher_lock = threading.Lock()
+
+
+# Fetcher shared by all reports of the process, so they share the price cache, the request budget and fetched series
+# Created on the first price lookup, api_keys.py and the price cache are only needed when prices are fetched online
+def get_default_stock_fetcher() -> StockFetcher:
+    global default_stock_fetcher
+
+    with default_stock_fetcher_lock:
+        if default_stock_fetcher is None:
+            api_key, price_cache = None, None
+            if FETCH_PRICES_ONLINE:
+                import api_keys
+                api_key = api_keys.ALPHA_VANTAGE_KEY
+                price_cache = PriceCache(PRICE_CACHE_DIRECTORY)
+            default_stock_fetcher = StockFetcher(api_key, price_cache)
+
+        return default_stock_fetcher
+
+
 class HtmlFormatter(object):
 
-    def __init__(self):
-        self.stock_fetcher = StockFetcher(api_keys.ALPHA_VANTAGE_KEY)
+    def __init__(self, stock_fetcher: Optional[StockFetcher] = None):
+        self.stock_fetcher = stock_fetcher
 
-    def wrap_html(self, body) -> str:
+    def get_stock_fetcher(self) -> StockFetcher:
+        if self.stock_fetcher is None:
+            self.stock_fetcher = get_default_stock_fetcher()
+
+        return self.stock_fetcher
+
+    def html_head(self) -> str:
         return \
 """
 <html>
@@ -41,113 +71,112 @@ class HtmlFormatter(object):
             }
         </style>
     </head>
-    <body>""" + \
-"".join(["\n\t\t" + x for x in body.split("\n")]) + \
+    <body>"""
+
+    def html_tail(self) -> str:
+        return \
 """
     </body>
 </html>
 """
 
+    # Every line of the body goes on its own line, indented under <body>
+    def indent_html(self, line: str) -> str:
+        return "\n\t\t" + line.replace("\n", "\n\t\t")
+
+    def wrap_html(self, body) -> str:
+        return self.html_head() + self.indent_html(body) + self.html_tail()
+
     def render_footer(self):
         return f"<div style=\"margin-top: 50px\"><small><i>Page generated at: {datetime.now()}. All values in GBP.</i></small></div>"
 
     def render_taxable_records(self, taxable_records: List[TaxableRecord]) -> str:
-        buffer = list()
-        buffer.append("<h3>Tax records</h3>")
+        return "\n".join(self.iter_taxable_records(taxable_records))
 
-        buffer.append("<table>")
-        buffer.append("<tr>")
-        buffer.append("<th>Tax Year</th>")
-        buffer.append("<th>Date</th>")
-        buffer.append("<th>Type</th>")
-        buffer.append("<th>Amount</th>")
-        buffer.append("</tr>")
-
-        for taxable_record in taxable_records:
-            buffer.append("<tr>")
-            buffer.append(f"<td>{taxable_record.tax_year}")
-            buffer.append(f"<td>{taxable_record.date.strftime(DISPLAY_DATE_FORMAT)}")
-            buffer.append(f"<td>{taxable_record.type}")
-            buffer.append(f"<td class=\"right\">{taxable_record.amount.quantize(DISPLAY_PRECISION, rounding=DISPLAY_ROUND)}")
-            buffer.append("</tr>")
-
-        buffer.append("</table>")
-
-        return "\n".join(buffer)
+    def iter_taxable_records(self, taxable_records: List[TaxableRecord]) -> Iterator[str]:
+        yield "<h3>Tax records</h3>"
 
-    def render_taxable_total(self, taxable_hold_pools: List[TaxableHoldPool]) -> str:
-        buffer = list()
-        buffer.append("<div>")
-
-        taxable_years = set()
-        for taxable_hold_pool in taxable_hold_pools:
-            for taxable_record in taxable_hold_pool.taxable_records:
-                taxable_years.add(taxable_record.tax_year)
-
-        taxable_years = sorted(list(taxable_years))
-
-        for taxable_year in taxable_years:
-            buffer.append("<div>")
-            buffer.append(f"<h2>Tax for year: {taxable_year}</h2>")
-
-            buffer.append("<table>")
-            buffer.append("<tr>")
-            buffer.append("<th>Asset</th>")
-            buffer.append("<th>Type</th>")
-            buffer.append("<th>Amount</th>")
-            buffer.append("</tr>")
-
-            records = list()
-            for taxable_hold_pool in taxable_hold_pools:
-
-                for taxable_record in taxable_hold_pool.taxable_records:
-                    if taxable_record.tax_year != taxable_year:
-                        continue
-
-                    buffer.append("<tr>")
-                    buffer.append(f"<td>{taxable_hold_pool.asset.symbol} ({taxable_hold_pool.asset.group})</td>")
-                    buffer.append(f"<td>{taxable_record.type}")
-                    buffer.append(f"<td class=\"right\">{taxable_record.amount.quantize(DISPLAY_PRECISION, rounding=DISPLAY_ROUND)}")
-                    buffer.append("</tr>")
-                    records.append(taxable_record)
-
-            buffer.append("<tr><td>&nbsp;</td></tr>")
-
-            total_capital_gain = TaxableRecord.as_taxable_income(taxable_year, records)
-            buffer.append("<tr>")
-            buffer.append(f"<td>Total</td>")
-            buffer.append(f"<td>{total_capital_gain.type}")
-            buffer.append(f"<td class=\"right\">{total_capital_gain.amount}")
-            buffer.append("</tr>")
-            buffer.append("<tr>")
-
-            tax_to_pay = 0
-            tax_rate = TAX_RATES[taxable_year]
-            if total_capital_gain.is_gain():
-                tax_to_pay = TAX_RATES[taxable_year].calculate_tax_to_pay(total_capital_gain.amount)
-
-            buffer.append(f"<td>Tax allowance</td>")
-            buffer.append(f"<td>")
-            buffer.append(f"<td class=\"right\">{tax_rate.allowance}")
-            buffer.append("</tr>")
-
-            buffer.append(f"<td>Tax rate</td>")
-            buffer.append(f"<td>")
-            buffer.append(f"<td class=\"right\">{tax_rate.rate}")
-            buffer.append("</tr>")
-
-            buffer.append(f"<td><b>Capital gain tax to pay</b></td>")
-            buffer.append(f"<td>")
-            buffer.append(f"<td class=\"right\">{tax_to_pay}")
-            buffer.append("</tr>")
-
-            buffer.append("</table>")
-            buffer.append("</div>")
-
-        buffer.append("</div>")
-        return "\n".join(buffer)
+        yield "<table>"
+        yield "<tr>"
+        yield "<th>Tax Year</th>"
+        yield "<th>Date</th>"
+        yield "<th>Type</th>"
+        yield "<th>Amount</th>"
+        yield "</tr>"
 
-    def render_latest_taxable_hold_pool(self, taxable_hold_pool: TaxableHoldPool) -> str:
+        for taxable_record in taxable_records:
+            yield "<tr>"
+            yield f"<td>{taxable_record.tax_year}"
+            yield f"<td>{taxable_record.date.strftime(DISPLAY_DATE_FORMAT)}"
+            yield f"<td>{taxable_record.type}"
+            yield f"<td class=\"right\">{taxable_record.amount.quantize(DISPLAY_PRECISION, rounding=DISPLAY_ROUND)}"
+            yield "</tr>"
+
+        yield "</table>"
+
+    def render_taxable_total(self, taxable_hold_pools: List[TaxableHoldPool],
+                             tax_summary: Optional[TaxSummary] = None) -> str:
+        return "\n".join(self.iter_taxable_total(taxable_hold_pools, tax_summary))
+
+    def iter_taxable_total(self, taxable_hold_pools: List[TaxableHoldPool],
+                           tax_summary: Optional[TaxSummary] = None) -> Iterator[str]:
+        yield "<div>"
+
+        if tax_summary is None:
+            tax_summary = TaxSummary.of(taxable_hold_pools)
+
+        for tax_year_summary in tax_summary:
+            yield "<div>"
+            yield f"<h2>Tax for year: {tax_year_summary.tax_year}</h2>"
+
+            yield "<table>"
+            yield "<tr>"
+            yield "<th>Asset</th>"
+            yield "<th>Type</th>"
+            yield "<th>Amount</th>"
+            yield "</tr>"
+
+            for asset, taxable_records in tax_year_summary.asset_records:
+                for taxable_record in taxable_records:
+                    yield "<tr>"
+                    yield f"<td>{asset.symbol} ({asset.group})</td>"
+                    yield f"<td>{taxable_record.type}"
+                    yield f"<td class=\"right\">{taxable_record.amount.quantize(DISPLAY_PRECISION, rounding=DISPLAY_ROUND)}"
+                    yield "</tr>"
+
+            yield "<tr><td>&nbsp;</td></tr>"
+
+            total_capital_gain = tax_year_summary.total
+            yield "<tr>"
+            yield f"<td>Total</td>"
+            yield f"<td>{total_capital_gain.type}"
+            yield f"<td class=\"right\">{total_capital_gain.amount}"
+            yield "</tr>"
+            yield "<tr>"
+
+            tax_rate = tax_year_summary.tax_rate
+            yield f"<td>Tax allowance</td>"
+            yield f"<td>"
+            yield f"<td class=\"right\">{tax_rate.allowance}"
+            yield "</tr>"
+
+            yield f"<td>Tax rate</td>"
+            yield f"<td>"
+            yield f"<td class=\"right\">{tax_rate.rate}"
+            yield "</tr>"
+
+            yield f"<td><b>Capital gain tax to pay</b></td>"
+            yield f"<td>"
+            yield f"<td class=\"right\">{tax_year_summary.tax_to_pay}"
+            yield "</tr>"
+
+            yield "</table>"
+            yield "</div>"
+
+        yield "</div>"
+
+    def render_latest_taxable_hold_pool(self, taxable_hold_pool: TaxableHoldPool,
+                                        prices: Optional[Dict[Asset, Decimal]] = None) -> str:
         buffer = list()
         hold_pool = taxable_hold_pool.latest_hold_pool()
 
@@ -165,7 +194,8 @@ class HtmlFormatter(object):
         buffer.append("<th>Tax, if disposed</th>")
         buffer.append("</tr>")
 
-        market_asset_unit_price = self.stock_fetcher.get_price(hold_pool.asset)
+        market_asset_unit_price = prices[hold_pool.asset] if prices is not None \
+            else self.get_stock_fetcher().get_price(hold_pool.asset)
         market_asset_price = market_asset_unit_price * hold_pool.volume
         estimate_record = hold_pool.estimate(market_asset_unit_price)
 
@@ -187,55 +217,123 @@ class HtmlFormatter(object):
         buffer.append("</div>")
         return "\n".join(buffer)
 
+    def render_match_records(self, match_records: List[MatchRecord]) -> str:
+        return "\n".join(self.iter_match_records(match_records))
+
+    # Disposals matched by the same day and 30 days rules, left out of the pool
+    def iter_match_records(self, match_records: List[MatchRecord]) -> Iterator[str]:
+        yield "<h3>Matched disposals</h3>"
+
+        yield "<table>"
+        yield "<tr>"
+        yield "<th>Rule</th>"
+        yield "<th>Sell date</th>"
+        yield "<th>Buy date</th>"
+        yield "<th>Volume</th>"
+        yield "<th>Sell price</th>"
+        yield "<th>Buy price</th>"
+        yield "<th>Amount</th>"
+        yield "</tr>"
+
+        for match_record in match_records:
+            yield "<tr>"
+            yield f"<td>{match_record.rule}"
+            yield f"<td>{match_record.sell_date.strftime(DISPLAY_DATE_FORMAT)}"
+            yield f"<td>{match_record.buy_date.strftime(DISPLAY_DATE_FORMAT)}"
+            yield f"<td class=\"right\">{match_record.volume}"
+            yield f"<td class=\"right\">{match_record.sell_price.quantize(DISPLAY_PRECISION, rounding=DISPLAY_ROUND)}"
+            yield f"<td class=\"right\">{match_record.buy_price.quantize(DISPLAY_PRECISION, rounding=DISPLAY_ROUND)}"
+            yield f"<td class=\"right\">{match_record.amount().quantize(DISPLAY_PRECISION, rounding=DISPLAY_ROUND)}"
+            yield "</tr>"
+
+        yield "</table>"
+
     def render_hold_history(self, taxable_hold_pool: TaxableHoldPool) -> str:
-        buffer = list()
+        return "\n".join(self.iter_hold_history(taxable_hold_pool))
 
-        buffer.append("<div>")
-        buffer.append("<h3>Section 104 hold history</h3>")
+    def iter_hold_history(self, taxable_hold_pool: TaxableHoldPool) -> Iterator[str]:
+        yield "<div>"
+        yield "<h3>Section 104 hold history</h3>"
 
-        buffer.append("<table>")
-        buffer.append("<tr>")
-        buffer.append("<th>Asset</th>")
-        buffer.append("<th>Date</th>")
-        buffer.append("<th>Volume</th>")
-        buffer.append("<th>Cost</th>")
-        buffer.append("</tr>")
+        yield "<table>"
+        yield "<tr>"
+        yield "<th>Asset</th>"
+        yield "<th>Date</th>"
+        yield "<th>Volume</th>"
+        yield "<th>Cost</th>"
+        yield "</tr>"
 
         for hold_pool in taxable_hold_pool.hold_pools:
-            buffer.append("<tr>")
-            buffer.append(f"<td>{hold_pool.asset.symbol} ({hold_pool.asset.group})</td>")
-            buffer.append(f"<td>{hold_pool.date.strftime(DISPLAY_DATE_FORMAT)}</td>")
-            buffer.append(f"<td class=\"right\">{hold_pool.volume}</td>")
-            buffer.append(f"<td class=\"right\">{hold_pool.cost.quantize(DISPLAY_PRECISION, rounding=DISPLAY_ROUND)}</td>")
-            buffer.append("</tr>")
+            yield "<tr>"
+            yield f"<td>{hold_pool.asset.symbol} ({hold_pool.asset.group})</td>"
+            yield f"<td>{hold_pool.date.strftime(DISPLAY_DATE_FORMAT)}</td>"
+            yield f"<td class=\"right\">{hold_pool.volume}</td>"
+            yield f"<td class=\"right\">{hold_pool.cost.quantize(DISPLAY_PRECISION, rounding=DISPLAY_ROUND)}</td>"
+            yield "</tr>"
 
-        buffer.append("</table>")
-        buffer.append("</div>")
-        return "\n".join(buffer)
+        yield "</table>"
+        yield "</div>"
 
-    def render_taxable_hold_pool(self, taxable_hold_pool: TaxableHoldPool) -> str:
-        buffer = list()
+    def render_taxable_hold_pool(self, taxable_hold_pool: TaxableHoldPool,
+                                 prices: Optional[Dict[Asset, Decimal]] = None) -> str:
+        return "\n".join(self.iter_taxable_hold_pool(taxable_hold_pool, prices))
 
-        buffer.append("<div>")
-        buffer.append(f"<h2>Asset: {taxable_hold_pool.asset.symbol} ({taxable_hold_pool.asset.group})</h2>")
-        buffer.append(f"<small>Type: {taxable_hold_pool.asset.type}</small><br />")
+    def iter_taxable_hold_pool(self, taxable_hold_pool: TaxableHoldPool,
+                               prices: Optional[Dict[Asset, Decimal]] = None) -> Iterator[str]:
+        yield "<div>"
+        yield f"<h2>Asset: {taxable_hold_pool.asset.symbol} ({taxable_hold_pool.asset.group})</h2>"
+        yield f"<small>Type: {taxable_hold_pool.asset.type}</small><br />"
 
-        buffer.append("<div>")
-        buffer.append(self.render_taxable_records(taxable_hold_pool.taxable_records))
-        buffer.append(self.render_latest_taxable_hold_pool(taxable_hold_pool))
-        buffer.append(self.render_hold_history(taxable_hold_pool))
-        buffer.append("</div>")
+        yield "<div>"
+        yield from self.iter_taxable_records(taxable_hold_pool.taxable_records)
+        if len(taxable_hold_pool.match_records) > 0:
+            yield from self.iter_match_records(taxable_hold_pool.match_records)
+        yield self.render_latest_taxable_hold_pool(taxable_hold_pool, prices)
+        yield from self.iter_hold_history(taxable_hold_pool)
+        yield "</div>"
 
-        buffer.append("</div>")
-        return "\n".join(buffer)
+        yield "</div>"
+
+    def prefetch_prices(self, taxable_hold_pools: List[TaxableHoldPool]) -> Dict[Asset, Decimal]:
+        if len(taxable_hold_pools) <= 0:
+            return dict()
+
+        return self.get_stock_fetcher().get_prices([x.asset for x in taxable_hold_pools])
+
+    def iter_body(self, taxable_hold_pools: List[TaxableHoldPool], prices: Optional[Dict[Asset, Decimal]] = None,
+                  tax_summary: Optional[TaxSummary] = None) -> Iterator[str]:
+
+        yield from self.iter_taxable_total(taxable_hold_pools, tax_summary)
+
+        if len(taxable_hold_pools) <= 0:
+            # Empty hold pools section still takes a line
+            yield ""
+
+        for taxable_hold_pool in taxable_hold_pools:
+            yield from self.iter_taxable_hold_pool(taxable_hold_pool, prices)
+
+        yield self.render_footer()
+
+    # Yields the document a line at a time, only one hold pool snapshot is rendered at once
+    def iter_html(self, taxable_hold_pools: List[TaxableHoldPool], prices: Optional[Dict[Asset, Decimal]] = None,
+                  tax_summary: Optional[TaxSummary] = None) -> Iterator[str]:
+
+        if prices is None:
+            prices = self.prefetch_prices(taxable_hold_pools)
+
+        yield self.html_head()
+
+        for line in self.iter_body(taxable_hold_pools, prices, tax_summary):
+            yield self.indent_html(line)
 
-    def render(self, taxable_hold_pools: List[TaxableHoldPool]):
+        yield self.html_tail()
 
-        hold_pools = "\n".join([self.render_taxable_hold_pool(x) for x in taxable_hold_pools])
-        taxable_total = self.render_taxable_total(taxable_hold_pools)
-        footer = self.render_footer()
+    def write(self, fp: TextIO, taxable_hold_pools: List[TaxableHoldPool],
+              prices: Optional[Dict[Asset, Decimal]] = None, tax_summary: Optional[TaxSummary] = None):
 
-        buffer = [taxable_total, hold_pools, footer]
-        html = self.wrap_html("\n".join(buffer))
+        for chunk in self.iter_html(taxable_hold_pools, prices, tax_summary):
+            fp.write(chunk)
 
-        return html
\ No newline at end of file
+    def render(self, taxable_hold_pools: List[TaxableHoldPool], prices: Optional[Dict[Asset, Decimal]] = None,
+               tax_summary: Optional[TaxSummary] = None):
+        return "".join(self.iter_html(taxable_hold_pools, prices, tax_summary))
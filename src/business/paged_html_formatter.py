@@ -0,0 +1,148 @@
+import html
+import json
+import os
+import re
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional
+
+from config import HOLD_HISTORY_PAGE_SIZE
+from src.business.html_formatter import HtmlFormatter, DISPLAY_PRECISION, DISPLAY_ROUND, DISPLAY_DATE_FORMAT
+from src.business.stock_fetcher import StockFetcher
+from src.business.tax_summary import TaxSummary
+from src.model.hold_pool import TaxableHoldPool
+from src.model.transaction import Asset
+
+
+# Report with the summary tables only, hold history of every asset is written to pages in a side directory
+# Pages are small scripts rather than plain JSON so the report loads them on demand from file:// too,
+# where browsers refuse fetch. The history stays collapsed until it is opened
+class PagedHtmlFormatter(HtmlFormatter):
+
+    SCRIPT = """<script type="text/javascript">
+var holdHistoryPages = {};
+function holdHistoryPage(history, page, rows) {
+    holdHistoryPages[history + "-" + page] = rows;
+    showHoldHistoryPage(history, page);
+}
+function showHoldHistoryPage(history, page) {
+    var container = document.getElementById("hold-history-" + history);
+    var pages = parseInt(container.dataset.pages);
+    if (page < 0 || page >= pages) {
+        return;
+    }
+    var rows = holdHistoryPages[history + "-" + page];
+    if (rows === undefined) {
+        var script = document.createElement("script");
+        script.src = container.dataset.url + "/history-" + history + "-" + page + ".js";
+        document.head.appendChild(script);
+        return;
+    }
+    container.dataset.page = page;
+    var body = container.querySelector("tbody");
+    body.innerHTML = "";
+    rows.forEach(function (row) {
+        var tr = document.createElement("tr");
+        [container.dataset.asset].concat(row).forEach(function (value, idx) {
+            var td = document.createElement("td");
+            td.textContent = value;
+            if (idx > 1) {
+                td.className = "right";
+            }
+            tr.appendChild(td);
+        });
+        body.appendChild(tr);
+    });
+    container.querySelector(".page").textContent = "Page " + (page + 1) + " of " + pages;
+}
+</script>"""
+
+    PAGE_FILE = re.compile(r"history-\d+-\d+\.js")
+
+    def __init__(self, directory: str, page_size: int = HOLD_HISTORY_PAGE_SIZE,
+                 stock_fetcher: Optional[StockFetcher] = None):
+        super().__init__(stock_fetcher)
+        # Directory is expected next to the report, pages are referenced relative to it
+        self.directory = directory
+        self.url = os.path.basename(os.path.normpath(directory))
+        self.page_size = page_size
+        self.history_count = 0
+
+    # Pages of an earlier, longer report would be left next to this one, only files named like pages are removed
+    def clear_pages(self):
+        if not os.path.isdir(self.directory):
+            return
+
+        for filename in os.listdir(self.directory):
+            if PagedHtmlFormatter.PAGE_FILE.fullmatch(filename):
+                os.remove(os.path.join(self.directory, filename))
+
+    def write_pages(self, history: int, taxable_hold_pool: TaxableHoldPool) -> int:
+        os.makedirs(self.directory, exist_ok=True)
+
+        page_count = 0
+        rows = list()
+        for hold_pool in taxable_hold_pool.hold_pools:
+            rows.append([
+                hold_pool.date.strftime(DISPLAY_DATE_FORMAT),
+                str(hold_pool.volume),
+                str(hold_pool.cost.quantize(DISPLAY_PRECISION, rounding=DISPLAY_ROUND)),
+            ])
+
+            if len(rows) >= self.page_size:
+                self.__write_page(history, page_count, rows)
+                page_count += 1
+                rows = list()
+
+        if len(rows) > 0 or page_count == 0:
+            self.__write_page(history, page_count, rows)
+            page_count += 1
+
+        return page_count
+
+    def __write_page(self, history: int, page: int, rows: List[List[str]]):
+        filename = os.path.join(self.directory, f"history-{history}-{page}.js")
+        with open(filename, 'w') as fp:
+            fp.write(f"holdHistoryPage({history}, {page}, {json.dumps(rows, separators=(',', ':'))});\n")
+
+    def iter_hold_history(self, taxable_hold_pool: TaxableHoldPool) -> Iterator[str]:
+        history = self.history_count
+        self.history_count += 1
+        page_count = self.write_pages(history, taxable_hold_pool)
+
+        asset = html.escape(f"{taxable_hold_pool.asset.symbol} ({taxable_hold_pool.asset.group})")
+        url = html.escape(self.url)
+
+        yield "<div>"
+        yield "<h3>Section 104 hold history</h3>"
+
+        yield f"<details id=\"hold-history-{history}\" data-url=\"{url}\" data-pages=\"{page_count}\" " \
+              f"data-page=\"0\" data-asset=\"{asset}\" " \
+              f"ontoggle=\"if (this.open) showHoldHistoryPage({history}, parseInt(this.dataset.page))\">"
+        yield f"<summary>{len(taxable_hold_pool.hold_pools)} snapshots</summary>"
+        yield f"<button type=\"button\" " \
+              f"onclick=\"showHoldHistoryPage({history}, parseInt(this.parentNode.dataset.page) - 1)\">Previous</button>"
+        yield "<span class=\"page\"></span>"
+        yield f"<button type=\"button\" " \
+              f"onclick=\"showHoldHistoryPage({history}, parseInt(this.parentNode.dataset.page) + 1)\">Next</button>"
+
+        yield "<table>"
+        yield "<thead>"
+        yield "<tr>"
+        yield "<th>Asset</th>"
+        yield "<th>Date</th>"
+        yield "<th>Volume</th>"
+        yield "<th>Cost</th>"
+        yield "</tr>"
+        yield "</thead>"
+        yield "<tbody></tbody>"
+        yield "</table>"
+        yield "</details>"
+        yield "</div>"
+
+    def iter_body(self, taxable_hold_pools: List[TaxableHoldPool], prices: Optional[Dict[Asset, Decimal]] = None,
+                  tax_summary: Optional[TaxSummary] = None) -> Iterator[str]:
+
+        self.history_count = 0
+        self.clear_pages()
+        yield from PagedHtmlFormatter.SCRIPT.split("\n")
+        yield from super().iter_body(taxable_hold_pools, prices, tax_summary)
@@ -1,10 +1,19 @@
 import csv
+import os
+import tempfile
+from itertools import islice
+from typing import Dict, Iterator, List, Tuple
 
-from src.model.transaction import Transaction
+from src.model.transaction import Transaction, Asset, transaction_id
+
+# Rows parsed per batch, also bounds the timestamp cache and the rows buffered before spilling
+DEFAULT_CHUNK_SIZE = 10000
 
 
 def parse(filename):
     transactions = []
+    first_id = transaction_id(filename, 0)
+    assets = dict()
     with open(filename) as csvfile:
         reader = csv.reader(csvfile, delimiter=" ", quotechar='"')
         is_header = True
@@ -16,7 +25,97 @@ def parse(filename):
             if len(row) == 0:
                 continue
 
-            transaction = Transaction.parse([x for x in row if x])
+            transaction = Transaction.parse([x for x in row if x], transaction_id=first_id + reader.line_num,
+                                            assets=assets)
             transactions.append(transaction)
 
-    return transactions
\ No newline at end of file
+    return transactions
+
+
+def split_row(line: str) -> List[str]:
+    # Quoted fields are rare, only those rows pay for the csv module
+    if '"' not in line:
+        return line.split()
+
+    return [x for x in next(csv.reader([line], delimiter=" ", quotechar='"')) if x.strip()]
+
+
+# Yields the line number, counted from 1 for the header, with the line and its fields
+def iter_rows(filename) -> Iterator[Tuple[int, str, List[str]]]:
+    with open(filename) as fp:
+        next(fp, None)
+
+        for line_number, line in enumerate(fp, 2):
+            row = split_row(line)
+            if len(row) == 0:
+                continue
+
+            yield line_number, line, row
+
+
+def iter_parse(filename, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Transaction]:
+    rows = iter_rows(filename)
+    first_id = transaction_id(filename, 0)
+    # Assets are shared for the whole file, they are few
+    assets = dict()
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if len(chunk) <= 0:
+            return
+
+        # Timestamps repeat mostly within a chunk (fills of one order), so the cache only lives that long
+        dates = dict()
+        transactions = [Transaction.parse(row, dates, first_id + line_number, assets) for line_number, line, row in chunk]
+
+        yield from transactions
+
+
+def partition_by_asset(filename, directory, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[Asset, str]:
+    with open(filename) as fp:
+        header = fp.readline()
+
+    asset_to_filename: Dict[Asset, str] = dict()
+    asset_to_lines: Dict[Asset, List[str]] = dict()
+    buffered = 0
+    assets = dict()
+
+    def spill():
+        for asset, lines in asset_to_lines.items():
+            with open(asset_to_filename[asset], 'a') as spill_fp:
+                spill_fp.writelines(lines)
+
+        asset_to_lines.clear()
+
+    first_id = transaction_id(filename, 0)
+    for line_number, line, row in iter_rows(filename):
+        asset = Asset.intern(assets, row[2], row[3], row[4])
+        # Id of the trade in this file is appended, so the partition parses to the same transactions
+        line = line.rstrip("\n")
+        line = line + "\n" if len(row) > 8 else f"{line} {first_id + line_number}\n"
+
+        if asset not in asset_to_filename:
+            path = os.path.join(directory, f"asset-{len(asset_to_filename)}.tsv")
+            with open(path, 'w') as spill_fp:
+                spill_fp.write(header)
+            asset_to_filename[asset] = path
+
+        if asset not in asset_to_lines:
+            asset_to_lines[asset] = [line]
+        else:
+            asset_to_lines[asset].append(line)
+
+        buffered += 1
+        if buffered >= chunk_size:
+            spill()
+            buffered = 0
+
+    spill()
+    return asset_to_filename
+
+
+def iter_parse_by_asset(filename, chunk_size: int = DEFAULT_CHUNK_SIZE) \
+        -> Iterator[Tuple[Asset, List[Transaction]]]:
+    with tempfile.TemporaryDirectory() as directory:
+        for asset, asset_filename in partition_by_asset(filename, directory, chunk_size).items():
+            yield asset, list(iter_parse(asset_filename, chunk_size))
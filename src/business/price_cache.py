@@ -0,0 +1,97 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Callable, Dict, Optional, Tuple
+
+from config import PRICE_CACHE_TTL
+from src.business.profiler import PROFILER
+
+
+class PriceCache(object):
+
+    FILENAME = 'prices.sqlite'
+
+    def __init__(self, directory: str, ttl: Optional[Dict[str, timedelta]] = None, memory_size: int = 1024,
+                 clock: Callable[[], float] = time.time):
+        self.ttl = PRICE_CACHE_TTL if ttl is None else ttl
+        self.memory_size = memory_size
+        self.clock = clock
+        self.memory: 'OrderedDict[Tuple[str, str, str], Tuple[Decimal, float]]' = OrderedDict()
+        # Prices can be fetched from several threads, they all share one connection
+        self.lock = threading.RLock()
+
+        os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(directory, PriceCache.FILENAME), check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS price ("
+            "symbol TEXT NOT NULL, type TEXT NOT NULL, date TEXT NOT NULL, "
+            "price TEXT NOT NULL, fetched_at REAL NOT NULL, "
+            "PRIMARY KEY (symbol, type, date))"
+        )
+        self.connection.commit()
+
+    def today(self) -> date:
+        return datetime.fromtimestamp(self.clock(), tz=timezone.utc).date()
+
+    def get(self, symbol: str, type: str, as_of: date) -> Optional[Decimal]:
+        with self.lock:
+            return self.__get((symbol, type, as_of.isoformat()))
+
+    def put(self, symbol: str, type: str, as_of: date, price: Decimal):
+        with self.lock:
+            self.__put((symbol, type, as_of.isoformat()), price)
+
+    def __get(self, key: Tuple[str, str, str]) -> Optional[Decimal]:
+        entry = self.memory.get(key)
+        if entry is None:
+            row = self.connection.execute(
+                "SELECT price, fetched_at FROM price WHERE symbol = ? AND type = ? AND date = ?", key
+            ).fetchone()
+
+            if row is None:
+                PROFILER.count('price cache misses')
+                return None
+
+            entry = (Decimal(row[0]), row[1])
+
+        price, fetched_at = entry
+        if self.__is_expired(key[1], fetched_at):
+            self.memory.pop(key, None)
+            PROFILER.count('price cache misses')
+            return None
+
+        PROFILER.count('price cache hits')
+        self.__remember(key, entry)
+        return price
+
+    def __put(self, key: Tuple[str, str, str], price: Decimal):
+        entry = (price, self.clock())
+
+        self.connection.execute(
+            "INSERT OR REPLACE INTO price (symbol, type, date, price, fetched_at) VALUES (?, ?, ?, ?, ?)",
+            key + (str(price), entry[1])
+        )
+        self.connection.commit()
+        self.__remember(key, entry)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def __is_expired(self, type: str, fetched_at: float) -> bool:
+        ttl = self.ttl.get(type)
+        if ttl is None:
+            return True
+
+        return self.clock() - fetched_at > ttl.total_seconds()
+
+    def __remember(self, key: Tuple[str, str, str], entry: Tuple[Decimal, float]):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
@@ -0,0 +1,220 @@
+import mmap
+import os
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from datetime import date
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from config import PRICE_FILE, FETCH_PRICES_ONLINE
+from src.model.transaction import Asset
+
+ASSET_VALUE_LOOKUP_GBP = {
+    'VAUG': Decimal('90.72'),
+    'AMZN': Decimal('179.35'),
+    'GOOGL': Decimal('157.31'),
+    'MSFT': Decimal('343.19'),
+    'TSLA': Decimal('326.36'),
+    'NVDA': Decimal('111.33'),
+    'AAPL': Decimal('194.02'),
+    'SPXP': Decimal('941.55'),
+    'BTC':  Decimal('77364.07'),
+    'ETH':  Decimal('2696.55'),
+    'LTC':  Decimal('84.68'),
+}
+
+
+class PriceSeries(object):
+
+    # Daily closes of one symbol, dates are kept as a sorted array of ordinals so any as-of date is a bisect away
+    def __init__(self, dates: List[int], values: list):
+        self.dates = dates
+        self.values = values
+
+    @staticmethod
+    def from_rows(rows: List[Tuple[date, object]]) -> 'PriceSeries':
+        rows = sorted(rows, key=lambda x: x[0])
+        return PriceSeries([x[0].toordinal() for x in rows], [x[1] for x in rows])
+
+    # Value of the last close on or before as_of, or the latest one when as_of is None
+    def find(self, as_of: Optional[date] = None):
+        position = len(self.dates) if as_of is None else bisect_right(self.dates, as_of.toordinal())
+        if position <= 0:
+            return None
+
+        return self.values[position - 1]
+
+    def __len__(self):
+        return len(self.dates)
+
+
+class PriceSource(ABC):
+
+    # Returns GBP unit price at the end of as_of, or the latest known one when as_of is None.
+    # None means the source does not know the price, the next source in a chain is tried then
+    @abstractmethod
+    def get_price(self, asset: Asset, as_of: Optional[date] = None) -> Optional[Decimal]:
+        pass
+
+
+class StaticPriceSource(PriceSource):
+
+    def __init__(self, prices: Optional[Dict[str, Decimal]] = None):
+        self.prices = ASSET_VALUE_LOOKUP_GBP if prices is None else prices
+
+    def get_price(self, asset: Asset, as_of: Optional[date] = None) -> Optional[Decimal]:
+        # Hard-coded prices are a snapshot, they say nothing about the past
+        if as_of is not None:
+            return None
+
+        return self.prices.get(asset.symbol)
+
+
+class FilePriceSource(PriceSource):
+
+    # Columns of both file types, found by their header name
+    COLUMNS = ['symbol', 'date', 'price']
+
+    # CSV file with a header naming the symbol, date and price columns, in any order and among any others, and one
+    # GBP close per line, rows do not need to be sorted.
+    # The file is memory-mapped, only byte offsets are kept in memory and a price is parsed when it is read.
+    # Parquet files with the same columns are read with pyarrow when it is installed
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.mapped: Optional[mmap.mmap] = None
+        # Series values are byte offsets of the price for CSV files and the price itself for Parquet files
+        self.index: Dict[str, PriceSeries] = dict()
+
+        if filename.endswith('.parquet'):
+            self.__load_parquet()
+        else:
+            self.__load_csv()
+
+    def get_price(self, asset: Asset, as_of: Optional[date] = None) -> Optional[Decimal]:
+        series = self.index.get(asset.symbol)
+        if series is None:
+            return None
+
+        value = series.find(as_of)
+        if value is None or self.mapped is None:
+            return value
+
+        return self.__read(value)
+
+    # All closes of the symbol with prices parsed, None when the file has none for it
+    def get_series(self, symbol: str) -> Optional[PriceSeries]:
+        series = self.index.get(symbol)
+        if series is None or self.mapped is None:
+            return series
+
+        return PriceSeries(series.dates, [self.__read(x) for x in series.values])
+
+    def __read(self, offset: int) -> Decimal:
+        end = self.mapped.find(b"\n", offset)
+        line = self.mapped[offset:end if end >= 0 else len(self.mapped)]
+        return Decimal(line.split(b",")[0].decode().strip())
+
+    def close(self):
+        if self.mapped is not None:
+            self.mapped.close()
+
+    def __add(self, symbol_to_rows: Dict[str, List[Tuple[date, object]]]):
+        for symbol, rows in symbol_to_rows.items():
+            self.index[symbol] = PriceSeries.from_rows(rows)
+
+    def __load_csv(self):
+        symbol_to_rows: Dict[str, List[Tuple[date, object]]] = dict()
+
+        with open(self.filename, 'rb') as fp:
+            if os.fstat(fp.fileno()).st_size <= 0:
+                return
+
+            self.mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = [x.strip().decode().lower() for x in self.mapped.readline().split(b",")]
+        missing = [x for x in FilePriceSource.COLUMNS if x not in header]
+        if len(missing) > 0:
+            self.close()
+            raise ValueError(f"Prices file {self.filename} has no {', '.join(missing)} column in its header")
+
+        symbol_index, date_index, price_index = [header.index(x) for x in FilePriceSource.COLUMNS]
+        column_count = max(symbol_index, date_index, price_index) + 1
+
+        offset = self.mapped.tell()
+        for line in iter(self.mapped.readline, b""):
+            fields = line.split(b",")
+            if len(fields) >= column_count:
+                symbol = fields[symbol_index].strip().decode()
+                as_of = date.fromisoformat(fields[date_index].strip().decode())
+                # The price is read from its offset up to the next separator
+                price_offset = offset + sum(len(x) + 1 for x in fields[:price_index])
+
+                if symbol not in symbol_to_rows:
+                    symbol_to_rows[symbol] = [(as_of, price_offset)]
+                else:
+                    symbol_to_rows[symbol].append((as_of, price_offset))
+
+            offset += len(line)
+
+        self.__add(symbol_to_rows)
+
+    def __load_parquet(self):
+        try:
+            import pyarrow.parquet as parquet
+        except ImportError:
+            raise ValueError(f"Reading {self.filename} requires pyarrow to be installed")
+
+        table = parquet.read_table(self.filename, columns=FilePriceSource.COLUMNS, memory_map=True)
+
+        symbol_to_rows: Dict[str, List[Tuple[date, object]]] = dict()
+        for symbol, as_of, price in zip(*[table.column(x).to_pylist() for x in FilePriceSource.COLUMNS]):
+            if isinstance(as_of, str):
+                as_of = date.fromisoformat(as_of)
+
+            row = (as_of, Decimal(str(price)))
+            if symbol not in symbol_to_rows:
+                symbol_to_rows[symbol] = [row]
+            else:
+                symbol_to_rows[symbol].append(row)
+
+        self.__add(symbol_to_rows)
+
+
+class HttpPriceSource(PriceSource):
+
+    def __init__(self, stock_fetcher: 'StockFetcher'):
+        self.stock_fetcher = stock_fetcher
+
+    def get_price(self, asset: Asset, as_of: Optional[date] = None) -> Optional[Decimal]:
+        if as_of is not None:
+            return self.stock_fetcher.get_historical_price(asset, as_of)
+
+        return self.stock_fetcher.get_market_price(asset)
+
+
+class PriceSourceChain(PriceSource):
+
+    def __init__(self, sources: List[PriceSource]):
+        self.sources = sources
+
+    def get_price(self, asset: Asset, as_of: Optional[date] = None) -> Optional[Decimal]:
+        for source in self.sources:
+            price = source.get_price(asset, as_of)
+            if price is not None:
+                return price
+
+        return None
+
+
+def default_price_source(stock_fetcher: 'StockFetcher') -> PriceSource:
+    sources: List[PriceSource] = list()
+
+    if os.path.exists(PRICE_FILE):
+        sources.append(FilePriceSource(PRICE_FILE))
+
+    sources.append(StaticPriceSource())
+
+    if FETCH_PRICES_ONLINE:
+        sources.append(HttpPriceSource(stock_fetcher))
+
+    return PriceSourceChain(sources)
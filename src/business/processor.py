@@ -1,35 +1,73 @@
-from datetime import timedelta
-from typing import List, Tuple, Dict
-
-from src.model.hold_pool import HoldPool, TaxableHoldPool
-from src.model.tax import TaxableRecord
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta, date
+from typing import List, Tuple, Dict, Optional, Sequence, Iterable
+
+from src.business.checkpoint import AssetCheckpoint, transaction_key, transactions_digest
+from src.business.profiler import PROFILER
+from src.business.result_cache import ResultCache
+from src.model.hold_pool import HoldPool, TaxableHoldPool, HoldHistory
+from src.model.tax import TaxableRecord, MatchRecord
 from src.model.transaction import Transaction, Asset
 
 
 class TransactionProcessor(object):
 
-    def __merge(self, transactions: List[Transaction]) -> List[Transaction]:
+    # Below this many transactions spawning worker processes costs more than it saves
+    PARALLEL_THRESHOLD = 10000
+
+    def __init__(self, legacy_matching: bool = False, workers: Optional[int] = 1,
+                 parallel_threshold: int = PARALLEL_THRESHOLD, columnar_history: bool = False,
+                 result_cache: Optional[ResultCache] = None):
+        # Legacy matching rescans and recurses after every merge, kept only to compare against the sweep
+        self.legacy_matching = legacy_matching
+        # Number of processes assets are spread across, None for one per CPU, 1 to stay serial
+        self.workers = workers
+        self.parallel_threshold = parallel_threshold
+        # Keep hold pool snapshots in a HoldHistory rather than a list of HoldPool objects
+        self.columnar_history = columnar_history
+        # Assets whose trades did not change since an earlier run are taken from the cache instead of being matched
+        self.result_cache = result_cache
+
+    @staticmethod
+    def __rule(days: int) -> str:
+        return 'SAME_DAY' if days == 0 else '30_DAYS'
+
+    # Buys are matched in order against sells in order, each pointer only moves forward
+    def __merge(self, transactions: List[Transaction], days: int, matches: Optional[List[MatchRecord]] = None) \
+            -> List[Transaction]:
 
         if len(transactions) <= 1:
             return transactions
 
+        PROFILER.count('merges')
         buys = [x.copy() for x in transactions if x.is_buy()]
         sells = [x.copy() for x in transactions if x.is_sell()]
 
-        for buy in buys:
-            for sell in sells:
-                if sell.volume <= 0:
-                    continue
+        buy_idx, sell_idx = 0, 0
+        while buy_idx < len(buys) and sell_idx < len(sells):
+            buy = buys[buy_idx]
+            sell = sells[sell_idx]
+            if buy.volume <= 0:
+                buy_idx += 1
+                continue
 
-                if buy.volume <= 0:
-                    break
+            if sell.volume <= 0:
+                sell_idx += 1
+                continue
 
-                if sell.volume <= buy.volume:
-                    buy.volume -= sell.volume
-                    sell.volume -= sell.volume
-                else:
-                    sell.volume -= buy.volume
-                    buy.volume = 0
+            volume = min(buy.volume, sell.volume)
+            if matches is not None:
+                matches.append(MatchRecord(self.__rule(days), buy.date, sell.date, volume, buy.taxable_price,
+                                           sell.taxable_price, buy.transaction_id, sell.transaction_id))
+
+            if sell.volume <= buy.volume:
+                buy.volume -= sell.volume
+                sell.volume -= sell.volume
+            else:
+                sell.volume -= buy.volume
+                buy.volume = 0
 
         non_zero_buys = [x for x in buys if x.volume > 0]
         non_zero_sells = [x for x in sells if x.volume > 0]
@@ -39,68 +77,155 @@ class TransactionProcessor(object):
 
         return merged
 
-    def __process_x_days(self, transactions: List[Transaction], days: int) -> List[Transaction]:
+    # Single pass equivalent of __process_x_days
+    # Disposals are visited in date order. Each one is matched, FIFO, against the buys within the +/- days window
+    # and the later disposals that fall in the same window. Buys are kept in a sliding window, so every transaction
+    # enters and leaves it at most once.
+    # Pairs are the same as those of the recursive version wherever it finishes. It merges the whole window again
+    # after every merge, so once disposals sharing a window are left with no buy to match it recurses without end,
+    # where the sweep moves on to the next disposal
+    # Disposals dated on or after until are left unmatched
+    def __sweep_x_days(self, transactions: List[Transaction], days: int, until: Optional[date] = None,
+                       matches: Optional[List[MatchRecord]] = None) -> List[Transaction]:
 
         if len(transactions) <= 0:
             return transactions
 
         day_delta = timedelta(days=days)
 
-        transactions = [x.copy() for x in transactions]
+        transactions = sorted([x.copy() for x in transactions], key=lambda x: x.date)
+        buys = [x for x in transactions if x.is_buy()]
+        sells = [x for x in transactions if x.is_sell()]
+        # Positions in the sorted transactions, equal fills are separate trades and must not collapse into one
+        buy_positions = [idx for idx, x in enumerate(transactions) if x.is_buy()]
+        sell_positions = [idx for idx, x in enumerate(transactions) if x.is_sell()]
+        merged = bytearray(len(transactions))
+
+        window = deque()
+        next_buy = 0
+        for sell_idx in range(len(sells)):
+            disposal = sells[sell_idx]
+            if until is not None and disposal.date.date() >= until:
+                break
+
+            if disposal.volume <= 0:
+                continue
 
-        disposals = [x for x in transactions if x.is_sell()]
-        processed_transactions = set()
-        for disposal in disposals:
             start_at = (disposal.date - day_delta).date()
             end_at = (disposal.date + day_delta).date()
 
-            if disposal in processed_transactions:
-                continue
+            while next_buy < len(buys) and buys[next_buy].date.date() <= end_at:
+                window.append(next_buy)
+                next_buy += 1
+
+            while window and (buys[window[0]].volume <= 0 or buys[window[0]].date.date() < start_at):
+                window.popleft()
+
+            if window and PROFILER.enabled:
+                PROFILER.count('merges')
+
+            idx = sell_idx
+            while window and idx < len(sells) and sells[idx].date.date() <= end_at:
+                buy = buys[window[0]]
+                sell = sells[idx]
+                merged[buy_positions[window[0]]] = 1
+                merged[sell_positions[idx]] = 1
+
+                volume = min(buy.volume, sell.volume)
+                if matches is not None and volume > 0:
+                    matches.append(MatchRecord(self.__rule(days), buy.date, sell.date, volume, buy.taxable_price,
+                                               sell.taxable_price, buy.transaction_id, sell.transaction_id))
+
+                if sell.volume <= buy.volume:
+                    buy.volume -= sell.volume
+                    sell.volume -= sell.volume
+                    idx += 1
+                else:
+                    sell.volume -= buy.volume
+                    buy.volume = 0
+
+                if buy.volume <= 0:
+                    window.popleft()
+
+        return [x for idx, x in enumerate(transactions) if x.volume > 0 or not merged[idx]]
+
+    def __process_x_days(self, transactions: List[Transaction], days: int, depth: int = 1,
+                         matches: Optional[List[MatchRecord]] = None) -> List[Transaction]:
 
-            to_merge = set()
-            to_merge.add(disposal)
+        if len(transactions) <= 0:
+            return transactions
 
-            for idx in range(len(transactions)):
-                transaction = transactions[idx]
+        PROFILER.maximum('recursion depth', depth)
+
+        day_delta = timedelta(days=days)
 
-                if start_at <= transaction.date.date() <= end_at:
-                    to_merge.add(transaction)
+        transactions = sorted([x.copy() for x in transactions], key=lambda x: x.date)
 
-            for merge in to_merge:
-                processed_transactions.add(merge)
+        for disposal in transactions:
+            if not disposal.is_sell():
+                continue
 
-            transactions = [x for x in transactions if x not in to_merge]
+            start_at = (disposal.date - day_delta).date()
+            end_at = (disposal.date + day_delta).date()
 
-            merged = self.__merge(list(to_merge))
-            transactions.extend(merged)
+            # Trades are told apart by their position, equal fills are separate trades and must not collapse into one
+            # A disposal alone in its window is in no other window either, it is left as it is
+            to_merge_positions = [idx for idx, x in enumerate(transactions) if start_at <= x.date.date() <= end_at]
+            if len(to_merge_positions) <= 1:
+                continue
 
-            if len(to_merge) > 1:
-                transactions = sorted(transactions, key=lambda x: x.date)
-                return self.__process_x_days(transactions, days)
+            # Kept in date order, so buys are matched first in first out
+            to_merge = [transactions[idx] for idx in to_merge_positions]
+            to_merge_positions = set(to_merge_positions)
+            transactions = [x for idx, x in enumerate(transactions) if idx not in to_merge_positions]
+            transactions.extend(self.__merge(to_merge, days, matches))
+
+            return self.__process_x_days(sorted(transactions, key=lambda x: x.date), days, depth + 1, matches)
 
-        transactions = sorted(transactions, key=lambda x: x.date)
         return transactions
 
-    def __process_same_day(self, transactions: List[Transaction]) -> List[Transaction]:
-        return self.__process_x_days(transactions, 0)
+    def __match_x_days(self, transactions: List[Transaction], days: int,
+                       matches: Optional[List[MatchRecord]] = None) -> List[Transaction]:
+        if self.legacy_matching:
+            return self.__process_x_days(transactions, days, matches=matches)
+
+        return self.__sweep_x_days(transactions, days, matches=matches)
+
+    def __process_same_day(self, transactions: List[Transaction], matches: Optional[List[MatchRecord]] = None) \
+            -> List[Transaction]:
+        return self.__match_x_days(transactions, 0, matches)
+
+    def __process_30_days(self, transactions: List[Transaction], matches: Optional[List[MatchRecord]] = None) \
+            -> List[Transaction]:
+        return self.__match_x_days(transactions, 30, matches)
 
-    def __process_30_days(self, transactions: List[Transaction]) -> List[Transaction]:
-        return self.__process_x_days(transactions, 30)
+    # Replays transactions on top of the given hold pools and records, which are appended to
+    def __process_normal(self, transactions: List[Transaction], hold_pools: Optional[Sequence[HoldPool]] = None,
+                         records: Optional[List[TaxableRecord]] = None) \
+            -> Tuple[Sequence[HoldPool], List[TaxableRecord]]:
 
-    def __process_normal(self, transactions: List[Transaction]) \
-            -> Tuple[List[HoldPool], List[TaxableRecord]]:
+        if hold_pools is None:
+            hold_pools = list()
 
-        hold_pools = list()
-        records = list()
+        if records is None:
+            records = list()
 
         if len(transactions) <= 0:
             return hold_pools, records
 
-        first = transactions[0]
-        hold_pool = HoldPool(first.date, first.asset, first.volume, first.taxable_price * first.volume)
-        hold_pools.append(hold_pool)
+        start = 0
+        if len(hold_pools) > 0:
+            hold_pool = hold_pools[-1]
+        else:
+            first = transactions[0]
+            if self.columnar_history:
+                hold_pools = HoldHistory(first.asset)
 
-        for idx in range(1, len(transactions)):
+            hold_pool = HoldPool(first.date, first.asset, first.volume, first.taxable_price * first.volume)
+            hold_pools.append(hold_pool)
+            start = 1
+
+        for idx in range(start, len(transactions)):
             transaction = transactions[idx]
 
             if transaction.is_sell():
@@ -116,21 +241,39 @@ class TransactionProcessor(object):
         return hold_pools, records
 
     def __process_single_asset_type(self, transactions: List[Transaction]) \
-            -> Tuple[List[HoldPool], List[TaxableRecord]]:
+            -> Tuple[Sequence[HoldPool], List[TaxableRecord], List[MatchRecord]]:
 
         if len(transactions) <= 0:
-            return list(), list()
+            return list(), list(), list()
 
         transactions_ascending = sorted(transactions, key=lambda x: x.date)
+        matches = list()
 
-        transactions_without_same_day = self.__process_same_day(transactions_ascending)
-        transactions_without_30_days = self.__process_30_days(transactions_without_same_day)
-        hold_pools, records = self.__process_normal(transactions_without_30_days)
+        with PROFILER.timer('match same day'):
+            transactions_without_same_day = self.__process_same_day(transactions_ascending, matches)
 
-        return hold_pools, records
+        with PROFILER.timer('match 30 days'):
+            transactions_without_30_days = self.__process_30_days(transactions_without_same_day, matches)
 
-    def process(self, transactions: List[Transaction]) -> List[TaxableHoldPool]:
+        with PROFILER.timer('replay'):
+            hold_pools, records = self.__process_normal(transactions_without_30_days)
 
+        return hold_pools, records, matches
+
+    def process_single_asset(self, asset: Asset, transactions: List[Transaction]) -> TaxableHoldPool:
+        with PROFILER.timer(f"asset {asset.symbol} {asset.type}"):
+            hold_pools, taxable_records, match_records = self.__process_single_asset_type(transactions)
+
+        return TaxableHoldPool(asset, hold_pools, taxable_records, match_records)
+
+    def __is_parallel(self, asset_count: int, transaction_count: int) -> bool:
+        if self.workers is not None and self.workers <= 1:
+            return False
+
+        return asset_count > 1 and transaction_count >= self.parallel_threshold
+
+    @staticmethod
+    def __group_by_asset(transactions: List[Transaction]) -> Dict[Asset, List[Transaction]]:
         asset_to_transactions: Dict[Asset, List[Transaction]] = dict()
         for transaction in transactions:
             key = transaction.asset
@@ -140,13 +283,162 @@ class TransactionProcessor(object):
             else:
                 asset_to_transactions[key].append(transaction)
 
-        taxable_hold_pools: List[TaxableHoldPool] = list()
-        for key, value in asset_to_transactions.items():
-            hold_pools, taxable_records = self.__process_single_asset_type(value)
-            taxable_hold_pools.append(
-                TaxableHoldPool(
-                    key, hold_pools, taxable_records
-                )
-            )
+        return asset_to_transactions
+
+    def __process_assets(self, assets: List[Asset], asset_transactions: List[List[Transaction]]) \
+            -> List[TaxableHoldPool]:
+
+        transaction_count = sum(len(x) for x in asset_transactions)
+        if not self.__is_parallel(len(assets), transaction_count):
+            return list(map(self.process_single_asset, assets, asset_transactions))
+
+        # Assets share no state, results are collected in submission order so the output is deterministic
+        workers = self.workers or os.cpu_count() or 1
+        chunk_size = max(1, len(assets) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self.process_single_asset, assets, asset_transactions, chunksize=chunk_size))
+
+    def __process_cached(self, asset: Asset, transactions: List[Transaction]) -> TaxableHoldPool:
+        if self.result_cache is None:
+            return self.process_single_asset(asset, transactions)
+
+        digest = ResultCache.digest(asset, transactions, self.legacy_matching, self.columnar_history)
+        result = self.result_cache.get(digest)
+        if result is None:
+            result = self.process_single_asset(asset, transactions)
+            self.result_cache.put(digest, result)
+
+        return result
+
+    # Assets are matched one at a time as they are read, e.g. from parser.iter_parse_by_asset, so only the trades of
+    # one asset are held in memory. Results are the same as those of process for the same trades
+    def process_by_asset(self, asset_transactions: Iterable[Tuple[Asset, List[Transaction]]]) \
+            -> List[TaxableHoldPool]:
+        return [self.__process_cached(asset, transactions) for asset, transactions in asset_transactions]
+
+    def process(self, transactions: List[Transaction]) -> List[TaxableHoldPool]:
 
-        return taxable_hold_pools
+        asset_to_transactions = self.__group_by_asset(transactions)
+        assets = list(asset_to_transactions.keys())
+        asset_transactions = list(asset_to_transactions.values())
+
+        if self.result_cache is None:
+            return self.__process_assets(assets, asset_transactions)
+
+        digests = [ResultCache.digest(asset, asset_transactions[idx], self.legacy_matching, self.columnar_history)
+                   for idx, asset in enumerate(assets)]
+        results: List[Optional[TaxableHoldPool]] = [self.result_cache.get(x) for x in digests]
+
+        missing = [idx for idx in range(len(assets)) if results[idx] is None]
+        processed = self.__process_assets([assets[x] for x in missing], [asset_transactions[x] for x in missing])
+        for idx, result in zip(missing, processed):
+            self.result_cache.put(digests[idx], result)
+            results[idx] = result
+
+        return results
+
+    @staticmethod
+    def __head(hold_pools: Sequence[HoldPool], size: int) -> Sequence[HoldPool]:
+        if isinstance(hold_pools, HoldHistory):
+            return hold_pools.head(size)
+
+        return list(hold_pools[:size])
+
+    # Trades of the asset to run again, None when nothing was appended since the checkpoint
+    def __resume_from(self, checkpoint: Optional[AssetCheckpoint], transactions: List[Transaction]) \
+            -> Tuple[Optional[AssetCheckpoint], Optional[List[Transaction]]]:
+
+        if checkpoint is None:
+            return None, transactions
+
+        if isinstance(checkpoint.result.hold_pools, HoldHistory) != self.columnar_history:
+            return None, transactions
+
+        appended = checkpoint.appended(transactions)
+        if appended is None:
+            # A trade before the last one was added, changed or removed, the asset is replayed from the start
+            return None, transactions
+
+        if len(appended) <= 0:
+            return checkpoint, None
+
+        # Same day rule is applied again to the whole last day, trades before it are carried in the checkpoint
+        return checkpoint, [x for x in transactions if x.date.date() >= checkpoint.last_date]
+
+    def process_incremental_asset(self, asset: Asset, transactions: List[Transaction],
+                                  checkpoint: Optional[AssetCheckpoint] = None) -> AssetCheckpoint:
+
+        if self.legacy_matching:
+            raise ValueError('Incremental processing is only supported by the sweep matching')
+
+        checkpoint, to_process = self.__resume_from(checkpoint, transactions)
+        if to_process is None:
+            return checkpoint
+
+        if checkpoint is None:
+            pending, hold_pools, records = list(), None, None
+            same_day_matches, matches_30_days = list(), list()
+        else:
+            pending = checkpoint.pending
+            hold_pools = self.__head(checkpoint.result.hold_pools, checkpoint.settled_pools)
+            records = checkpoint.result.taxable_records[:checkpoint.settled_records]
+            same_day_matches, matches_30_days = checkpoint.settled_match_records()
+
+        to_process_ascending = sorted(to_process, key=lambda x: x.date)
+        without_same_day = self.__process_same_day(to_process_ascending, same_day_matches)
+
+        # Pending trades all precede the last day, so the concatenation stays in date order
+        candidates = pending + without_same_day
+
+        last_moment = to_process_ascending[-1].date
+        last_date = last_moment.date()
+        # Disposals before open_at can not reach the trades appended later, trades before settled_at can not be
+        # reached by any disposal still to be matched
+        open_at = last_date - timedelta(days=30)
+        settled_at = open_at - timedelta(days=30)
+
+        matched_closed = self.__sweep_x_days(candidates, 30, until=open_at, matches=matches_30_days)
+        settled_matches = len(matches_30_days)
+        # Disposals before open_at were fully matched above, the second pass only adds pairings of the open window
+        without_30_days = self.__sweep_x_days(matched_closed, 30, matches=matches_30_days)
+
+        settled = [x for x in without_30_days if x.date.date() < settled_at]
+        unsettled = [x for x in without_30_days if x.date.date() >= settled_at]
+
+        hold_pools, records = self.__process_normal(settled, hold_pools, records)
+        settled_pools, settled_records = len(hold_pools), len(records)
+        hold_pools, records = self.__process_normal(unsettled, self.__head(hold_pools, settled_pools), list(records))
+
+        # Same day pairings are in date order, those before the last day are settled
+        settled_same_day = sum(1 for x in same_day_matches if x.sell_date.date() < last_date)
+
+        return AssetCheckpoint(
+            TaxableHoldPool(asset, hold_pools, records, same_day_matches + matches_30_days),
+            settled_pools,
+            settled_records,
+            settled_same_day,
+            settled_matches,
+            settled_at,
+            last_date,
+            [x for x in matched_closed if settled_at <= x.date.date() < last_date],
+            transactions_digest(x for x in transactions if x.date < last_moment),
+            last_moment,
+            [transaction_key(x) for x in transactions if x.date == last_moment]
+        )
+
+    # Only assets with appended trades are matched again, and only from the last open 30 days window
+    def process_incremental(self, transactions: List[Transaction], checkpoints: Dict[Asset, AssetCheckpoint]) \
+            -> Tuple[List[TaxableHoldPool], Dict[Asset, AssetCheckpoint]]:
+
+        return self.process_incremental_by_asset(self.__group_by_asset(transactions).items(), checkpoints)
+
+    # Incremental counterpart of process_by_asset
+    def process_incremental_by_asset(self, asset_transactions: Iterable[Tuple[Asset, List[Transaction]]],
+                                     checkpoints: Dict[Asset, AssetCheckpoint]) \
+            -> Tuple[List[TaxableHoldPool], Dict[Asset, AssetCheckpoint]]:
+
+        new_checkpoints: Dict[Asset, AssetCheckpoint] = dict()
+        for asset, transactions in asset_transactions:
+            new_checkpoints[asset] = self.process_incremental_asset(asset, transactions, checkpoints.get(asset))
+
+        return [x.result for x in new_checkpoints.values()], new_checkpoints
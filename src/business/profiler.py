@@ -0,0 +1,109 @@
+import threading
+import time
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Union
+
+
+class Timer(object):
+    __slots__ = ('profiler', 'name', 'started_at')
+
+    def __init__(self, profiler: 'Profiler', name: str):
+        self.profiler = profiler
+        self.name = name
+        self.started_at = 0.0
+
+    def __enter__(self):
+        self.started_at = self.profiler.clock()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.record(self.name, self.profiler.clock() - self.started_at)
+        return False
+
+
+# Wall clock timings and counters of a run
+# Disabled by default, then timer hands out one shared no-op context and count returns straight away, callers in
+# hot loops check enabled first to skip even building the name
+class Profiler(object):
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self.clock = clock
+        self.enabled = False
+        # Name to [calls, total seconds, longest seconds]
+        self.timings: Dict[str, List[float]] = dict()
+        self.counters: Dict[str, Union[int, float]] = dict()
+        # Fetcher threads count concurrently
+        self.lock = threading.Lock()
+        self.disabled_timer = nullcontext()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self.lock:
+            self.timings.clear()
+            self.counters.clear()
+
+    def timer(self, name: str):
+        if not self.enabled:
+            return self.disabled_timer
+
+        return Timer(self, name)
+
+    def record(self, name: str, seconds: float):
+        with self.lock:
+            timing = self.timings.get(name)
+            if timing is None:
+                self.timings[name] = [1, seconds, seconds]
+            else:
+                timing[0] += 1
+                timing[1] += seconds
+                timing[2] = max(timing[2], seconds)
+
+    def count(self, name: str, amount: Union[int, float] = 1):
+        if not self.enabled:
+            return
+
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    # Keeps the highest value seen, e.g. a recursion depth
+    def maximum(self, name: str, value: Union[int, float]):
+        if not self.enabled:
+            return
+
+        with self.lock:
+            self.counters[name] = max(self.counters.get(name, value), value)
+
+    # Timers with the longest total first, only the first limit of them are listed
+    def summary(self, limit: int = 30) -> str:
+        with self.lock:
+            timings = sorted(self.timings.items(), key=lambda x: x[1][1], reverse=True)
+            counters = sorted(self.counters.items())
+
+        name_width = max([len(x[0]) for x in timings[:limit]] + [len(x[0]) for x in counters] + [len('Timer')])
+        lines = [f"{'Timer':<{name_width}} {'Calls':>10} {'Total sec':>12} {'Max sec':>12}"]
+        for name, (calls, total, longest) in timings[:limit]:
+            lines.append(f"{name:<{name_width}} {calls:>10} {total:>12.4f} {longest:>12.4f}")
+
+        if len(timings) > limit:
+            lines.append(f"... {len(timings) - limit} more timers")
+
+        if len(counters) <= 0:
+            return "\n".join(lines)
+
+        lines.append("")
+        lines.append(f"{'Counter':<{name_width}} {'Value':>10}")
+        for name, value in counters:
+            text = f"{value:.4f}" if isinstance(value, float) else str(value)
+            lines.append(f"{name:<{name_width}} {text:>10}")
+
+        return "\n".join(lines)
+
+
+# Shared by the whole run, main.py --profile enables it
+# Worker processes have their own copy, timings and counts of assets matched in parallel are not collected
+PROFILER = Profiler()
@@ -0,0 +1,75 @@
+import threading
+import time
+from typing import Callable, List
+
+from src.business.profiler import PROFILER
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class TokenBucket(object):
+
+    def __init__(self, capacity: int, period_sec: float, clock: Callable[[], float]):
+        # Starts full, so the first calls of a run go out without waiting
+        self.capacity = float(capacity)
+        self.refill_per_sec = capacity / period_sec
+        self.tokens = float(capacity)
+        self.clock = clock
+        self.updated_at = clock()
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_sec)
+        self.updated_at = now
+
+    def wait_sec(self) -> float:
+        self.refill()
+        if self.tokens >= 1.0:
+            return 0.0
+
+        return (1.0 - self.tokens) / self.refill_per_sec
+
+    def take(self):
+        self.refill()
+        self.tokens -= 1.0
+
+
+class RateLimiter(object):
+
+    # Buckets keep time with their own clock
+    def __init__(self, buckets: List[TokenBucket], max_wait_sec: float = 300.0,
+                 sleep: Callable[[float], None] = time.sleep, log: Callable[[str], None] = print):
+        self.buckets = buckets
+        self.max_wait_sec = max_wait_sec
+        self.sleep = sleep
+        self.log = log
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def per_minute_and_day(per_minute: int, per_day: int, max_wait_sec: float = 300.0,
+                           clock: Callable[[], float] = time.monotonic,
+                           sleep: Callable[[float], None] = time.sleep,
+                           log: Callable[[str], None] = print) -> 'RateLimiter':
+        return RateLimiter(
+            [TokenBucket(per_minute, 60.0, clock), TokenBucket(per_day, 24 * 60 * 60.0, clock)],
+            max_wait_sec, sleep, log
+        )
+
+    def acquire(self):
+        # Callers queue up on the lock, only the request itself runs concurrently
+        with self.lock:
+            wait_sec = max(x.wait_sec() for x in self.buckets)
+
+            # Waiting out a daily budget would stall the run for hours, fail fast instead
+            if wait_sec > self.max_wait_sec:
+                raise RateLimitExceeded(f"Request budget exhausted, next request possible in {wait_sec:.0f} sec")
+
+            if wait_sec > 0:
+                self.log(f"Avoiding throttling for {wait_sec:.1f} sec")
+                self.sleep(wait_sec)
+                PROFILER.count('throttle sleep sec', wait_sec)
+
+            for bucket in self.buckets:
+                bucket.take()
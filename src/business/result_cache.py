@@ -0,0 +1,134 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+from typing import Callable, List, Optional
+
+from config import RESULT_CACHE_MAX_SIZE, RESULT_CACHE_MAX_AGE, TAX_PERIOD
+from src.business.checkpoint import transaction_key
+from src.business.profiler import PROFILER
+from src.model.hold_pool import TaxableHoldPool
+from src.model.transaction import Asset, Transaction
+
+
+class ResultCache(object):
+
+    FILENAME = 'results.sqlite'
+    # Part of every digest, bump it when a change to the processing makes stored results stale
+    VERSION = 3
+    LOCK_TIMEOUT_SEC = 60.0
+
+    def __init__(self, directory: str, max_size: int = RESULT_CACHE_MAX_SIZE,
+                 max_age: timedelta = RESULT_CACHE_MAX_AGE, clock: Callable[[], float] = time.time):
+        self.directory = directory
+        self.max_size = max_size
+        self.max_age = max_age
+        self.clock = clock
+        self.lock = threading.RLock()
+        # Opened on first use, a cache handed to a worker process opens its own connection there
+        self.connection: Optional[sqlite3.Connection] = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['lock'] = None
+        state['connection'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+
+    def __connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            os.makedirs(self.directory, exist_ok=True)
+            # Processes of a batch share the file, a writer waits for the others instead of failing at once
+            self.connection = sqlite3.connect(os.path.join(self.directory, ResultCache.FILENAME),
+                                              timeout=ResultCache.LOCK_TIMEOUT_SEC, check_same_thread=False)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS result ("
+                "digest TEXT NOT NULL PRIMARY KEY, result BLOB NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+            self.connection.commit()
+
+        return self.connection
+
+    # Hash of str is salted per process, the digest has to be stable between runs
+    @staticmethod
+    def digest(asset: Asset, transactions: List[Transaction], *options) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{ResultCache.VERSION}|{TAX_PERIOD}|{options}|{asset.group}|{asset.symbol}|{asset.type}\n"
+                      .encode())
+
+        # Trades at the same moment are matched in the order they were read, which a stable sort keeps
+        for transaction in sorted(transactions, key=lambda x: x.date):
+            digest.update(transaction_key(transaction).encode())
+            digest.update(b"\n")
+
+        return digest.hexdigest()
+
+    def get(self, digest: str) -> Optional[TaxableHoldPool]:
+        with self.lock:
+            connection = self.__connect()
+            row = connection.execute(
+                "SELECT result, created_at FROM result WHERE digest = ?", (digest,)
+            ).fetchone()
+
+            if row is None:
+                PROFILER.count('result cache misses')
+                return None
+
+            now = self.clock()
+            if now - row[1] > self.max_age.total_seconds():
+                connection.execute("DELETE FROM result WHERE digest = ?", (digest,))
+                connection.commit()
+                PROFILER.count('result cache misses')
+                return None
+
+            PROFILER.count('result cache hits')
+            connection.execute("UPDATE result SET used_at = ? WHERE digest = ?", (now, digest))
+            connection.commit()
+            return pickle.loads(row[0])
+
+    def put(self, digest: str, result: TaxableHoldPool):
+        blob = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+
+        with self.lock:
+            connection = self.__connect()
+            now = self.clock()
+            connection.execute(
+                "INSERT OR REPLACE INTO result (digest, result, size, created_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                (digest, blob, len(blob), now, now)
+            )
+            self.__evict(connection, now)
+            connection.commit()
+
+    def size(self) -> int:
+        with self.lock:
+            return self.__connect().execute("SELECT COALESCE(SUM(size), 0) FROM result").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def __evict(self, connection: sqlite3.Connection, now: float):
+        connection.execute("DELETE FROM result WHERE created_at < ?", (now - self.max_age.total_seconds(),))
+
+        total_size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM result").fetchone()[0]
+        if total_size <= self.max_size:
+            return
+
+        to_delete = list()
+        for digest, size in connection.execute("SELECT digest, size FROM result ORDER BY used_at, created_at"):
+            if total_size <= self.max_size:
+                break
+
+            to_delete.append((digest,))
+            total_size -= size
+
+        connection.executemany("DELETE FROM result WHERE digest = ?", to_delete)
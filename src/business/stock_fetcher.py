@@ -1,37 +1,51 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from datetime import date
 from decimal import Decimal
-from time import sleep
+from typing import Callable, Optional, Iterable, Dict, Tuple
 
 import requests
 
-ASSET_VALUE_LOOKUP_GBP = {
-    'VAUG': Decimal('90.72'),
-    'AMZN': Decimal('179.35'),
-    'GOOGL': Decimal('157.31'),
-    'MSFT': Decimal('343.19'),
-    'TSLA': Decimal('326.36'),
-    'NVDA': Decimal('111.33'),
-    'AAPL': Decimal('194.02'),
-    'SPXP': Decimal('941.55'),
-    'BTC':  Decimal('77364.07'),
-    'ETH':  Decimal('2696.55'),
-    'LTC':  Decimal('84.68'),
-}
+from src.business.price_cache import PriceCache
+from src.business.price_source import PriceSource, PriceSeries, default_price_source, ASSET_VALUE_LOOKUP_GBP
+from src.business.profiler import PROFILER
+from src.business.rate_limiter import RateLimiter
+from src.model.transaction import Asset
 
 
 class StockFetcher(object):
 
-    # Free account 5 request per minute
-    THROTTLE_TPS = 5.0 / 60.0
+    # Free account limits
+    REQUESTS_PER_MINUTE = 5
+    REQUESTS_PER_DAY = 25
 
-    def __init__(self, api_key):
+    def __init__(self, api_key, price_cache: Optional[PriceCache] = None, rate_limiter: Optional[RateLimiter] = None,
+                 price_source: Optional[PriceSource] = None, log: Callable[[str], None] = print):
         self.api_key = api_key
-
-    def get_price(self, asset):
-        if asset.symbol in ASSET_VALUE_LOOKUP_GBP:
-            return ASSET_VALUE_LOOKUP_GBP[asset.symbol]
-
-        return Decimal(0.0)
-
+        # Sources tried in order by get_price, the HTTP source in the chain calls back into get_market_price
+        self.price_source = price_source if price_source is not None else default_price_source(self)
+        self.price_cache = price_cache
+        # Every HTTP request goes through the limiter, pass the same one to share the budget between fetchers
+        self.rate_limiter = rate_limiter if rate_limiter is not None else \
+            RateLimiter.per_minute_and_day(StockFetcher.REQUESTS_PER_MINUTE, StockFetcher.REQUESTS_PER_DAY, log=log)
+        # FX rate is fetched at most once per run and shared by all US stocks
+        self.usd_to_gbp: Optional[Decimal] = None
+        self.usd_to_gbp_lock = threading.Lock()
+        # One connection pool for all requests
+        self.session = requests.Session()
+        # Full daily series are downloaded once per symbol and run, historical prices are then served from memory
+        # The lock only guards the dict, the first caller of a symbol downloads it and others wait on its future
+        self.series: Dict[Tuple[str, str], Future] = dict()
+        self.series_lock = threading.Lock()
+
+    def get_price(self, asset, as_of: Optional[date] = None):
+        price = self.price_source.get_price(asset, as_of)
+        if price is None:
+            return Decimal(0.0)
+
+        return price
+
+    def get_market_price(self, asset):
         if asset.symbol == 'VAUG':
             return self.get_uk_stock_price(asset.symbol)
 
@@ -45,12 +59,52 @@ class StockFetcher(object):
 
         raise ValueError(f"Supported type not supported, {asset}")
 
+    def get_historical_price(self, asset, as_of: date) -> Optional[Decimal]:
+        if asset.symbol == 'VAUG':
+            return self.get_stock_series(asset.symbol + ".LON").find(as_of)
+
+        if asset.type == 'STOCK':
+            us_price = self.get_stock_series(asset.symbol).find(as_of)
+            usd_to_gbp = self.get_usd_to_gbp_series().find(as_of)
+            if us_price is None or usd_to_gbp is None:
+                return None
+
+            return us_price * usd_to_gbp
+
+        if asset.type == 'CRYPTO':
+            return self.get_crypto_series(asset.symbol).find(as_of)
+
+        raise ValueError(f"Supported type not supported, {asset}")
+
+    def get_stock_series(self, asset_code) -> PriceSeries:
+        url = f"https://www.alphavantage.co/query?function=TIME_SERIES_DAILY&symbol={asset_code}&apikey={self.api_key}&outputsize=full"
+        return self.__series(asset_code, 'STOCK', url, 'Time Series (Daily)')
+
+    def get_crypto_series(self, asset) -> PriceSeries:
+        url = f"https://www.alphavantage.co/query?function=DIGITAL_CURRENCY_DAILY&symbol={asset}&market=GBP&apikey={self.api_key}"
+        return self.__series(asset, 'CRYPTO', url, 'Time Series (Digital Currency Daily)')
+
+    def get_usd_to_gbp_series(self) -> PriceSeries:
+        url = f"https://www.alphavantage.co/query?function=FX_DAILY&from_symbol=USD&to_symbol=GBP&apikey={self.api_key}&outputsize=full"
+        return self.__series('USD/GBP', 'FX', url, 'Time Series FX (Daily)')
+
+    def get_prices(self, assets: Iterable[Asset], as_of: Optional[date] = None, workers: int = 4) \
+            -> Dict[Asset, Decimal]:
+        # Requests are still paced by the rate limiter, the threads overlap the network round trips
+        distinct_assets = list(dict.fromkeys(assets))
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            prices = executor.map(lambda x: self.get_price(x, as_of), distinct_assets)
+            return dict(zip(distinct_assets, prices))
+
     def get_uk_stock_price(self, asset_code):
         return self.get_us_stock_price(asset_code + ".LON")
 
     def get_us_stock_price(self, asset_code):
+        return self.__cached(asset_code, 'STOCK', lambda: self.__fetch_us_stock_price(asset_code))
+
+    def __fetch_us_stock_price(self, asset_code):
         url = f"https://www.alphavantage.co/query?function=TIME_SERIES_DAILY&symbol={asset_code}&apikey={self.api_key}&outputsize=compact"
-        response = requests.get(url)
+        response = self.__get(url)
         body = response.json()
 
         try:
@@ -58,7 +112,6 @@ class StockFetcher(object):
             latest_key = list(time_series.keys())[0]
             close = time_series[latest_key]['4. close']
 
-            self.__throttle()
             return Decimal(close)
         except Exception as ex:
             print("Failed for asset: " + str(asset_code))
@@ -66,36 +119,93 @@ class StockFetcher(object):
             raise ex
 
     def get_crypto_price(self, asset):
+        return self.__cached(asset, 'CRYPTO', lambda: self.__fetch_crypto_price(asset))
+
+    def __fetch_crypto_price(self, asset):
         url = f"https://www.alphavantage.co/query?function=CURRENCY_EXCHANGE_RATE&from_currency={asset}&to_currency=GBP&apikey={self.api_key}"
-        response = requests.get(url)
+        response = self.__get(url)
         body = response.json()
 
         try:
             rate_details = body['Realtime Currency Exchange Rate']
             rate = rate_details['5. Exchange Rate']
 
-            self.__throttle()
             return Decimal(rate)
         except Exception as ex:
             print(body)
             raise ex
 
     def get_usd_to_gbp(self):
+        with self.usd_to_gbp_lock:
+            if self.usd_to_gbp is None:
+                self.usd_to_gbp = self.__cached('USD/GBP', 'FX', self.__fetch_usd_to_gbp)
+
+        return self.usd_to_gbp
+
+    def __fetch_usd_to_gbp(self):
         url = f"https://www.alphavantage.co/query?function=CURRENCY_EXCHANGE_RATE&from_currency=USD&to_currency=GBP&apikey={self.api_key}"
-        response = requests.get(url)
+        response = self.__get(url)
         body = response.json()
 
         try:
             rate_details = response.json()['Realtime Currency Exchange Rate']
             rate = rate_details['5. Exchange Rate']
 
-            self.__throttle()
             return Decimal(rate)
         except Exception as ex:
             print(body)
             raise ex
 
-    def __throttle(self):
-        delay_sec = 1.0 / StockFetcher.THROTTLE_TPS
-        print(f"Avoiding throttling for {delay_sec} sec")
-        sleep(delay_sec)
+    def __series(self, symbol: str, type: str, url: str, series_key: str) -> PriceSeries:
+        key = (symbol, type)
+        with self.series_lock:
+            future = self.series.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = self.series[key] = Future()
+
+        if is_owner:
+            try:
+                future.set_result(self.__fetch_series(symbol, url, series_key))
+            except Exception as ex:
+                # A failed download is not kept, the next call tries again
+                with self.series_lock:
+                    del self.series[key]
+                future.set_exception(ex)
+
+        return future.result()
+
+    def __fetch_series(self, symbol: str, url: str, series_key: str) -> PriceSeries:
+        response = self.__get(url)
+        body = response.json()
+
+        try:
+            rows = list()
+            for day, values in body[series_key].items():
+                # Digital currency series name the close after the market, e.g. "4a. close (GBP)"
+                close = values['4. close'] if '4. close' in values else values['4a. close (GBP)']
+                rows.append((date.fromisoformat(day), Decimal(close)))
+
+            return PriceSeries.from_rows(rows)
+        except Exception as ex:
+            print("Failed for asset: " + str(symbol))
+            print(body)
+            raise ex
+
+    def __cached(self, symbol: str, type: str, fetch: Callable[[], Decimal]) -> Decimal:
+        if self.price_cache is None:
+            return fetch()
+
+        today = self.price_cache.today()
+        price = self.price_cache.get(symbol, type, today)
+        if price is None:
+            price = fetch()
+            self.price_cache.put(symbol, type, today, price)
+
+        return price
+
+    def __get(self, url):
+        self.rate_limiter.acquire()
+        PROFILER.count('http calls')
+        with PROFILER.timer('http'):
+            return self.session.get(url)
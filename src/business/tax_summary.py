@@ -0,0 +1,65 @@
+from decimal import Decimal
+from typing import List, Dict, Tuple, Optional, Union
+
+from config import TAX_RATES
+from src.model.hold_pool import TaxableHoldPool
+from src.model.tax import TaxableRecord, TaxRate, tax_year_key_of
+from src.model.transaction import Asset
+
+
+# Taxable records of a single tax year, with the income and tax derived from them
+# Assets keep the order of the hold pools they came from, records the order they were disposed in
+class TaxYearSummary(object):
+
+    def __init__(self, tax_year: str, asset_records: List[Tuple[Asset, List[TaxableRecord]]]):
+        self.tax_year = tax_year
+        self.tax_year_key = tax_year_key_of(tax_year)
+        self.asset_records = asset_records
+        self.records = [record for _, records in asset_records for record in records]
+
+        self.total: TaxableRecord = TaxableRecord.as_taxable_income(tax_year, self.records)
+        self.tax_rate: TaxRate = TAX_RATES[tax_year]
+        self.tax_to_pay: Union[int, Decimal] = self.tax_rate.calculate_tax_to_pay(self.total.amount) \
+            if self.total.is_gain() else 0
+
+    def __repr__(self) -> str:
+        return f"TaxYearSummary(tax_year={self.tax_year},total={self.total},tax_to_pay={self.tax_to_pay})"
+
+
+# Taxable records grouped by tax year and asset in a single pass, shared by everything that reports per tax year
+# Grouped and sorted on the integer tax year keys, labels are only carried along
+class TaxSummary(object):
+
+    def __init__(self, years: List[TaxYearSummary]):
+        self.years = years
+        self.__tax_year_to_summary: Dict[int, TaxYearSummary] = {x.tax_year_key: x for x in years}
+
+    @staticmethod
+    def of(taxable_hold_pools: List[TaxableHoldPool]) -> 'TaxSummary':
+        tax_year_to_asset_records: Dict[int, List[Tuple[Asset, List[TaxableRecord]]]] = dict()
+        tax_year_to_label: Dict[int, str] = dict()
+
+        for taxable_hold_pool in taxable_hold_pools:
+            tax_year_to_records: Dict[int, List[TaxableRecord]] = dict()
+
+            for taxable_record in taxable_hold_pool.taxable_records:
+                key = taxable_record.tax_year_key
+                records = tax_year_to_records.get(key)
+                if records is None:
+                    records = tax_year_to_records[key] = list()
+                    tax_year_to_label[key] = taxable_record.tax_year
+                    tax_year_to_asset_records.setdefault(key, list()).append((taxable_hold_pool.asset, records))
+
+                records.append(taxable_record)
+
+        return TaxSummary([TaxYearSummary(tax_year_to_label[x], tax_year_to_asset_records[x])
+                           for x in sorted(tax_year_to_asset_records)])
+
+    def tax_year(self, tax_year: Union[str, int]) -> Optional[TaxYearSummary]:
+        return self.__tax_year_to_summary.get(tax_year if isinstance(tax_year, int) else tax_year_key_of(tax_year))
+
+    def __iter__(self):
+        return iter(self.years)
+
+    def __len__(self):
+        return len(self.years)
@@ -0,0 +1,202 @@
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+from decimal import Decimal
+from operator import mul, sub
+from typing import List, Optional, Dict
+
+from src.business.price_source import PriceSeries
+from src.model.hold_pool import HoldPool, HoldHistory, TaxableHoldPool, join_decimal
+from src.model.transaction import Asset
+
+
+# Section 104 hold pool of one asset at the end of every day from start on, one entry per day in every column
+# Volume and cost are None before the first trade of the asset
+class DailyHoldSeries(object):
+
+    def __init__(self, asset: Asset, start: date, volumes: List[Optional[Decimal]], costs: List[Optional[Decimal]]):
+        self.asset = asset
+        self.start = start
+        self.volumes = volumes
+        self.costs = costs
+
+    def dates(self) -> List[date]:
+        first = self.start.toordinal()
+        return [date.fromordinal(x) for x in range(first, first + len(self))]
+
+    # Last close on or before every day, None until the series has one
+    # Walks the closes within the range rather than the days, a close holds until the next one
+    def prices(self, price_series: PriceSeries) -> List[Optional[Decimal]]:
+        first = self.start.toordinal()
+        last = first + len(self) - 1
+        price_dates, price_values = price_series.dates, price_series.values
+
+        low = bisect_right(price_dates, first)
+        high = bisect_right(price_dates, last)
+        price = price_values[low - 1] if low > 0 else None
+
+        prices = list()
+        day = first
+        for index in range(low, high):
+            run = price_dates[index] - day
+            if run == 1:
+                prices.append(price)
+            elif run > 1:
+                prices.extend([price] * run)
+
+            price = price_values[index]
+            day = price_dates[index]
+
+        prices.extend([price] * (last + 1 - day))
+        return prices
+
+    # Volumes are None only before the first trade and prices only before the first close, so past this many days
+    # there are no gaps and whole columns are multiplied at once
+    @staticmethod
+    def __leading_none(values: List[Optional[Decimal]]) -> int:
+        for index, value in enumerate(values):
+            if value is not None:
+                return index
+
+        return len(values)
+
+    def market_values(self, price_series: PriceSeries) -> List[Optional[Decimal]]:
+        prices = self.prices(price_series)
+        valued_from = max(self.__leading_none(self.volumes), self.__leading_none(prices))
+
+        market_values: List[Optional[Decimal]] = [None] * valued_from
+        market_values.extend(map(mul, self.volumes[valued_from:], prices[valued_from:]))
+        return market_values
+
+    # Gain, or loss when negative, if the whole pool had been disposed at the close of the day
+    def unrealised_gains(self, price_series: PriceSeries) -> List[Optional[Decimal]]:
+        prices = self.prices(price_series)
+        valued_from = max(self.__leading_none(self.volumes), self.__leading_none(prices))
+
+        gains: List[Optional[Decimal]] = [None] * valued_from
+        gains.extend(map(sub, map(mul, self.volumes[valued_from:], prices[valued_from:]), self.costs[valued_from:]))
+        return gains
+
+    def __len__(self):
+        return len(self.volumes)
+
+    def __repr__(self) -> str:
+        return f"DailyHoldSeries(asset={self.asset},start={self.start},size={len(self)})"
+
+
+# Every snapshot of the Section 104 hold pool of one asset, in columns ordered by time
+# Snapshots are looked up by moment for intraday queries and by calendar day of the moment for daily ones
+class HoldSeries(object):
+
+    def __init__(self, asset: Asset, moments: List[datetime], volumes: List[Decimal], costs: List[Decimal],
+                 days: Optional[List[int]] = None):
+        self.asset = asset
+        self.moments = moments
+        self.volumes = volumes
+        self.costs = costs
+        # Ordinal of the day of every snapshot
+        self.days = [x.toordinal() for x in moments] if days is None else days
+
+    @staticmethod
+    def of(taxable_hold_pool: TaxableHoldPool) -> 'HoldSeries':
+        hold_pools = taxable_hold_pool.hold_pools
+        if isinstance(hold_pools, HoldHistory):
+            # Columns are taken over as they are, no HoldPool is built
+            return HoldSeries(
+                taxable_hold_pool.asset,
+                list(hold_pools.dates),
+                list(map(join_decimal, hold_pools.volume_coefficients, hold_pools.volume_exponents)),
+                list(map(join_decimal, hold_pools.cost_coefficients, hold_pools.cost_exponents))
+            )
+
+        return HoldSeries(
+            taxable_hold_pool.asset,
+            [x.date for x in hold_pools],
+            [x.volume for x in hold_pools],
+            [x.cost for x in hold_pools]
+        )
+
+    def __hold_pool(self, index: int) -> Optional[HoldPool]:
+        if index < 0:
+            return None
+
+        return HoldPool(self.moments[index], self.asset, self.volumes[index], self.costs[index], pool_index=index)
+
+    # State after the last trade at or before the moment, None before the first trade
+    def as_of(self, moment: datetime) -> Optional[HoldPool]:
+        return self.__hold_pool(bisect_right(self.moments, moment) - 1)
+
+    # State at the end of the day
+    def on(self, day: date) -> Optional[HoldPool]:
+        return self.__hold_pool(bisect_right(self.days, day.toordinal()) - 1)
+
+    # Snapshots taken from start to end, both included
+    def between(self, start: datetime, end: datetime) -> 'HoldSeries':
+        low = bisect_left(self.moments, start)
+        high = bisect_right(self.moments, end)
+        return HoldSeries(self.asset, self.moments[low:high], self.volumes[low:high], self.costs[low:high],
+                          self.days[low:high])
+
+    # State at the end of every day from start to end, both included
+    # A state is repeated for the run of days until the next trade, so the cost is per trade rather than per day
+    def daily(self, start: date, end: date) -> DailyHoldSeries:
+        first, last = start.toordinal(), end.toordinal()
+        if last < first:
+            raise ValueError(f"Range has to end on or after its start, got: {start} - {end}")
+
+        days = self.days
+        volumes: List[Optional[Decimal]] = list()
+        costs: List[Optional[Decimal]] = list()
+
+        day = first
+        while day <= last:
+            index = bisect_right(days, day) - 1
+            changed_at = days[index + 1] if index + 1 < len(days) else last + 1
+            run = min(changed_at, last + 1) - day
+
+            if index < 0:
+                volumes.extend([None] * run)
+                costs.extend([None] * run)
+            else:
+                volumes.extend([self.volumes[index]] * run)
+                costs.extend([self.costs[index]] * run)
+
+            day += run
+
+        return DailyHoldSeries(self.asset, start, volumes, costs)
+
+    def __len__(self):
+        return len(self.moments)
+
+    def __repr__(self) -> str:
+        return f"HoldSeries(asset={self.asset},size={len(self)})"
+
+
+# Hold series of all assets of a portfolio
+# Prices are given per symbol, e.g. from FilePriceSource.get_series, assets without prices are left out of valuations
+class PortfolioTimeSeries(object):
+
+    def __init__(self, series: Dict[Asset, HoldSeries]):
+        self.series = series
+
+    @staticmethod
+    def of(taxable_hold_pools: List[TaxableHoldPool]) -> 'PortfolioTimeSeries':
+        return PortfolioTimeSeries({x.asset: HoldSeries.of(x) for x in taxable_hold_pools})
+
+    # Assets traded at or before the moment
+    def as_of(self, moment: datetime) -> Dict[Asset, HoldPool]:
+        hold_pools = {asset: series.as_of(moment) for asset, series in self.series.items()}
+        return {asset: hold_pool for asset, hold_pool in hold_pools.items() if hold_pool is not None}
+
+    def daily(self, start: date, end: date) -> Dict[Asset, DailyHoldSeries]:
+        return {asset: series.daily(start, end) for asset, series in self.series.items()}
+
+    def unrealised_gains(self, start: date, end: date, prices: Dict[str, PriceSeries]) \
+            -> Dict[Asset, List[Optional[Decimal]]]:
+        return {asset: series.daily(start, end).unrealised_gains(prices[asset.symbol])
+                for asset, series in self.series.items() if asset.symbol in prices}
+
+    def __getitem__(self, asset: Asset) -> HoldSeries:
+        return self.series[asset]
+
+    def __len__(self):
+        return len(self.series)
@@ -1,22 +1,50 @@
 import uuid
+from array import array
 from datetime import datetime
 from decimal import Decimal
 
 
 # Section 104 hold pool
 # Immutable object
-from typing import Tuple, List
+from typing import Tuple, List, Optional, Sequence
 
 from config import TAX_PERIOD
-from src.model.tax import TaxableRecord
+from src.model.tax import TaxableRecord, MatchRecord
 from src.model.transaction import Transaction, Asset
 
 
+# Exact integer coefficient and exponent of a finite decimal, value == coefficient * 10 ** exponent
+def split_decimal(value: Decimal) -> Tuple[int, int]:
+    # Without an exponent the text of a finite decimal holds exactly its coefficient digits, reading them back is
+    # much faster than as_tuple
+    text = str(value)
+    if 'E' not in text and text[-1].isdigit():
+        integer, _, fraction = text.partition('.')
+        return int(integer + fraction), -len(fraction)
+
+    exponent = value.as_tuple().exponent
+    if not isinstance(exponent, int):
+        raise ValueError(f"Only finite values can be stored, got: {value}")
+
+    numerator, denominator = value.as_integer_ratio()
+    if exponent >= 0:
+        return numerator // 10 ** exponent, exponent
+
+    return numerator * 10 ** -exponent // denominator, exponent
+
+
+def join_decimal(coefficient: int, exponent: int) -> Decimal:
+    return Decimal(f"{coefficient}E{exponent}")
+
+
 class HoldPool(object):
+    __slots__ = ('pool_id', 'pool_index', 'date', 'asset', 'volume', 'cost')
 
-    def __init__(self, date: datetime, asset: Asset, volume: Decimal, cost: Decimal):
-        self.pool_id = uuid.uuid4()
-        self.pool_index = 0
+    def __init__(self, date: datetime, asset: Asset, volume: Decimal, cost: Decimal,
+                 pool_id: Optional[uuid.UUID] = None, pool_index: int = 0):
+        # Only a new pool gets a fresh id, snapshots carry over the id of the pool they were derived from
+        self.pool_id = uuid.uuid4() if pool_id is None else pool_id
+        self.pool_index = pool_index
         self.date = date
         self.asset = asset
         self.volume = volume
@@ -39,12 +67,11 @@ class HoldPool(object):
             transaction.date,
             transaction.asset,
             new_volume,
-            new_cost
+            new_cost,
+            self.pool_id,
+            self.pool_index + 1
         )
 
-        new_pool.pool_id = self.pool_id
-        new_pool.pool_index = self.pool_index + 1
-
         return new_pool
 
     def dispose(self, transaction: Transaction) -> Tuple['HoldPool', TaxableRecord]:
@@ -65,18 +92,20 @@ class HoldPool(object):
             transaction.date,
             transaction.asset,
             new_volume,
-            new_cost
+            new_cost,
+            self.pool_id,
+            self.pool_index + 1
         )
-        new_pool.pool_id = self.pool_id
-        new_pool.pool_index = self.pool_index + 1
 
         transaction_cost_per_unit = transaction.taxable_price
         amount = (transaction_cost_per_unit - hold_cost_per_unit) * transaction.volume
+        tax_year_key = TAX_PERIOD.tax_year_key(transaction.date)
         new_record = TaxableRecord(
             transaction.date,
-            TAX_PERIOD.tax_year(transaction.date),
+            TAX_PERIOD.label(tax_year_key),
             "GAIN" if amount > 0 else "LOSS",
-            abs(amount)
+            abs(amount),
+            tax_year_key
         )
 
         return new_pool, new_record
@@ -95,16 +124,92 @@ class HoldPool(object):
     def __hash__(self):
         return hash((self.date, self.asset, self.volume, self.cost))
 
+    def __reduce__(self):
+        return HoldPool, (self.date, self.asset, self.volume, self.cost, self.pool_id, self.pool_index)
+
     def __repr__(self) -> str:
         return f"HoldPool(date={self.date},asset={self.asset},volume={self.volume},cost={self.cost})"
 
 
+# History of a single Section 104 hold pool
+# Keeps dates, volumes and costs in columns instead of one HoldPool per snapshot, decimals are stored
+# exactly as an integer coefficient plus an exponent array. HoldPool objects are only built when an item is read
+class HoldHistory(Sequence):
+
+    def __init__(self, asset: Asset, pool_id: Optional[uuid.UUID] = None):
+        self.asset = asset
+        self.pool_id = pool_id
+        self.dates: List[datetime] = list()
+        self.volume_coefficients: List[int] = list()
+        self.volume_exponents = array('i')
+        self.cost_coefficients: List[int] = list()
+        self.cost_exponents = array('i')
+
+    def append(self, hold_pool: HoldPool):
+        if hold_pool.asset != self.asset:
+            raise ValueError("History is only allowed for the same asset")
+
+        if self.pool_id is None:
+            self.pool_id = hold_pool.pool_id
+        elif hold_pool.pool_id != self.pool_id:
+            raise ValueError("History is only allowed for the same pool")
+
+        volume_coefficient, volume_exponent = split_decimal(hold_pool.volume)
+        cost_coefficient, cost_exponent = split_decimal(hold_pool.cost)
+
+        self.dates.append(hold_pool.date)
+        self.volume_coefficients.append(volume_coefficient)
+        self.volume_exponents.append(volume_exponent)
+        self.cost_coefficients.append(cost_coefficient)
+        self.cost_exponents.append(cost_exponent)
+
+    # Copy of the first size snapshots, further appends do not affect this history
+    def head(self, size: int) -> 'HoldHistory':
+        history = HoldHistory(self.asset, self.pool_id)
+        history.dates = self.dates[:size]
+        history.volume_coefficients = self.volume_coefficients[:size]
+        history.volume_exponents = self.volume_exponents[:size]
+        history.cost_coefficients = self.cost_coefficients[:size]
+        history.cost_exponents = self.cost_exponents[:size]
+        return history
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[x] for x in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+
+        if not 0 <= index < len(self):
+            raise IndexError("HoldHistory index out of range")
+
+        volume = join_decimal(self.volume_coefficients[index], self.volume_exponents[index])
+        cost = join_decimal(self.cost_coefficients[index], self.cost_exponents[index])
+        return HoldPool(self.dates[index], self.asset, volume, cost, self.pool_id, index)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __eq__(self, other):
+        return len(self) == len(other) and all(x == y for x, y in zip(self, other))
+
+    def __repr__(self) -> str:
+        return f"HoldHistory(asset={self.asset},pool_id={self.pool_id},size={len(self)})"
+
+
 class TaxableHoldPool(object):
+    __slots__ = ('asset', 'hold_pools', 'taxable_records', 'match_records')
 
-    def __init__(self, asset: Asset, hold_pools: List[HoldPool], taxable_records: List[TaxableRecord]):
+    def __init__(self, asset: Asset, hold_pools: Sequence[HoldPool], taxable_records: List[TaxableRecord],
+                 match_records: Optional[List[MatchRecord]] = None):
         self.asset = asset
         self.hold_pools = hold_pools
         self.taxable_records = taxable_records
+        # Same day and 30 days pairings, in the order they were matched
+        self.match_records = list() if match_records is None else match_records
 
     def latest_hold_pool(self):
         return self.hold_pools[-1]
+
+    def __reduce__(self):
+        return TaxableHoldPool, (self.asset, self.hold_pools, self.taxable_records, self.match_records)
@@ -1,6 +1,9 @@
-from datetime import datetime
+import sys
+import threading
+from bisect import bisect_right
+from datetime import datetime, date
 from decimal import Decimal, ROUND_DOWN, ROUND_UP
-from typing import List
+from typing import List, Optional, Iterable, Tuple
 
 
 class Quantization(object):
@@ -37,8 +40,17 @@ class TaxRate(object):
         return f"TaxRate(rate={self.rate}, allowance={self.allowance}"
 
 
+# Integer key of a tax year label, the year the tax year starts in
+def tax_year_key_of(tax_year: str) -> int:
+    return int(tax_year[:4])
+
+
 class TaxPeriod(object):
 
+    # Tax years starting within these years are precomputed, the calendar grows when a date falls outside of it
+    CALENDAR_FIRST_YEAR = 1990
+    CALENDAR_LAST_YEAR = 2050
+
     def __init__(self, country, month_start_at, day_start_at, month_end_at, day_end_at):
         self.country = country
         self.month_start_at = month_start_at
@@ -46,13 +58,73 @@ class TaxPeriod(object):
         self.month_end_at = month_end_at
         self.day_end_at = day_end_at
 
-    def tax_year(self, date):
-        if date.month < self.month_start_at or (date.month == self.month_start_at and date.day < self.day_start_at):
-            tax_year = f"{date.year - 1}/{date.year}"
-        else:
-            tax_year = f"{date.year}/{date.year + 1}"
-
-        return tax_year
+        # First year, ordinals of the start of every tax year plus the one after the last, interned labels
+        # Replaced as a whole when it grows, readers always see a consistent calendar
+        self.calendar: Tuple[int, List[int], List[str]] = \
+            self.__build(TaxPeriod.CALENDAR_FIRST_YEAR, TaxPeriod.CALENDAR_LAST_YEAR)
+        self.calendar_lock = threading.Lock()
+
+    # Tax years starting on the 1st of January are named after their year only, others after both years they span
+    def __name(self, tax_year_key: int) -> str:
+        if self.month_start_at == 1 and self.day_start_at == 1:
+            return sys.intern(str(tax_year_key))
+
+        return sys.intern(f"{tax_year_key}/{tax_year_key + 1}")
+
+    def label(self, tax_year_key: int) -> str:
+        first_year, starts, labels = self.calendar
+        if 0 <= tax_year_key - first_year < len(labels):
+            return labels[tax_year_key - first_year]
+
+        return self.__name(tax_year_key)
+
+    def __build(self, first_year: int, last_year: int) -> Tuple[int, List[int], List[str]]:
+        starts = [date(x, self.month_start_at, self.day_start_at).toordinal() for x in range(first_year, last_year + 2)]
+        labels = [self.__name(x) for x in range(first_year, last_year + 1)]
+        return first_year, starts, labels
+
+    def __grow(self, ordinal: int):
+        with self.calendar_lock:
+            first_year, starts, labels = self.calendar
+            year = date.fromordinal(ordinal).year
+            self.calendar = self.__build(min(first_year, year - 1), max(first_year + len(labels) - 1, year))
+
+    # Index of the tax year in the calendar, the calendar grows first when needed
+    def __index(self, ordinal: int) -> Tuple[int, Tuple[int, List[int], List[str]]]:
+        calendar = self.calendar
+        starts = calendar[1]
+        if not starts[0] <= ordinal < starts[-1]:
+            self.__grow(ordinal)
+            calendar = self.calendar
+            starts = calendar[1]
+
+        return bisect_right(starts, ordinal) - 1, calendar
+
+    # Key of the tax year the date falls in, dates and datetimes are taken at their calendar day
+    def tax_year_key(self, value) -> int:
+        index, calendar = self.__index(value.toordinal())
+        return calendar[0] + index
+
+    def tax_year(self, value) -> str:
+        index, calendar = self.__index(value.toordinal())
+        return calendar[2][index]
+
+    # Keys of the tax years of all dates, runs of dates in the same tax year are looked up only once
+    def tax_year_keys(self, values: Iterable) -> List[int]:
+        keys = list()
+        low, high, key = 0, 0, 0
+        for value in values:
+            ordinal = value.toordinal()
+            if not low <= ordinal < high:
+                index, calendar = self.__index(ordinal)
+                low, high, key = calendar[1][index], calendar[1][index + 1], calendar[0] + index
+
+            keys.append(key)
+
+        return keys
+
+    def tax_years(self, values: Iterable) -> List[str]:
+        return [self.label(x) for x in self.tax_year_keys(values)]
 
     def __repr__(self):
         return f"TaxPeriod(country={self.country}," \
@@ -61,8 +133,9 @@ class TaxPeriod(object):
 
 
 class TaxableRecord(object):
+    __slots__ = ('date', 'tax_year', 'type', 'amount', 'tax_year_key')
 
-    def __init__(self, date, tax_year: str, type: str, amount: Decimal):
+    def __init__(self, date, tax_year: str, type: str, amount: Decimal, tax_year_key: Optional[int] = None):
         if type != 'GAIN' and type != 'LOSS':
             raise ValueError('Type can only be GAIN or LOSS')
 
@@ -70,6 +143,9 @@ class TaxableRecord(object):
         self.tax_year = tax_year
         self.type = type
         self.amount = amount
+        # Records are grouped and sorted by this key rather than by the label
+        self.tax_year_key = tax_year_key if tax_year_key is not None or tax_year is None \
+            else tax_year_key_of(tax_year)
 
     @staticmethod
     def as_taxable_income(tax_year: str, taxable_records: List['TaxableRecord']) -> 'TaxableRecord':
@@ -87,5 +163,51 @@ class TaxableRecord(object):
     def __hash__(self):
         return hash((self.date, self.tax_year, self.type, self.amount))
 
+    def __reduce__(self):
+        return TaxableRecord, (self.date, self.tax_year, self.type, self.amount, self.tax_year_key)
+
     def __repr__(self) -> str:
         return f"TaxRecord(date={self.date},tax_year={self.tax_year},type={self.type},amount={self.amount})"
+
+
+# Volume of a disposal matched against an acquisition by the same day or the 30 days rule, instead of the pool
+class MatchRecord(object):
+    __slots__ = ('rule', 'buy_date', 'sell_date', 'volume', 'buy_price', 'sell_price', 'buy_id', 'sell_id')
+
+    RULES = ('SAME_DAY', '30_DAYS')
+
+    def __init__(self, rule: str, buy_date: datetime, sell_date: datetime, volume: Decimal,
+                 buy_price: Decimal, sell_price: Decimal, buy_id: Optional[int] = None, sell_id: Optional[int] = None):
+        if rule not in MatchRecord.RULES:
+            raise ValueError(f"Rule can only be one of {', '.join(MatchRecord.RULES)}")
+
+        self.rule = rule
+        self.buy_date = buy_date
+        self.sell_date = sell_date
+        self.volume = volume
+        self.buy_price = buy_price
+        self.sell_price = sell_price
+        # Transaction ids of the parsed trades, None for trades that were not read from a file
+        self.buy_id = buy_id
+        self.sell_id = sell_id
+
+    def amount(self) -> Decimal:
+        return (self.sell_price - self.buy_price) * self.volume
+
+    def __eq__(self, other):
+        return self.rule == other.rule and self.buy_date == other.buy_date and self.sell_date == other.sell_date and \
+            self.volume == other.volume and self.buy_price == other.buy_price and \
+            self.sell_price == other.sell_price and self.buy_id == other.buy_id and self.sell_id == other.sell_id
+
+    def __hash__(self):
+        return hash((self.rule, self.buy_date, self.sell_date, self.volume, self.buy_price, self.sell_price,
+                     self.buy_id, self.sell_id))
+
+    def __reduce__(self):
+        return MatchRecord, (self.rule, self.buy_date, self.sell_date, self.volume, self.buy_price, self.sell_price,
+                             self.buy_id, self.sell_id)
+
+    def __repr__(self) -> str:
+        return f"MatchRecord(rule={self.rule},buy_date={self.buy_date},sell_date={self.sell_date}," \
+               f"volume={self.volume},buy_price={self.buy_price},sell_price={self.sell_price}," \
+               f"buy_id={self.buy_id},sell_id={self.sell_id})"
@@ -1,37 +1,83 @@
+import os
+import zlib
 from datetime import datetime
 from decimal import Decimal
-from typing import List, Optional
+from typing import List, Optional, Dict, Tuple
 
 from config import DATE_FORMAT, DATE_TIME_FORMAT
 
 
+def parse_date_time(value: str) -> datetime:
+    # Fast path for the YYYY-MM-DDTHH:MM:SS(Z|+HHMM|+HH:MM) layout of DATE_TIME_FORMAT,
+    # anything else goes through strptime so errors and lenient parsing stay as they were
+    if len(value) in (20, 24, 25) and value[4] == '-' and value[7] == '-' and value[10] == 'T' \
+            and value[13] == ':' and value[16] == ':' and value[19] in 'Z+-':
+        if value[19] == 'Z':
+            value = value[:19] + '+00:00'
+        elif len(value) == 24:
+            value = value[:22] + ':' + value[22:]
+
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+
+    return datetime.strptime(value, DATE_TIME_FORMAT)
+
+
+# Stable id of the trade on the given line of a transactions file, the same file and line give the same id in every run
+# The upper 31 bits identify the file by its name, so ids stay the same when the file is moved or copied elsewhere.
+# The lower 32 are the line. Ids stay below 2**63 and fit signed 64 bit columns of exports
+def transaction_id(source: str, line: int) -> int:
+    return (zlib.crc32(os.path.basename(source).encode()) & 0x7fffffff) << 32 | line
+
+
 class Asset(object):
+    __slots__ = ('group', 'symbol', 'type')
 
     def __init__(self, group, symbol, type):
         self.group = group
         self.symbol = symbol
         self.type = type
 
+    # Assets are never mutated, so parsed rows can share one instance per (group, symbol, type)
+    # The instances are kept in the given cache, which lives as long as the parse that passes it
+    @staticmethod
+    def intern(assets: Dict[Tuple[str, str, str], 'Asset'], group, symbol, type) -> 'Asset':
+        key = (group, symbol, type)
+        asset = assets.get(key)
+        if asset is None:
+            asset = assets[key] = Asset(group, symbol, type)
+
+        return asset
+
     def __eq__(self, other):
         return self.symbol == other.symbol and self.type == other.type
 
     def __hash__(self):
         return hash((self.symbol, self.type))
 
+    def __reduce__(self):
+        return Asset, (self.group, self.symbol, self.type)
+
     def __repr__(self) -> str:
         return f"Asset(group={self.group},symbol={self.symbol},type={self.type})"
 
 
 class Transaction(object):
+    __slots__ = ('date', 'type', 'asset', 'volume', 'taxable_price', 'original_price', 'transaction_id')
 
     def __init__(self, date: datetime, type: str, asset: Asset,
-                 volume: Decimal, taxable_price: Decimal, original_price: Optional[Decimal]):
+                 volume: Decimal, taxable_price: Decimal, original_price: Optional[Decimal],
+                 transaction_id: Optional[int] = None):
         self.date = date
         self.type = type
         self.asset = asset
         self.volume = volume
         self.taxable_price = taxable_price
         self.original_price = original_price
+        # Set for parsed trades, so identical fills stay apart, copies keep the id of the trade they were taken from
+        self.transaction_id = transaction_id
 
     def is_sell(self) -> bool:
         return self.type == "SELL"
@@ -46,28 +92,55 @@ class Transaction(object):
             self.asset,
             self.volume,
             self.taxable_price,
-            self.original_price
+            self.original_price,
+            self.transaction_id
         )
 
     @staticmethod
-    def parse(row: List[str]) -> 'Transaction':
+    def parse(row: List[str], dates: Optional[Dict[str, datetime]] = None,
+              transaction_id: Optional[int] = None,
+              assets: Optional[Dict[Tuple[str, str, str], 'Asset']] = None) -> 'Transaction':
+        # Dates and assets are optional caches shared between rows of one file
+        # An id in a ninth column takes precedence over the given one, files split by asset carry the original id there
         def decimal(str_value):
-            return Decimal(str_value.replace(",", ""))
+            if "," in str_value:
+                str_value = str_value.replace(",", "")
+            return Decimal(str_value)
 
         type = row[1]
-        asset = Asset(row[2], row[3], row[4])
 
         if type != 'SELL' and type != 'BUY':
             raise ValueError(f"Transaction type can only by of SELL or BUY, got: {type}")
 
-        return Transaction(datetime.strptime(row[0], DATE_TIME_FORMAT), type, asset,
-                           decimal(row[5]), decimal(row[6]), decimal(row[7]))
+        if assets is None:
+            asset = Asset(row[2], row[3], row[4])
+        else:
+            asset = Asset.intern(assets, row[2], row[3], row[4])
+
+        if dates is None:
+            date = parse_date_time(row[0])
+        else:
+            date = dates.get(row[0])
+            if date is None:
+                date = dates[row[0]] = parse_date_time(row[0])
+
+        if len(row) > 8:
+            transaction_id = int(row[8])
+
+        return Transaction(date, type, asset, decimal(row[5]), decimal(row[6]), decimal(row[7]), transaction_id)
 
     def __eq__(self, other):
-        return self.__hash__() == other.__hash__()
+        return self.transaction_id == other.transaction_id and self.date == other.date and \
+            self.type == other.type and self.asset == other.asset and self.volume == other.volume and \
+            self.taxable_price == other.taxable_price and self.original_price == other.original_price
 
     def __hash__(self):
-        return hash((self.date, self.type, self.asset, self.volume, self.taxable_price, self.original_price))
+        return hash((self.date, self.type, self.asset, self.volume, self.taxable_price, self.original_price,
+                     self.transaction_id))
+
+    def __reduce__(self):
+        return Transaction, (self.date, self.type, self.asset, self.volume, self.taxable_price, self.original_price,
+                             self.transaction_id)
 
     def __repr__(self) -> str:
         return f"Transaction(" \
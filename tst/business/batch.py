@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+from src.business.batch import BatchProcessor, find_portfolios
+from src.business.html_formatter import HtmlFormatter
+from src.business.processor import TransactionProcessor
+from src.business.result_cache import ResultCache
+
+HEADER = "Date Transaction Asset_Group Asset_Code Asset_Type Volume Taxable_Unit_Price Original_Unit_Price\n"
+ROWS = "2019-09-16T10:15:00Z BUY Bank1 AMZN STOCK 152 1,454.77 1,807.84\n" \
+       "2020-09-15T09:33:00Z SELL Bank1 AMZN STOCK 52 2,450.26 3,156.13\n"
+
+
+class TestFindPortfolios(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+        for name in ['b.tsv', 'a.tsv', 'notes.txt']:
+            with open(os.path.join(self.directory, name), 'w') as fp:
+                fp.write(HEADER)
+
+    def test_single(self):
+        source = os.path.join(self.directory, 'a.tsv')
+
+        portfolios = find_portfolios([source], 'out', '.checkpoints')
+
+        self.assertEqual(1, len(portfolios))
+        self.assertEqual('a', portfolios[0].name)
+        self.assertEqual(source, portfolios[0].source)
+        self.assertEqual('out', portfolios[0].directory)
+        self.assertEqual('.checkpoints', portfolios[0].checkpoint_directory)
+
+    def test_directory(self):
+        portfolios = find_portfolios([self.directory], 'out', '.checkpoints')
+
+        self.assertEqual(['a', 'b'], [x.name for x in portfolios])
+        self.assertEqual([os.path.join('out', 'a'), os.path.join('out', 'b')], [x.directory for x in portfolios])
+        self.assertEqual([os.path.join('.checkpoints', 'a'), os.path.join('.checkpoints', 'b')],
+                         [x.checkpoint_directory for x in portfolios])
+
+    def test_same_names(self):
+        with self.assertRaises(ValueError):
+            find_portfolios([self.directory, os.path.join(self.directory, 'a.tsv')], 'out', '.checkpoints')
+
+    def test_nothing_found(self):
+        empty = os.path.join(self.directory, 'empty')
+        os.makedirs(empty)
+
+        with self.assertRaises(ValueError):
+            find_portfolios([empty], 'out', '.checkpoints')
+
+
+class TestBatchProcessor(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+        inputs = os.path.join(self.directory, 'inputs')
+        os.makedirs(inputs)
+        for name, content in [('one.tsv', HEADER + ROWS), ('two.tsv', HEADER + ROWS),
+                              ('bad.tsv', HEADER + "2019-09-16T10:15:00Z BUY\n")]:
+            with open(os.path.join(inputs, name), 'w') as fp:
+                fp.write(content)
+
+        self.output = os.path.join(self.directory, 'output')
+        self.portfolios = find_portfolios([inputs], self.output, os.path.join(self.directory, 'checkpoints'))
+
+        # One fetcher for all portfolios
+        self.stock_fetcher = mock.Mock()
+        self.stock_fetcher.get_prices.side_effect = lambda assets: {x: Decimal('100') for x in assets}
+
+    def create_formatter(self, portfolio):
+        return HtmlFormatter(self.stock_fetcher)
+
+    def test_run(self):
+        for workers in [1, 3]:
+            batch_processor = BatchProcessor(TransactionProcessor(), self.create_formatter, ['csv'],
+                                             workers=workers, log=lambda x: None)
+
+            results = batch_processor.run(self.portfolios)
+
+            self.assertEqual(['bad', 'one', 'two'], [x.portfolio.name for x in results])
+            self.assertEqual([False, True, True], [x.is_success() for x in results])
+            self.assertTrue(results[0].error.startswith('IndexError'))
+
+            for result in results[1:]:
+                self.assertEqual(os.path.join(self.output, result.portfolio.name, 'tax_return.html'),
+                                 result.filenames[0])
+                self.assertEqual(5, len(result.filenames))
+                self.assertTrue(all(os.path.exists(x) for x in result.filenames))
+
+    def test_run_fills_cache_from_workers(self):
+        cache = ResultCache(os.path.join(self.directory, 'cache'))
+        self.addCleanup(cache.close)
+        batch_processor = BatchProcessor(TransactionProcessor(result_cache=cache), self.create_formatter, workers=3,
+                                         log=lambda x: None)
+
+        results = batch_processor.run(self.portfolios)
+
+        self.assertEqual([False, True, True], [x.is_success() for x in results])
+        self.assertIsNone(cache.connection)
+        self.assertTrue(cache.size() > 0)
+
+    def test_run_by_asset(self):
+        for incremental in [False, True]:
+            expected = BatchProcessor(TransactionProcessor(), self.create_formatter, ['csv'], workers=1,
+                                      log=lambda x: None).process_portfolio(self.portfolios[1])
+            with open(expected[1]) as fp:
+                expected_export = fp.read()
+
+            batch_processor = BatchProcessor(TransactionProcessor(), self.create_formatter, ['csv'], incremental,
+                                             workers=1, log=lambda x: None, by_asset=True)
+            with mock.patch('src.business.batch.parse', side_effect=AssertionError):
+                results = batch_processor.run(self.portfolios)
+
+            self.assertEqual([False, True, True], [x.is_success() for x in results])
+            with open(results[1].filenames[1]) as fp:
+                self.assertEqual(expected_export, fp.read())
+
+    def test_run_incremental(self):
+        batch_processor = BatchProcessor(TransactionProcessor(), self.create_formatter, incremental=True,
+                                         log=lambda x: None)
+
+        results = batch_processor.run(self.portfolios)
+
+        self.assertEqual([False, True, True], [x.is_success() for x in results])
+        for portfolio in self.portfolios[1:]:
+            self.assertTrue(os.path.exists(os.path.join(portfolio.checkpoint_directory, 'checkpoints.pickle')))
+
+
+if __name__ == '__main__':
+    unittest.main()
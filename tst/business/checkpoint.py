@@ -0,0 +1,71 @@
+import pickle
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from src.business.checkpoint import CheckpointStore, transactions_digest
+from src.business.processor import TransactionProcessor
+from src.model.transaction import Asset, Transaction
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.asset = Asset('group', 'symbol', 'STOCK')
+        self.date = datetime(2020, 1, 1, 9)
+        self.transactions = [
+            Transaction(self.date, 'BUY', self.asset, Decimal(10), Decimal(5), None),
+            Transaction(self.date + timedelta(days=40), 'SELL', self.asset, Decimal(4), Decimal(6), None),
+            Transaction(self.date + timedelta(days=90), 'BUY', self.asset, Decimal(2), Decimal(7), None),
+        ]
+        self.checkpoint = TransactionProcessor().process_incremental_asset(self.asset, self.transactions)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_transactions_digest_ignores_order(self):
+        self.assertEqual(transactions_digest(self.transactions), transactions_digest(reversed(self.transactions)))
+        self.assertNotEqual(transactions_digest(self.transactions), transactions_digest(self.transactions[1:]))
+
+    def test_appended_when_nothing_appended(self):
+        self.assertEqual([], self.checkpoint.appended(self.transactions))
+
+    def test_appended_when_appended(self):
+        appended = [
+            Transaction(self.date + timedelta(days=90), 'BUY', self.asset, Decimal(2), Decimal(7), None),
+            Transaction(self.date + timedelta(days=91), 'SELL', self.asset, Decimal(1), Decimal(8), None),
+        ]
+
+        self.assertEqual(appended, self.checkpoint.appended(self.transactions + appended))
+
+    def test_appended_when_back_dated(self):
+        back_dated = Transaction(self.date + timedelta(days=1), 'BUY', self.asset, Decimal(1), Decimal(5), None)
+
+        self.assertIsNone(self.checkpoint.appended(self.transactions + [back_dated]))
+
+    def test_appended_when_removed(self):
+        self.assertIsNone(self.checkpoint.appended(self.transactions[:-1]))
+
+    def test_load_when_empty(self):
+        self.assertEqual(dict(), CheckpointStore(self.directory.name).load())
+
+    def test_save_and_load(self):
+        store = CheckpointStore(self.directory.name)
+        store.save({self.asset: self.checkpoint})
+
+        loaded = store.load()[self.asset]
+
+        self.assertEqual(list(self.checkpoint.result.hold_pools), list(loaded.result.hold_pools))
+        self.assertEqual(self.checkpoint.result.taxable_records, loaded.result.taxable_records)
+        self.assertEqual(self.checkpoint.pending, loaded.pending)
+        self.assertEqual(self.checkpoint.result.match_records, loaded.result.match_records)
+        self.assertEqual([], loaded.appended(self.transactions))
+
+    def test_load_when_other_version(self):
+        store = CheckpointStore(self.directory.name)
+        with open(store.filename, 'wb') as fp:
+            pickle.dump({self.asset: self.checkpoint}, fp)
+
+        self.assertEqual(dict(), store.load())
@@ -0,0 +1,104 @@
+import unittest
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from src.business.disposal_simulator import DisposalSimulator
+from src.model.hold_pool import HoldPool, TaxableHoldPool
+from src.model.tax import TaxableRecord
+from src.model.transaction import Asset
+
+
+class TestDisposalSimulator(unittest.TestCase):
+
+    def setUp(self):
+        self.asset_a = Asset('group', 'a', 'STOCK')
+        self.asset_b = Asset('group', 'b', 'STOCK')
+
+        taxable_hold_pools = [
+            TaxableHoldPool(self.asset_a, [
+                HoldPool(datetime(2019, 6, 1), self.asset_a, Decimal(150), Decimal(1500)),
+                HoldPool(datetime(2020, 1, 1), self.asset_a, Decimal(100), Decimal(1000)),
+            ], [
+                TaxableRecord(datetime(2020, 1, 1), '2019/2020', 'LOSS', Decimal(500)),
+                TaxableRecord(datetime(2020, 5, 1), '2020/2021', 'GAIN', Decimal(10000)),
+            ]),
+            TaxableHoldPool(self.asset_b, [HoldPool(datetime(2020, 1, 1), self.asset_b, Decimal(10), Decimal(100))], [
+                TaxableRecord(datetime(2021, 5, 1), '2021/2022', 'GAIN', Decimal(13300)),
+            ]),
+        ]
+        self.simulator = DisposalSimulator(taxable_hold_pools)
+
+    def test_simulate(self):
+        simulation = self.simulator.simulate(
+            [self.asset_a, self.asset_a, self.asset_a, self.asset_a, self.asset_b],
+            [Decimal(50), Decimal(100), Decimal(10), Decimal(100), Decimal(10)],
+            [Decimal(30), Decimal(50), Decimal(5), Decimal(150), Decimal(110)],
+            [datetime(2020, 6, 1), datetime(2020, 6, 1), datetime(2020, 6, 1), datetime(2020, 3, 1),
+             datetime(2021, 6, 1)]
+        )
+
+        self.assertEqual(5, len(simulation))
+        self.assertEqual([Decimal(1000), Decimal(4000), Decimal(-50), Decimal(14000), Decimal(1000)], simulation.gains)
+        # Within the allowance, over it by 1,700, a loss, over the 2019/2020 allowance after its loss, and on top of a
+        # tax year already over its allowance
+        self.assertEqual([Decimal(0), Decimal(340), Decimal(0), Decimal(300), Decimal(200)], simulation.taxes)
+
+    def test_simulate_when_invalid(self):
+        moment = datetime(2020, 6, 1)
+
+        for assets, volumes, prices, dates in [
+            ([self.asset_a], [Decimal(101)], [Decimal(1)], [moment]),
+            ([Asset('group', 'c', 'STOCK')], [Decimal(1)], [Decimal(1)], [moment]),
+            ([self.asset_a], [Decimal(1)], [Decimal(1)], [datetime(2019, 12, 31)]),
+            ([self.asset_a, self.asset_b], [Decimal(1)], [Decimal(1)], [moment]),
+        ]:
+            with self.assertRaises(ValueError):
+                self.simulator.simulate(assets, volumes, prices, dates)
+
+    def test_max_volume(self):
+        moment = datetime(2020, 6, 1)
+
+        self.assertEqual(Decimal(100), self.simulator.max_volume(self.asset_a, Decimal(30), moment))
+        self.assertEqual(Decimal(46), self.simulator.max_volume(self.asset_a, Decimal(60), moment))
+        self.assertEqual(Decimal('38.3'), self.simulator.max_volume(self.asset_a, Decimal(70), moment, Decimal('0.1')))
+        self.assertEqual(Decimal(100), self.simulator.max_volume(self.asset_a, Decimal(5), moment))
+        self.assertEqual(Decimal(0), self.simulator.max_volume(self.asset_b, Decimal(20), datetime(2021, 6, 1)))
+
+    def test_simulate_after_last_tax_year(self):
+        simulation = self.simulator.simulate([self.asset_a], [Decimal(100)], [Decimal(60)], [datetime(2035, 6, 1)])
+
+        # Rate and allowance of the last configured tax year, 2024/2025
+        self.assertEqual([Decimal(480)], simulation.taxes)
+
+    def test_simulate_before_first_tax_year(self):
+        asset = Asset('group', 'c', 'STOCK')
+        simulator = DisposalSimulator([
+            TaxableHoldPool(asset, [HoldPool(datetime(2010, 1, 1), asset, Decimal(10), Decimal(100))], [])
+        ])
+
+        with self.assertRaises(ValueError):
+            simulator.simulate([asset], [Decimal(1)], [Decimal(1)], [datetime(2010, 6, 1)])
+
+    def test_max_volume_when_now(self):
+        # Parsed trades are timezone aware, like now
+        simulator = DisposalSimulator([TaxableHoldPool(self.asset_a, [
+            HoldPool(datetime(2020, 1, 1, tzinfo=timezone.utc), self.asset_a, Decimal(100), Decimal(1000))
+        ], [])])
+
+        # Allowance of the last configured tax year, 2024/2025, is 3,000
+        self.assertEqual(Decimal(60), simulator.max_volume(self.asset_a, Decimal(60)))
+        self.assertEqual([Decimal(0)], simulator.simulate([self.asset_a], [Decimal(60)], [Decimal(60)]).taxes)
+
+    def test_max_volume_stays_within_allowance(self):
+        moment = datetime(2020, 6, 1)
+        price = Decimal('63.37')
+
+        volume = self.simulator.max_volume(self.asset_a, price, moment)
+        simulation = self.simulator.simulate([self.asset_a] * 2, [volume, volume + 1], [price] * 2, [moment] * 2)
+
+        self.assertEqual(Decimal(0), simulation.taxes[0])
+        self.assertTrue(simulation.taxes[1] > 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
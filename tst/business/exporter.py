@@ -0,0 +1,111 @@
+import csv
+import importlib.util
+import io
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from src.business.exporter import CsvExporter, NdjsonExporter, HOLD_POOL_FIELDS, TAXABLE_RECORD_FIELDS, \
+    MATCH_RECORD_FIELDS, hold_pool_rows, taxable_record_rows, match_record_rows, export
+from src.business.processor import TransactionProcessor
+from src.model.transaction import Asset, Transaction, transaction_id
+
+
+class TestExporter(unittest.TestCase):
+
+    def setUp(self):
+        asset = Asset('group', 'symbol', 'STOCK')
+        date = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        transactions = [
+            Transaction(date, 'BUY', asset, Decimal(3), Decimal(10), None),
+            Transaction(date + timedelta(days=40), 'BUY', asset, Decimal(4), Decimal(11), None),
+            Transaction(date + timedelta(days=80), 'SELL', asset, Decimal(2), Decimal(12), None),
+        ]
+        self.taxable_hold_pools = TransactionProcessor().process(transactions)
+
+    def test_csv_keeps_decimals(self):
+        fp = io.StringIO()
+        CsvExporter().write_to(fp, HOLD_POOL_FIELDS, hold_pool_rows(self.taxable_hold_pools))
+
+        rows = list(csv.DictReader(io.StringIO(fp.getvalue())))
+        hold_pools = self.taxable_hold_pools[0].hold_pools
+
+        self.assertEqual(len(hold_pools), len(rows))
+        self.assertEqual([x.cost for x in hold_pools], [Decimal(x['cost']) for x in rows])
+        self.assertEqual(['0', '1', '2'], [x['pool_index'] for x in rows])
+        self.assertEqual('2020-01-01T00:00:00+00:00', rows[0]['date'])
+
+    def test_ndjson_keeps_decimals(self):
+        fp = io.StringIO()
+        NdjsonExporter().write_to(fp, TAXABLE_RECORD_FIELDS, taxable_record_rows(self.taxable_hold_pools))
+
+        rows = [json.loads(x) for x in fp.getvalue().splitlines()]
+        record = self.taxable_hold_pools[0].taxable_records[0]
+
+        self.assertEqual(1, len(rows))
+        self.assertEqual(record.amount, Decimal(rows[0]['amount']))
+        self.assertEqual('GAIN', rows[0]['record_type'])
+        self.assertEqual(record.tax_year, rows[0]['tax_year'])
+
+    def test_export(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filenames = export(directory, 'csv', self.taxable_hold_pools)
+
+            self.assertEqual(['taxable_hold_pools.csv', 'hold_pools.csv', 'taxable_records.csv', 'match_records.csv'],
+                             [os.path.basename(x) for x in filenames])
+            with open(filenames[0]) as fp:
+                summary = list(csv.DictReader(fp))
+
+        self.assertEqual('5', summary[0]['volume'])
+        self.assertEqual('3', summary[0]['hold_pool_count'])
+
+    def test_match_record_rows(self):
+        asset = Asset('group', 'symbol', 'STOCK')
+        date = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        taxable_hold_pools = TransactionProcessor().process([
+            Transaction(date, 'BUY', asset, Decimal(3), Decimal(10), None, 1),
+            Transaction(date + timedelta(days=40), 'SELL', asset, Decimal(2), Decimal(12), None, 2),
+            Transaction(date + timedelta(days=50), 'BUY', asset, Decimal(1), Decimal(11), None, 3),
+        ])
+
+        fp = io.StringIO()
+        CsvExporter().write_to(fp, MATCH_RECORD_FIELDS, match_record_rows(taxable_hold_pools))
+
+        rows = list(csv.DictReader(io.StringIO(fp.getvalue())))
+        self.assertEqual([('30_DAYS', '1', '11', '12', '3', '2')],
+                         [(x['rule'], x['volume'], x['buy_price'], x['sell_price'], x['buy_id'], x['sell_id'])
+                          for x in rows])
+
+    def test_export_when_unsupported(self):
+        with self.assertRaises(ValueError):
+            export('unused', 'xml', self.taxable_hold_pools)
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), "pyarrow is not installed")
+    def test_export_parquet(self):
+        import pyarrow.parquet as parquet
+
+        with tempfile.TemporaryDirectory() as directory:
+            filenames = export(directory, 'parquet', self.taxable_hold_pools)
+            table = parquet.read_table(filenames[1])
+
+        self.assertEqual([str(x.cost) for x in self.taxable_hold_pools[0].hold_pools], table.column('cost').to_pylist())
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), "pyarrow is not installed")
+    def test_export_parquet_match_record_ids(self):
+        import pyarrow.parquet as parquet
+
+        asset = Asset('group', 'symbol', 'STOCK')
+        date = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        taxable_hold_pools = TransactionProcessor().process([
+            Transaction(date, 'BUY', asset, Decimal(3), Decimal(10), None, transaction_id('a.tsv', 2)),
+            Transaction(date, 'SELL', asset, Decimal(2), Decimal(12), None, transaction_id('a.tsv', 3)),
+        ])
+
+        with tempfile.TemporaryDirectory() as directory:
+            filenames = export(directory, 'parquet', taxable_hold_pools)
+            table = parquet.read_table(filenames[3])
+
+        self.assertEqual([transaction_id('a.tsv', 3)], table.column('sell_id').to_pylist())
@@ -0,0 +1,64 @@
+import io
+import unittest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from unittest import mock
+
+from src.business.html_formatter import HtmlFormatter
+from src.business.processor import TransactionProcessor
+from src.model.transaction import Asset, Transaction
+
+
+class TestHtmlFormatter(unittest.TestCase):
+
+    def setUp(self):
+        price_cache_patch = mock.patch('src.business.html_formatter.PriceCache')
+        price_cache_patch.start()
+        self.addCleanup(price_cache_patch.stop)
+
+        footer_patch = mock.patch.object(HtmlFormatter, 'render_footer', return_value='<div>footer</div>')
+        footer_patch.start()
+        self.addCleanup(footer_patch.stop)
+
+        self.formatter = HtmlFormatter()
+
+        transactions = []
+        for asset_idx in range(3):
+            asset = Asset('group', f'symbol-{asset_idx}', 'STOCK')
+            for day in range(30):
+                date = datetime(2019, 1, 1, tzinfo=timezone.utc) + timedelta(days=day * 40)
+                transactions.append(Transaction(date, 'BUY', asset, Decimal(5), Decimal(day + 1), None))
+                if day % 3 == 0:
+                    transactions.append(
+                        Transaction(date + timedelta(hours=1), 'SELL', asset, Decimal(2), Decimal(day + 2), None))
+
+        self.taxable_hold_pools = TransactionProcessor().process(transactions)
+        self.prices = {x.asset: Decimal('12.34') for x in self.taxable_hold_pools}
+
+    # Document as it was put together before sections were streamed
+    def render_joined(self, taxable_hold_pools):
+        hold_pools = "\n".join([self.formatter.render_taxable_hold_pool(x, self.prices) for x in taxable_hold_pools])
+        taxable_total = self.formatter.render_taxable_total(taxable_hold_pools)
+        body = "\n".join([taxable_total, hold_pools, self.formatter.render_footer()])
+        return self.formatter.html_head() + "".join(["\n\t\t" + x for x in body.split("\n")]) + \
+            self.formatter.html_tail()
+
+    def test_render(self):
+        self.assertEqual(self.render_joined(self.taxable_hold_pools),
+                         self.formatter.render(self.taxable_hold_pools, self.prices))
+
+    def test_render_when_empty(self):
+        self.assertEqual(self.render_joined([]), self.formatter.render([], dict()))
+
+    def test_render_match_records(self):
+        html = self.formatter.render_taxable_hold_pool(self.taxable_hold_pools[0], self.prices)
+        match_records = self.formatter.render_match_records(self.taxable_hold_pools[0].match_records)
+
+        self.assertIn(match_records, html)
+        self.assertIn("<td>SAME_DAY", match_records)
+
+    def test_write(self):
+        fp = io.StringIO()
+        self.formatter.write(fp, self.taxable_hold_pools, self.prices)
+
+        self.assertEqual(self.render_joined(self.taxable_hold_pools), fp.getvalue())
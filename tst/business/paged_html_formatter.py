@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from unittest import mock
+
+from src.business.paged_html_formatter import PagedHtmlFormatter
+from src.business.processor import TransactionProcessor
+from src.model.transaction import Asset, Transaction
+
+
+class TestPagedHtmlFormatter(unittest.TestCase):
+
+    def setUp(self):
+        price_cache_patch = mock.patch('src.business.html_formatter.PriceCache')
+        price_cache_patch.start()
+        self.addCleanup(price_cache_patch.stop)
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.history_directory = os.path.join(self.directory.name, 'report_files')
+        self.formatter = PagedHtmlFormatter(self.history_directory, page_size=4)
+
+        transactions = []
+        for asset_idx in range(2):
+            asset = Asset('group', f'symbol-{asset_idx}', 'STOCK')
+            for day in range(5 + asset_idx * 5):
+                date = datetime(2019, 1, 1, tzinfo=timezone.utc) + timedelta(days=day * 40)
+                transactions.append(Transaction(date, 'BUY', asset, Decimal(5), Decimal(day + 1) / 3, None))
+
+        self.taxable_hold_pools = TransactionProcessor().process(transactions)
+        self.prices = {x.asset: Decimal('12.34') for x in self.taxable_hold_pools}
+
+    def read_page(self, history, page):
+        with open(os.path.join(self.history_directory, f"history-{history}-{page}.js")) as fp:
+            content = fp.read()
+
+        prefix = f"holdHistoryPage({history}, {page}, "
+        self.assertTrue(content.startswith(prefix))
+        return json.loads(content[len(prefix):-len(");\n")])
+
+    def test_render_writes_pages(self):
+        self.formatter.render(self.taxable_hold_pools, self.prices)
+
+        self.assertEqual(['history-0-0.js', 'history-0-1.js', 'history-1-0.js', 'history-1-1.js', 'history-1-2.js'],
+                         sorted(os.listdir(self.history_directory)))
+
+        rows = self.read_page(1, 0) + self.read_page(1, 1) + self.read_page(1, 2)
+        hold_pools = self.taxable_hold_pools[1].hold_pools
+        self.assertEqual(len(hold_pools), len(rows))
+        self.assertEqual(['2019-01-01', '5', '1.67'], rows[0])
+        self.assertEqual([str(x.volume) for x in hold_pools], [x[1] for x in rows])
+
+    def test_render_removes_stale_pages(self):
+        self.formatter.render(self.taxable_hold_pools, self.prices)
+        with open(os.path.join(self.history_directory, 'notes.txt'), 'w') as fp:
+            fp.write('kept')
+
+        self.formatter.render(self.taxable_hold_pools[:1], self.prices)
+
+        self.assertEqual(['history-0-0.js', 'history-0-1.js', 'notes.txt'], sorted(os.listdir(self.history_directory)))
+
+    def test_render_leaves_history_out(self):
+        html = self.formatter.render(self.taxable_hold_pools, self.prices)
+
+        self.assertIn('data-url="report_files" data-pages="3"', html)
+        self.assertIn('<summary>10 snapshots</summary>', html)
+        self.assertNotIn('<td>2019-02-10</td>', html)
+
+    def test_render_when_rendered_again(self):
+        first = self.formatter.render(self.taxable_hold_pools, self.prices)
+        second = self.formatter.render(self.taxable_hold_pools, self.prices)
+
+        self.assertEqual(first.split('Page generated at')[0], second.split('Page generated at')[0])
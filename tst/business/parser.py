@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+from decimal import Decimal
+
+from src.business.parser import parse, iter_parse, iter_parse_by_asset, partition_by_asset
+from src.model.transaction import transaction_id
+
+ROWS = """Date                  Transaction     Asset Group    Asset Code      Asset Type      Volume  Taxable Unit Price   Original Unit Price
+2019-09-16T10:15:00Z  BUY             Bank1                AMZN           STOCK         152            1,454.77              1,807.84
+2019-08-14T14:44:00Z  BUY             Exchange1             BTC           CRYPTO    0.000981            8,450.56              8,450.56
+
+2020-09-15T09:33:00Z  BUY             Bank2                AMZN           STOCK       5,555            2,450.26              3,156.13
+2020-11-11T22:11:00Z  SELL            "Exchange 1"          BTC           CRYPTO  100.000011           11,887.55             11,887.55
+2020-12-02T20:17:00Z  SELL            Bank2                AMZN           STOCK       1,000            2,398.00              3,203.53
+"""
+
+
+class TestParser(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'transactions.tsv')
+        with open(self.filename, 'w') as fp:
+            fp.write(ROWS)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_iter_parse(self):
+        expected = parse(self.filename)
+
+        self.assertEqual(expected, list(iter_parse(self.filename)))
+        self.assertEqual(expected, list(iter_parse(self.filename, chunk_size=2)))
+
+    def test_parse_ids(self):
+        first_id = transaction_id(self.filename, 0)
+
+        self.assertEqual([first_id + x for x in [2, 3, 5, 6, 7]], [x.transaction_id for x in parse(self.filename)])
+        self.assertEqual(first_id, transaction_id(os.path.relpath(self.filename), 0))
+        self.assertNotEqual(first_id, transaction_id(self.filename + '.copy', 0))
+        self.assertEqual(first_id, transaction_id(os.path.join('moved', os.path.basename(self.filename)), 0))
+
+    def test_iter_parse_shares_assets(self):
+        transactions = list(iter_parse(self.filename))
+
+        self.assertIs(transactions[2].asset, transactions[4].asset)
+        self.assertEqual(Decimal("5555"), transactions[2].volume)
+        self.assertEqual("Exchange 1", transactions[3].asset.group)
+
+    def test_parse_shares_assets_within_file(self):
+        first = parse(self.filename)
+        second = parse(self.filename)
+
+        self.assertIs(first[2].asset, first[4].asset)
+        self.assertIsNot(first[0].asset, second[0].asset)
+        self.assertIsNot(first[0].asset, next(iter_parse(self.filename)).asset)
+
+    def test_partition_by_asset(self):
+        with tempfile.TemporaryDirectory() as directory:
+            partitions = partition_by_asset(self.filename, directory, chunk_size=1)
+
+            self.assertEqual(2, len(partitions))
+            for asset, filename in partitions.items():
+                self.assertEqual([x for x in parse(self.filename) if x.asset == asset], parse(filename))
+
+    def test_iter_parse_by_asset(self):
+        by_asset = list(iter_parse_by_asset(self.filename))
+
+        self.assertEqual(['AMZN', 'BTC'], [asset.symbol for asset, transactions in by_asset])
+        self.assertEqual([3, 2], [len(transactions) for asset, transactions in by_asset])
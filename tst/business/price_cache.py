@@ -0,0 +1,52 @@
+import tempfile
+import unittest
+from datetime import date, timedelta
+from decimal import Decimal
+
+from src.business.price_cache import PriceCache
+from tst.clock import FakeClock
+
+
+class TestPriceCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.clock = FakeClock(1600000000.0)
+        self.ttl = {'STOCK': timedelta(hours=1), 'CRYPTO': timedelta(minutes=1)}
+        self.cache = PriceCache(self.directory.name, self.ttl, memory_size=2, clock=self.clock)
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def test_get_when_empty(self):
+        self.assertIsNone(self.cache.get('AMZN', 'STOCK', date(2020, 9, 13)))
+
+    def test_get_within_ttl(self):
+        self.cache.put('AMZN', 'STOCK', date(2020, 9, 13), Decimal('1.2300'))
+        self.clock.now += 60
+
+        self.assertEqual('1.2300', str(self.cache.get('AMZN', 'STOCK', date(2020, 9, 13))))
+        self.assertIsNone(self.cache.get('AMZN', 'STOCK', date(2020, 9, 14)))
+        self.assertIsNone(self.cache.get('AMZN', 'CRYPTO', date(2020, 9, 13)))
+
+    def test_get_after_ttl(self):
+        self.cache.put('AMZN', 'STOCK', date(2020, 9, 13), Decimal('1.23'))
+        self.cache.put('BTC', 'CRYPTO', date(2020, 9, 13), Decimal('4.56'))
+        self.clock.now += 120
+
+        self.assertEqual(Decimal('1.23'), self.cache.get('AMZN', 'STOCK', date(2020, 9, 13)))
+        self.assertIsNone(self.cache.get('BTC', 'CRYPTO', date(2020, 9, 13)))
+
+    def test_get_from_disk(self):
+        for symbol in ['AMZN', 'MSFT', 'TSLA']:
+            self.cache.put(symbol, 'STOCK', date(2020, 9, 13), Decimal('7.89'))
+
+        self.assertEqual(2, len(self.cache.memory))
+
+        reopened = PriceCache(self.directory.name, self.ttl, clock=self.clock)
+        try:
+            for symbol in ['AMZN', 'MSFT', 'TSLA']:
+                self.assertEqual(Decimal('7.89'), reopened.get(symbol, 'STOCK', date(2020, 9, 13)))
+        finally:
+            reopened.close()
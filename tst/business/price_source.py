@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+from decimal import Decimal
+
+from src.business.price_source import StaticPriceSource, FilePriceSource, PriceSourceChain, PriceSource
+from src.business.stock_fetcher import StockFetcher
+from src.model.transaction import Asset
+
+PRICES = """symbol,date,price
+AMZN,2020-09-14,2450.26
+BTC,2020-11-11,11887.55
+AMZN,2020-09-11,2398.00
+AMZN,2020-12-02,2500.1
+"""
+
+
+class FixedPriceSource(PriceSource):
+
+    def __init__(self, price):
+        self.price = price
+        self.calls = 0
+
+    def get_price(self, asset, as_of=None):
+        self.calls += 1
+        return self.price
+
+
+class TestPriceSource(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'prices.csv')
+        with open(self.filename, 'w') as fp:
+            fp.write(PRICES)
+
+        self.amzn = Asset('Bank1', 'AMZN', 'STOCK')
+        self.btc = Asset('Exchange1', 'BTC', 'CRYPTO')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_static(self):
+        source = StaticPriceSource({'AMZN': Decimal('1.5')})
+
+        self.assertEqual(Decimal('1.5'), source.get_price(self.amzn))
+        self.assertIsNone(source.get_price(self.btc))
+        self.assertIsNone(source.get_price(self.amzn, date(2020, 9, 14)))
+
+    def test_file(self):
+        source = FilePriceSource(self.filename)
+
+        self.assertEqual(Decimal('2500.1'), source.get_price(self.amzn))
+        self.assertEqual(Decimal('2398.00'), source.get_price(self.amzn, date(2020, 9, 11)))
+        self.assertEqual(Decimal('2398.00'), source.get_price(self.amzn, date(2020, 9, 13)))
+        self.assertEqual(Decimal('2450.26'), source.get_price(self.amzn, date(2020, 12, 1)))
+        self.assertIsNone(source.get_price(self.amzn, date(2020, 9, 10)))
+        self.assertEqual(Decimal('11887.55'), source.get_price(self.btc))
+        self.assertIsNone(source.get_price(Asset('Bank1', 'MSFT', 'STOCK')))
+        source.close()
+
+    def test_file_columns_by_header(self):
+        with open(self.filename, 'w') as fp:
+            fp.write("Price,Currency,Date,Symbol\n2450.26,GBP,2020-09-14,AMZN\n2398.00,GBP,2020-09-11,AMZN\n")
+        source = FilePriceSource(self.filename)
+
+        self.assertEqual(Decimal('2450.26'), source.get_price(self.amzn))
+        self.assertEqual(Decimal('2398.00'), source.get_price(self.amzn, date(2020, 9, 12)))
+        source.close()
+
+    def test_file_without_column(self):
+        with open(self.filename, 'w') as fp:
+            fp.write("symbol,price\nAMZN,2450.26\n")
+
+        with self.assertRaises(ValueError):
+            FilePriceSource(self.filename)
+
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            PriceSource()
+
+    def test_file_series(self):
+        source = FilePriceSource(self.filename)
+
+        series = source.get_series('AMZN')
+
+        self.assertEqual([date(2020, 9, 11).toordinal(), date(2020, 9, 14).toordinal(), date(2020, 12, 2).toordinal()],
+                         series.dates)
+        self.assertEqual([Decimal('2398.00'), Decimal('2450.26'), Decimal('2500.1')], series.values)
+        self.assertIsNone(source.get_series('MSFT'))
+        source.close()
+
+    def test_chain(self):
+        first = FixedPriceSource(None)
+        second = FixedPriceSource(Decimal('2'))
+        third = FixedPriceSource(Decimal('3'))
+        chain = PriceSourceChain([first, second, third])
+
+        self.assertEqual(Decimal('2'), chain.get_price(self.amzn))
+        self.assertEqual([1, 1, 0], [first.calls, second.calls, third.calls])
+        self.assertIsNone(PriceSourceChain([first]).get_price(self.amzn))
+
+    def test_stock_fetcher(self):
+        fetcher = StockFetcher('key', price_source=PriceSourceChain([
+            FilePriceSource(self.filename), StaticPriceSource()
+        ]))
+
+        self.assertEqual(Decimal('2500.1'), fetcher.get_price(self.amzn))
+        self.assertEqual(Decimal('2398.00'), fetcher.get_price(self.amzn, date(2020, 9, 12)))
+        self.assertEqual(Decimal('2696.55'), fetcher.get_price(Asset('Exchange1', 'ETH', 'CRYPTO')))
+        self.assertEqual(Decimal(0), fetcher.get_price(Asset('Exchange1', 'ETH', 'CRYPTO'), date(2020, 9, 12)))
@@ -1,8 +1,13 @@
+import random
+import tempfile
 import unittest
 from datetime import datetime, timedelta
 from decimal import Decimal
+from unittest import mock
 
 from src.business.processor import TransactionProcessor
+from src.business.result_cache import ResultCache
+from src.model.tax import MatchRecord
 from src.model.transaction import Asset, Transaction
 
 
@@ -113,6 +118,18 @@ class TestProcessor(unittest.TestCase):
             )
         )
 
+    def test___process_same_day_when_equal_fills(self):
+        sell = Transaction(self.date_mar_1 + timedelta(hours=1), 'SELL', self.buy_mar_1.asset, Decimal(30),
+                           Decimal(7000), None)
+
+        self.assertEqual(
+            [Transaction(self.date_mar_1, 'BUY', self.buy_mar_1.asset, Decimal(40), self.buy_mar_1.taxable_price,
+                         self.buy_mar_1.original_price)],
+            self.process_same_day(
+                [self.buy_mar_1, sell, sell.copy()]
+            )
+        )
+
     def test___process_same_day_when_partial_overlap(self):
         buy1 = self.buy_mar_1
         buy2 = self.buy_mar_2
@@ -227,3 +244,341 @@ class TestProcessor(unittest.TestCase):
                 [self.buy_mar_15, self.sell_apr_1, self.buy_apr_30]
             )
         )
+
+    def test___process_30_days_when_many_transactions(self):
+        transactions = []
+        for idx in range(5000):
+            date = self.date_mar_1 + timedelta(days=idx)
+            transactions.append(Transaction(date, 'BUY', self.buy_mar_1.asset, Decimal(3), Decimal(10), None))
+            transactions.append(Transaction(date, 'SELL', self.sell_mar_1.asset, Decimal(2), Decimal(11), None))
+
+        processed = self.process_30_days(self.process_same_day(transactions))
+
+        self.assertEqual(5000, len(processed))
+        self.assertTrue(all(x.is_buy() and x.volume == Decimal(1) for x in processed))
+
+
+class TestLegacyProcessor(TestProcessor):
+
+    def setUp(self):
+        super().setUp()
+
+        self.processor = TransactionProcessor(legacy_matching=True)
+        self.process_same_day = self.processor._TransactionProcessor__process_same_day
+        self.process_30_days = self.processor._TransactionProcessor__process_30_days
+
+    @unittest.skip("Legacy matching recurses without end on disposals sharing a window")
+    def test___process_30_days_when_no_merge(self):
+        pass
+
+    @unittest.skip("Legacy matching exceeds recursion limit")
+    def test___process_30_days_when_many_transactions(self):
+        pass
+
+
+class TestSweepAgainstLegacy(unittest.TestCase):
+
+    def test_process_matches_legacy_where_it_finishes(self):
+        rng = random.Random(3)
+        asset = Asset('group', 'a', 'b')
+        compared = 0
+        for _ in range(60):
+            date = datetime(2020, 1, 1)
+            transactions = []
+            for idx in range(rng.randrange(2, 14)):
+                date += timedelta(days=rng.choice([0, 1, 5, 20, 40]), hours=rng.randrange(3))
+                kind = 'BUY' if idx == 0 or rng.random() < 0.55 else 'SELL'
+                transactions.append(Transaction(date, kind, asset, Decimal(rng.randrange(1, 10)),
+                                                Decimal(rng.randrange(1, 100)), None, idx))
+
+            try:
+                legacy = TransactionProcessor(legacy_matching=True).process(transactions)[0]
+                sweep = TransactionProcessor().process(transactions)[0]
+            except (RecursionError, ArithmeticError):
+                # Disposals left sharing a window, or the pool sold out before a disposal
+                continue
+
+            self.assertEqual(list(legacy.hold_pools), list(sweep.hold_pools))
+            self.assertEqual(legacy.taxable_records, sweep.taxable_records)
+            self.assertEqual(legacy.match_records, sweep.match_records)
+            compared += 1
+
+        self.assertTrue(compared > 20)
+
+
+class TestParallelProcessor(unittest.TestCase):
+
+    def test_process_matches_serial(self):
+        transactions = []
+        for asset_idx in range(6):
+            asset = Asset('group', f'symbol-{asset_idx}', 'STOCK')
+            for day in range(40):
+                date = datetime(2020, 1, 1) + timedelta(days=day * (asset_idx + 1))
+                transactions.append(Transaction(date, 'BUY', asset, Decimal(5), Decimal(day + 1), None))
+                if day % 3 == 0:
+                    transactions.append(
+                        Transaction(date + timedelta(hours=1), 'SELL', asset, Decimal(2), Decimal(day + 2), None))
+
+        serial = TransactionProcessor().process(transactions)
+        parallel = TransactionProcessor(workers=2, parallel_threshold=0).process(transactions)
+
+        self.assertEqual([x.asset for x in serial], [x.asset for x in parallel])
+        self.assertEqual([x.hold_pools for x in serial], [x.hold_pools for x in parallel])
+        self.assertEqual([x.taxable_records for x in serial], [x.taxable_records for x in parallel])
+        self.assertEqual([x.hold_pools[-1].pool_id for x in parallel],
+                         [x.hold_pools[0].pool_id for x in parallel])
+
+    def test_process_columnar_history(self):
+        transactions = []
+        asset = Asset('group', 'symbol', 'STOCK')
+        for day in range(40):
+            date = datetime(2020, 1, 1) + timedelta(days=day * 7)
+            transactions.append(Transaction(date, 'BUY', asset, Decimal(5), Decimal(day + 1) / 3, None))
+            if day % 3 == 0:
+                transactions.append(Transaction(date + timedelta(hours=1), 'SELL', asset, Decimal(2), Decimal(day), None))
+
+        expected = TransactionProcessor().process(transactions)
+        columnar = TransactionProcessor(columnar_history=True).process(transactions)
+
+        self.assertEqual(list(expected[0].hold_pools), list(columnar[0].hold_pools))
+        self.assertEqual(expected[0].taxable_records, columnar[0].taxable_records)
+
+
+class TestIncrementalProcessor(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(11)
+        self.transactions = []
+        for asset_idx in range(3):
+            asset = Asset('group', f'symbol-{asset_idx}', 'STOCK')
+            date = datetime(2020, 1, 1, 9)
+            for idx in range(150):
+                date += timedelta(days=rng.choice([0, 0, 1, 3, 10, 45]), minutes=rng.randint(0, 30))
+                kind = 'BUY' if idx == 0 or rng.random() < 0.6 else 'SELL'
+                volume = Decimal(rng.randint(1, 20))
+                price = Decimal(rng.randint(100, 10000)) / 100
+                self.transactions.append(Transaction(date, kind, asset, volume, price, None,
+                                                     len(self.transactions)))
+
+        self.dates = sorted(set(x.date.date() for x in self.transactions))
+
+    def assertSameResults(self, expected, actual):
+        self.assertEqual([x.asset for x in expected], [x.asset for x in actual])
+        self.assertEqual([list(x.hold_pools) for x in expected], [list(x.hold_pools) for x in actual])
+        self.assertEqual([x.taxable_records for x in expected], [x.taxable_records for x in actual])
+        self.assertEqual([x.match_records for x in expected], [x.match_records for x in actual])
+
+    def process_in_batches(self, processor, cutoffs):
+        checkpoints = dict()
+        results = None
+        for cutoff in cutoffs:
+            known = [x for x in self.transactions if x.date.date() <= cutoff]
+            results, checkpoints = processor.process_incremental(known, checkpoints)
+
+            self.assertSameResults(TransactionProcessor(columnar_history=processor.columnar_history).process(known),
+                                   results)
+
+        return results, checkpoints
+
+    def test_process_incremental_matches_full(self):
+        self.process_in_batches(TransactionProcessor(), self.dates[::7] + [self.dates[-1]])
+
+    def test_process_incremental_matches_full_columnar(self):
+        self.process_in_batches(TransactionProcessor(columnar_history=True), self.dates[::5] + [self.dates[-1]])
+
+    def test_process_incremental_when_nothing_appended(self):
+        processor = TransactionProcessor()
+        results, checkpoints = processor.process_incremental(self.transactions, dict())
+        _, same_checkpoints = processor.process_incremental(self.transactions, checkpoints)
+
+        self.assertTrue(all(checkpoints[x] is same_checkpoints[x] for x in checkpoints))
+
+    def test_process_incremental_when_back_dated(self):
+        processor = TransactionProcessor()
+        _, checkpoints = processor.process_incremental(self.transactions, dict())
+
+        asset = self.transactions[0].asset
+        back_dated = Transaction(datetime(2020, 2, 1, 12), 'SELL', asset, Decimal(3), Decimal(50), None)
+        transactions = self.transactions + [back_dated]
+        results, _ = processor.process_incremental(transactions, checkpoints)
+
+        self.assertSameResults(processor.process(transactions), results)
+
+    def test_process_incremental_when_legacy_matching(self):
+        with self.assertRaises(ValueError):
+            TransactionProcessor(legacy_matching=True).process_incremental(self.transactions, dict())
+
+
+class TestCachedProcessor(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(self.directory.name)
+
+        self.transactions = []
+        for asset_idx in range(3):
+            asset = Asset('group', f'symbol-{asset_idx}', 'STOCK')
+            for day in range(20):
+                date = datetime(2020, 1, 1) + timedelta(days=day * 11)
+                self.transactions.append(Transaction(date, 'BUY', asset, Decimal(5), Decimal(day + 1), None))
+                if day % 3 == 0:
+                    self.transactions.append(
+                        Transaction(date + timedelta(hours=1), 'SELL', asset, Decimal(2), Decimal(day + 2), None))
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def test_process_when_cached(self):
+        expected = TransactionProcessor().process(self.transactions)
+        TransactionProcessor(result_cache=self.cache).process(self.transactions)
+
+        with mock.patch.object(TransactionProcessor, 'process_single_asset', side_effect=AssertionError):
+            cached = TransactionProcessor(result_cache=self.cache).process(self.transactions)
+
+        self.assertEqual([x.hold_pools for x in expected], [x.hold_pools for x in cached])
+        self.assertEqual([x.taxable_records for x in expected], [x.taxable_records for x in cached])
+
+    def test_process_when_group_changed(self):
+        processor = TransactionProcessor(result_cache=self.cache)
+        processor.process(self.transactions)
+
+        moved = list(self.transactions)
+        moved[2] = moved[2].copy()
+        moved[2].asset = Asset('other group', moved[2].asset.symbol, moved[2].asset.type)
+        processed = processor.process(moved)
+
+        self.assertEqual(['group', 'other group'], [x.asset.group for x in processed[0].hold_pools[:2]])
+        self.assertEqual([list(x.hold_pools) for x in TransactionProcessor().process(moved)],
+                         [list(x.hold_pools) for x in processed])
+
+    def test_process_when_ids_changed(self):
+        processor = TransactionProcessor(result_cache=self.cache)
+        processor.process(self.transactions)
+
+        renumbered = [x.copy() for x in self.transactions]
+        for idx, transaction in enumerate(renumbered):
+            transaction.transaction_id = idx
+        processed = processor.process(renumbered)
+
+        self.assertEqual([x.match_records for x in TransactionProcessor().process(renumbered)],
+                         [x.match_records for x in processed])
+        self.assertEqual((0, 1), (processed[0].match_records[0].buy_id, processed[0].match_records[0].sell_id))
+
+    def test_process_by_asset(self):
+        expected = TransactionProcessor().process(self.transactions)
+        asset_transactions = [(x.asset, [y for y in self.transactions if y.asset == x.asset]) for x in expected]
+
+        for _ in range(2):
+            processed = TransactionProcessor(result_cache=self.cache).process_by_asset(iter(asset_transactions))
+
+            self.assertEqual([x.asset for x in expected], [x.asset for x in processed])
+            self.assertEqual([x.hold_pools for x in expected], [x.hold_pools for x in processed])
+            self.assertEqual([x.taxable_records for x in expected], [x.taxable_records for x in processed])
+
+        self.assertEqual(len(expected), len(TransactionProcessor(result_cache=self.cache).process(self.transactions)))
+
+    def test_process_when_one_asset_changed(self):
+        processor = TransactionProcessor(workers=2, parallel_threshold=0, result_cache=self.cache)
+        processor.process(self.transactions)
+
+        changed = self.transactions + [
+            Transaction(datetime(2021, 1, 1), 'BUY', self.transactions[0].asset, Decimal(1), Decimal(9), None)
+        ]
+        processed = processor.process(changed)
+        expected = TransactionProcessor().process(changed)
+
+        self.assertEqual([x.asset for x in expected], [x.asset for x in processed])
+        self.assertEqual([x.hold_pools for x in expected], [x.hold_pools for x in processed])
+        self.assertEqual([x.taxable_records for x in expected], [x.taxable_records for x in processed])
+
+
+class TestMerge(unittest.TestCase):
+
+    def setUp(self):
+        self.processor = TransactionProcessor(legacy_matching=True)
+        self.merge = self.processor._TransactionProcessor__merge
+        self.asset = Asset('group', 'a', 'b')
+
+    # Nested loop the two pointer merge replaced
+    @staticmethod
+    def nested_merge(transactions):
+        buys = [x.copy() for x in transactions if x.is_buy()]
+        sells = [x.copy() for x in transactions if x.is_sell()]
+
+        for buy in buys:
+            for sell in sells:
+                if sell.volume <= 0:
+                    continue
+
+                if buy.volume <= 0:
+                    break
+
+                if sell.volume <= buy.volume:
+                    buy.volume -= sell.volume
+                    sell.volume -= sell.volume
+                else:
+                    sell.volume -= buy.volume
+                    buy.volume = 0
+
+        return [x for x in buys if x.volume > 0] + [x for x in sells if x.volume > 0]
+
+    def test_merge_matches_nested_loop(self):
+        rng = random.Random(7)
+        for _ in range(200):
+            transactions = [
+                Transaction(datetime(2020, 1, 1, rng.randrange(24)), rng.choice(['BUY', 'SELL']), self.asset,
+                            Decimal(rng.randrange(0, 20)), Decimal(rng.randrange(1, 100)), None)
+                for _ in range(rng.randrange(2, 30))
+            ]
+            matches = []
+
+            merged = self.merge(transactions, 0, matches)
+
+            expected = self.nested_merge(transactions)
+            self.assertEqual([(x.type, x.date, x.volume) for x in expected],
+                             [(x.type, x.date, x.volume) for x in merged])
+
+            bought = sum(x.volume for x in transactions if x.is_buy())
+            left = sum(x.volume for x in merged if x.is_buy())
+            self.assertEqual(bought - left, sum(x.volume for x in matches))
+            self.assertTrue(all(x.volume > 0 and x.rule == 'SAME_DAY' for x in matches))
+
+    def test_merge_records_pairs(self):
+        buy_1 = Transaction(datetime(2020, 1, 1, 9), 'BUY', self.asset, Decimal(3), Decimal(10), None)
+        buy_2 = Transaction(datetime(2020, 1, 1, 10), 'BUY', self.asset, Decimal(5), Decimal(11), None)
+        sell = Transaction(datetime(2020, 1, 1, 11), 'SELL', self.asset, Decimal(4), Decimal(12), None)
+        matches = []
+
+        merged = self.merge([buy_1, buy_2, sell], 30, matches)
+
+        self.assertEqual([(buy_2.date, Decimal(4))], [(x.date, x.volume) for x in merged])
+        self.assertEqual([
+            MatchRecord('30_DAYS', buy_1.date, sell.date, Decimal(3), Decimal(10), Decimal(12)),
+            MatchRecord('30_DAYS', buy_2.date, sell.date, Decimal(1), Decimal(11), Decimal(12)),
+        ], matches)
+
+
+class TestMatchRecords(unittest.TestCase):
+
+    def setUp(self):
+        asset = Asset('group', 'a', 'b')
+        self.transactions = [
+            Transaction(datetime(2020, 1, 1), 'BUY', asset, Decimal(10), Decimal(100), None),
+            Transaction(datetime(2020, 2, 1), 'SELL', asset, Decimal(4), Decimal(130), None),
+            Transaction(datetime(2020, 2, 1, 1), 'BUY', asset, Decimal(1), Decimal(120), None),
+            Transaction(datetime(2020, 2, 10), 'BUY', asset, Decimal(2), Decimal(110), None),
+            Transaction(datetime(2020, 6, 1), 'SELL', asset, Decimal(1), Decimal(140), None),
+        ]
+
+    def test_process(self):
+        for processor in [TransactionProcessor(), TransactionProcessor(legacy_matching=True)]:
+            processed = processor.process(self.transactions)
+
+            self.assertEqual([
+                MatchRecord('SAME_DAY', datetime(2020, 2, 1, 1), datetime(2020, 2, 1), Decimal(1), Decimal(120),
+                            Decimal(130)),
+                MatchRecord('30_DAYS', datetime(2020, 2, 10), datetime(2020, 2, 1), Decimal(2), Decimal(110),
+                            Decimal(130)),
+            ], processed[0].match_records)
+            self.assertEqual(Decimal(50), sum(x.amount() for x in processed[0].match_records))
@@ -0,0 +1,126 @@
+import unittest
+from datetime import datetime
+from decimal import Decimal
+
+from src.business.processor import TransactionProcessor
+from src.business.profiler import Profiler, PROFILER
+from src.business.rate_limiter import RateLimiter
+from src.model.transaction import Asset, Transaction
+from tst.clock import FakeClock
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.profiler = Profiler(self.clock)
+
+    def test_disabled(self):
+        with self.profiler.timer('stage'):
+            self.clock.now += 1.0
+
+        self.profiler.count('calls')
+        self.profiler.maximum('depth', 3)
+
+        self.assertEqual(dict(), self.profiler.timings)
+        self.assertEqual(dict(), self.profiler.counters)
+
+    def test_timer(self):
+        self.profiler.enable()
+
+        for seconds in [1.0, 3.0]:
+            with self.profiler.timer('stage'):
+                self.clock.now += seconds
+
+        self.assertEqual([2, 4.0, 3.0], self.profiler.timings['stage'])
+
+    def test_timer_when_raised(self):
+        self.profiler.enable()
+
+        with self.assertRaises(ValueError):
+            with self.profiler.timer('stage'):
+                self.clock.now += 2.0
+                raise ValueError()
+
+        self.assertEqual([1, 2.0, 2.0], self.profiler.timings['stage'])
+
+    def test_count_and_maximum(self):
+        self.profiler.enable()
+
+        self.profiler.count('calls')
+        self.profiler.count('calls', 2)
+        self.profiler.maximum('depth', 3)
+        self.profiler.maximum('depth', 1)
+
+        self.assertEqual({'calls': 3, 'depth': 3}, self.profiler.counters)
+
+    def test_summary(self):
+        self.profiler.enable()
+
+        with self.profiler.timer('short'):
+            self.clock.now += 1.0
+        with self.profiler.timer('long'):
+            self.clock.now += 2.0
+        self.profiler.count('sleep sec', 0.5)
+
+        lines = self.profiler.summary(limit=1).split("\n")
+
+        self.assertTrue(lines[1].startswith('long '))
+        self.assertEqual('... 1 more timers', lines[2])
+        self.assertTrue(lines[-1].startswith('sleep sec '))
+        self.assertTrue(lines[-1].endswith('0.5000'))
+
+    def test_reset(self):
+        self.profiler.enable()
+        with self.profiler.timer('stage'):
+            pass
+        self.profiler.count('calls')
+
+        self.profiler.reset()
+
+        self.assertEqual(dict(), self.profiler.timings)
+        self.assertEqual(dict(), self.profiler.counters)
+
+
+class TestProfiledRun(unittest.TestCase):
+
+    def setUp(self):
+        PROFILER.reset()
+        PROFILER.enable()
+
+        asset = Asset('group', 'a', 'b')
+        self.transactions = [
+            Transaction(datetime(2020, 1, 1), 'BUY', asset, Decimal(10), Decimal(100), Decimal(1)),
+            Transaction(datetime(2020, 1, 1, 1), 'SELL', asset, Decimal(2), Decimal(120), Decimal(1)),
+            Transaction(datetime(2020, 2, 1), 'SELL', asset, Decimal(2), Decimal(130), Decimal(1)),
+            Transaction(datetime(2020, 2, 10), 'BUY', asset, Decimal(1), Decimal(110), Decimal(1)),
+        ]
+
+    def tearDown(self):
+        PROFILER.disable()
+        PROFILER.reset()
+
+    def test_process(self):
+        TransactionProcessor().process(self.transactions)
+
+        self.assertEqual({'asset a b', 'match same day', 'match 30 days', 'replay'}, set(PROFILER.timings.keys()))
+        self.assertEqual(2, PROFILER.counters['merges'])
+
+    def test_process_legacy(self):
+        TransactionProcessor(legacy_matching=True).process(self.transactions)
+
+        self.assertEqual(2, PROFILER.counters['merges'])
+        self.assertEqual(2, PROFILER.counters['recursion depth'])
+
+    def test_throttle_sleep(self):
+        clock = FakeClock()
+        limiter = RateLimiter.per_minute_and_day(1, 25, clock=clock, sleep=clock.sleep)
+
+        limiter.acquire()
+        limiter.acquire()
+
+        self.assertAlmostEqual(60.0, PROFILER.counters['throttle sleep sec'], places=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+from src.business.rate_limiter import RateLimiter, RateLimitExceeded
+from tst.clock import FakeClock
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.logged = list()
+        self.limiter = RateLimiter.per_minute_and_day(5, 25, clock=self.clock, sleep=self.clock.sleep,
+                                                      log=self.logged.append)
+
+    def test_acquire_within_budget(self):
+        for _ in range(3):
+            self.limiter.acquire()
+
+        self.assertEqual([], self.clock.slept)
+
+    def test_acquire_waits_for_refill(self):
+        for _ in range(5):
+            self.limiter.acquire()
+
+        self.limiter.acquire()
+
+        self.assertEqual(1, len(self.clock.slept))
+        self.assertAlmostEqual(12.0, self.clock.slept[0], places=3)
+        self.assertEqual(["Avoiding throttling for 12.0 sec"], self.logged)
+
+    def test_acquire_counts_idle_time(self):
+        for _ in range(5):
+            self.limiter.acquire()
+
+        self.clock.now += 120
+        for _ in range(5):
+            self.limiter.acquire()
+
+        self.assertEqual([], self.clock.slept)
+
+    def test_acquire_when_day_budget_exhausted(self):
+        for _ in range(25):
+            self.clock.now += 60
+            self.limiter.acquire()
+
+        with self.assertRaises(RateLimitExceeded):
+            self.limiter.acquire()
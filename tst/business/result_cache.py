@@ -0,0 +1,107 @@
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from src.business.result_cache import ResultCache
+from src.model.hold_pool import HoldPool, TaxableHoldPool
+from src.model.tax import TaxableRecord
+from src.model.transaction import Asset, Transaction
+from tst.clock import FakeClock
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.clock = FakeClock(1600000000.0)
+        self.cache = ResultCache(self.directory.name, max_size=1024 * 1024, max_age=timedelta(days=1),
+                                 clock=self.clock)
+
+        self.asset = Asset('group', 'symbol', 'STOCK')
+        self.date = datetime(2020, 1, 1, 9)
+        self.transactions = [
+            Transaction(self.date, 'BUY', self.asset, Decimal(10), Decimal(5), None),
+            Transaction(self.date + timedelta(days=40), 'SELL', self.asset, Decimal(4), Decimal(6), None),
+        ]
+        self.result = TaxableHoldPool(
+            self.asset,
+            [HoldPool(self.date, self.asset, Decimal(10), Decimal(50))],
+            [TaxableRecord(self.date, '2019/2020', 'GAIN', Decimal(4))]
+        )
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def test_digest_is_stable(self):
+        digest = ResultCache.digest(self.asset, self.transactions)
+
+        self.assertEqual(digest, ResultCache.digest(self.asset, list(reversed(self.transactions))))
+
+        # A fresh interpreter with another string hash salt has to produce the same digest
+        script = "from tst.business.result_cache import TestResultCache\n" \
+                 "test = TestResultCache()\n" \
+                 "test.setUp()\n" \
+                 "print(ResultCache.digest(test.asset, test.transactions))\n" \
+                 "test.tearDown()"
+        output = subprocess.run([sys.executable, '-c', 'from src.business.result_cache import ResultCache\n' + script],
+                                env={**os.environ, 'PYTHONHASHSEED': '1'}, capture_output=True, text=True, check=True)
+        self.assertEqual(digest, output.stdout.strip())
+
+    def test_digest_when_changed(self):
+        digest = ResultCache.digest(self.asset, self.transactions)
+        changed = self.transactions[:1] + [
+            Transaction(self.date + timedelta(days=40), 'SELL', self.asset, Decimal(4), Decimal(7), None)
+        ]
+
+        self.assertNotEqual(digest, ResultCache.digest(self.asset, changed))
+        self.assertNotEqual(digest, ResultCache.digest(Asset('other', 'symbol', 'STOCK'), self.transactions))
+        self.assertNotEqual(digest, ResultCache.digest(self.asset, self.transactions, True))
+
+    def test_get_when_empty(self):
+        self.assertIsNone(self.cache.get('digest'))
+
+    def test_put_and_get(self):
+        self.cache.put('digest', self.result)
+
+        cached = self.cache.get('digest')
+
+        self.assertEqual(self.result.hold_pools, cached.hold_pools)
+        self.assertEqual(self.result.taxable_records, cached.taxable_records)
+
+    def test_get_when_expired(self):
+        self.cache.put('digest', self.result)
+        self.clock.now += timedelta(days=2).total_seconds()
+
+        self.assertIsNone(self.cache.get('digest'))
+        self.assertEqual(0, self.cache.size())
+
+    def test_pickle(self):
+        self.cache.put('digest', self.result)
+
+        copy = pickle.loads(pickle.dumps(self.cache))
+        copy.put('other', self.result)
+
+        self.assertEqual(self.result.taxable_records, copy.get('digest').taxable_records)
+        self.assertIsNotNone(self.cache.get('other'))
+        copy.close()
+
+    def test_put_evicts_least_recently_used(self):
+        self.cache.put('first', self.result)
+        self.cache.max_size = self.cache.size() * 2
+
+        self.clock.now += 1
+        self.cache.put('second', self.result)
+        self.clock.now += 1
+        self.cache.get('first')
+        self.clock.now += 1
+        self.cache.put('third', self.result)
+
+        self.assertIsNotNone(self.cache.get('first'))
+        self.assertIsNone(self.cache.get('second'))
+        self.assertIsNotNone(self.cache.get('third'))
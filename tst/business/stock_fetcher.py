@@ -0,0 +1,160 @@
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from src.business.price_cache import PriceCache
+from src.business.rate_limiter import RateLimiter
+from src.business.stock_fetcher import StockFetcher
+from src.model.transaction import Asset
+
+
+class TestStockFetcher(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.slept = list()
+        self.rate_limiter = RateLimiter.per_minute_and_day(5, 25, clock=lambda: 0.0, sleep=self.slept.append)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def __response(self, url):
+        response = mock.Mock()
+        if 'outputsize=full' in url and 'FX_DAILY' in url:
+            response.json.return_value = {'Time Series FX (Daily)': {
+                '2020-09-11': {'4. close': '0.78'}, '2020-09-14': {'4. close': '0.77'}
+            }}
+        elif 'outputsize=full' in url:
+            response.json.return_value = {'Time Series (Daily)': {
+                '2020-09-14': {'4. close': '10.00'}, '2020-09-11': {'4. close': '9.00'}, '2020-09-10': {'4. close': '8.00'}
+            }}
+        elif 'DIGITAL_CURRENCY_DAILY' in url:
+            response.json.return_value = {'Time Series (Digital Currency Daily)': {
+                '2020-09-11': {'4a. close (GBP)': '8000.00'}
+            }}
+        elif 'TIME_SERIES_DAILY' in url:
+            response.json.return_value = {'Time Series (Daily)': {'2020-09-11': {'4. close': '3116.2200'}}}
+        else:
+            response.json.return_value = {'Realtime Currency Exchange Rate': {'5. Exchange Rate': '0.78'}}
+        return response
+
+    @mock.patch('src.business.stock_fetcher.requests.Session')
+    def test_repeat_run_within_ttl(self, session):
+        get = session.return_value.get
+        get.side_effect = self.__response
+
+        first_run = StockFetcher('key', PriceCache(self.directory.name), self.rate_limiter)
+        self.assertEqual(Decimal('3116.2200'), first_run.get_us_stock_price('AMZN'))
+        self.assertEqual(Decimal('0.78'), first_run.get_usd_to_gbp())
+        self.assertEqual(Decimal('0.78'), first_run.get_usd_to_gbp())
+        self.assertEqual(2, get.call_count)
+        first_run.price_cache.close()
+
+        second_run = StockFetcher('key', PriceCache(self.directory.name), self.rate_limiter)
+        self.assertEqual(Decimal('3116.2200'), second_run.get_us_stock_price('AMZN'))
+        self.assertEqual(Decimal('0.78'), second_run.get_usd_to_gbp())
+        self.assertEqual(2, get.call_count)
+        second_run.price_cache.close()
+
+        self.assertEqual([], self.slept)
+
+    @mock.patch('src.business.stock_fetcher.requests.Session')
+    def test_usd_to_gbp_once_per_run(self, session):
+        get = session.return_value.get
+        get.side_effect = self.__response
+
+        fetcher = StockFetcher('key', rate_limiter=self.rate_limiter)
+        fetcher.get_usd_to_gbp()
+        fetcher.get_usd_to_gbp()
+
+        self.assertEqual(1, get.call_count)
+
+    @mock.patch('src.business.stock_fetcher.requests.Session')
+    def test_requests_share_rate_limit(self, session):
+        get = session.return_value.get
+        get.side_effect = self.__response
+
+        fetcher = StockFetcher('key', rate_limiter=self.rate_limiter)
+        for symbol in ['AMZN', 'MSFT', 'TSLA']:
+            fetcher.get_us_stock_price(symbol)
+        fetcher.get_crypto_price('BTC')
+        fetcher.get_usd_to_gbp()
+        fetcher.get_crypto_price('ETH')
+
+        self.assertEqual(6, get.call_count)
+        self.assertEqual(1, len(self.slept))
+
+    def test_get_prices(self):
+        fetcher = StockFetcher('key', rate_limiter=self.rate_limiter)
+        assets = [Asset('Bank1', 'AMZN', 'STOCK'), Asset('Exchange1', 'BTC', 'CRYPTO'),
+                  Asset('Bank2', 'AMZN', 'STOCK'), Asset('Bank1', 'UNKNOWN', 'STOCK')]
+
+        prices = fetcher.get_prices(assets)
+
+        self.assertEqual(3, len(prices))
+        self.assertEqual(Decimal('179.35'), prices[assets[0]])
+        self.assertEqual(Decimal('77364.07'), prices[assets[1]])
+        self.assertEqual(Decimal(0), prices[assets[3]])
+
+    @mock.patch('src.business.stock_fetcher.requests.Session')
+    def test_get_historical_price(self, session):
+        get = session.return_value.get
+        get.side_effect = self.__response
+
+        fetcher = StockFetcher('key', rate_limiter=self.rate_limiter)
+        amzn = Asset('Bank1', 'AMZN', 'STOCK')
+        btc = Asset('Exchange1', 'BTC', 'CRYPTO')
+
+        self.assertEqual(Decimal('9.00') * Decimal('0.78'), fetcher.get_historical_price(amzn, date(2020, 9, 13)))
+        self.assertEqual(Decimal('10.00') * Decimal('0.77'), fetcher.get_historical_price(amzn, date(2020, 9, 14)))
+        self.assertIsNone(fetcher.get_historical_price(amzn, date(2020, 9, 10)))
+        self.assertEqual(Decimal('8000.00'), fetcher.get_historical_price(btc, date(2020, 12, 31)))
+        self.assertIsNone(fetcher.get_historical_price(btc, date(2020, 1, 1)))
+
+        self.assertEqual(3, get.call_count)
+
+    @mock.patch('src.business.stock_fetcher.requests.Session')
+    def test_series_download_concurrently(self, session):
+        # Both downloads have to be in flight at once to pass the barrier
+        barrier = threading.Barrier(2, timeout=5)
+
+        def get(url):
+            barrier.wait()
+            return self.__response(url)
+
+        session.return_value.get.side_effect = get
+        fetcher = StockFetcher('key', rate_limiter=self.rate_limiter)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            series = list(executor.map(lambda x: x(), [lambda: fetcher.get_stock_series('AMZN'),
+                                                       lambda: fetcher.get_crypto_series('BTC')]))
+
+        self.assertEqual([3, 1], [len(x) for x in series])
+
+    @mock.patch('src.business.stock_fetcher.requests.Session')
+    def test_series_downloaded_once(self, session):
+        get = session.return_value.get
+        get.side_effect = self.__response
+        fetcher = StockFetcher('key', rate_limiter=self.rate_limiter)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            series = list(executor.map(lambda x: fetcher.get_stock_series('AMZN'), range(8)))
+
+        self.assertEqual(1, get.call_count)
+        self.assertTrue(all(x is series[0] for x in series))
+
+    @mock.patch('src.business.stock_fetcher.requests.Session')
+    def test_series_retried_after_failure(self, session):
+        get = session.return_value.get
+        get.side_effect = [mock.Mock(**{'json.return_value': {'Note': 'limit'}}), self.__response('outputsize=full')]
+        fetcher = StockFetcher('key', rate_limiter=self.rate_limiter)
+
+        with mock.patch('builtins.print'), self.assertRaises(KeyError):
+            fetcher.get_stock_series('AMZN')
+
+        self.assertEqual(3, len(fetcher.get_stock_series('AMZN')))
+
@@ -0,0 +1,53 @@
+import unittest
+from datetime import datetime
+from decimal import Decimal
+
+from config import TAX_RATES
+from src.business.tax_summary import TaxSummary
+from src.model.hold_pool import HoldPool, TaxableHoldPool
+from src.model.tax import TaxableRecord
+from src.model.transaction import Asset
+
+
+class TestTaxSummary(unittest.TestCase):
+
+    def setUp(self):
+        self.asset_a = Asset('group', 'a', 'STOCK')
+        self.asset_b = Asset('group', 'b', 'STOCK')
+
+        self.record_a_2020 = TaxableRecord(datetime(2020, 5, 1), '2020/2021', 'GAIN', Decimal('20000.50'))
+        self.record_a_2019 = TaxableRecord(datetime(2020, 3, 1), '2019/2020', 'LOSS', Decimal('100.20'))
+        self.record_a_2020_2 = TaxableRecord(datetime(2020, 6, 1), '2020/2021', 'LOSS', Decimal('1000.10'))
+        self.record_b_2020 = TaxableRecord(datetime(2020, 7, 1), '2020/2021', 'GAIN', Decimal('300.70'))
+
+        hold_pool_a = HoldPool(datetime(2019, 1, 1), self.asset_a, Decimal(1), Decimal(1))
+        hold_pool_b = HoldPool(datetime(2019, 1, 1), self.asset_b, Decimal(1), Decimal(1))
+        self.taxable_hold_pools = [
+            TaxableHoldPool(self.asset_a, [hold_pool_a], [self.record_a_2019, self.record_a_2020, self.record_a_2020_2]),
+            TaxableHoldPool(self.asset_b, [hold_pool_b], [self.record_b_2020]),
+        ]
+
+    def test_of_when_empty(self):
+        self.assertEqual(0, len(TaxSummary.of([])))
+
+    def test_of_groups_by_tax_year_and_asset(self):
+        summary = TaxSummary.of(self.taxable_hold_pools)
+
+        self.assertEqual(['2019/2020', '2020/2021'], [x.tax_year for x in summary])
+        self.assertEqual([(self.asset_a, [self.record_a_2020, self.record_a_2020_2]),
+                          (self.asset_b, [self.record_b_2020])],
+                         summary.tax_year('2020/2021').asset_records)
+        self.assertEqual([self.record_a_2019], summary.tax_year('2019/2020').records)
+        self.assertIsNone(summary.tax_year('2021/2022'))
+
+    def test_of_totals(self):
+        summary = TaxSummary.of(self.taxable_hold_pools)
+
+        year_2019 = summary.tax_year('2019/2020')
+        self.assertEqual(TaxableRecord(None, '2019/2020', 'LOSS', Decimal(100)), year_2019.total)
+        self.assertEqual(0, year_2019.tax_to_pay)
+
+        year_2020 = summary.tax_year('2020/2021')
+        self.assertEqual(TaxableRecord(None, '2020/2021', 'GAIN', Decimal(19301)), year_2020.total)
+        self.assertEqual(TAX_RATES['2020/2021'], year_2020.tax_rate)
+        self.assertEqual(TAX_RATES['2020/2021'].calculate_tax_to_pay(Decimal(19301)), year_2020.tax_to_pay)
@@ -0,0 +1,105 @@
+import unittest
+from datetime import date, datetime
+from decimal import Decimal
+
+from src.business.price_source import PriceSeries
+from src.business.processor import TransactionProcessor
+from src.business.time_series import PortfolioTimeSeries, HoldSeries
+from src.model.transaction import Asset, Transaction
+
+
+class TestTimeSeries(unittest.TestCase):
+
+    def setUp(self):
+        self.asset = Asset('group', 'a', 'STOCK')
+        self.other = Asset('group', 'b', 'STOCK')
+        self.transactions = [
+            Transaction(datetime(2020, 1, 2, 10), 'BUY', self.asset, Decimal(10), Decimal(100), Decimal(1)),
+            Transaction(datetime(2020, 1, 2, 15), 'BUY', self.asset, Decimal(10), Decimal(200), Decimal(1)),
+            Transaction(datetime(2020, 3, 1), 'SELL', self.asset, Decimal(5), Decimal(300), Decimal(1)),
+            Transaction(datetime(2020, 1, 5), 'BUY', self.other, Decimal(1), Decimal(50), Decimal(1)),
+        ]
+        self.prices = PriceSeries.from_rows([(date(2020, 1, 3), Decimal(160)), (date(2020, 1, 6), Decimal(170))])
+
+    def create(self, columnar_history: bool = False) -> PortfolioTimeSeries:
+        processed = TransactionProcessor(columnar_history=columnar_history).process(self.transactions)
+        return PortfolioTimeSeries.of(processed)
+
+    def test_as_of(self):
+        series = self.create()[self.asset]
+
+        self.assertIsNone(series.as_of(datetime(2020, 1, 2, 9)))
+        self.assertEqual(Decimal(10), series.as_of(datetime(2020, 1, 2, 12)).volume)
+        self.assertEqual(Decimal(20), series.as_of(datetime(2020, 1, 2, 15)).volume)
+        self.assertEqual(Decimal(3000), series.as_of(datetime(2020, 2, 1)).cost)
+        self.assertEqual(Decimal(15), series.as_of(datetime(2020, 3, 2)).volume)
+
+    def test_on(self):
+        series = self.create()[self.asset]
+
+        self.assertIsNone(series.on(date(2020, 1, 1)))
+        self.assertEqual(Decimal(20), series.on(date(2020, 1, 2)).volume)
+        self.assertEqual(Decimal(20), series.on(date(2020, 2, 29)).volume)
+        self.assertEqual(Decimal(15), series.on(date(2020, 3, 1)).volume)
+
+    def test_between(self):
+        series = self.create()[self.asset]
+
+        between = series.between(datetime(2020, 1, 2, 12), datetime(2020, 3, 1))
+
+        self.assertEqual([datetime(2020, 1, 2, 15), datetime(2020, 3, 1)], between.moments)
+        self.assertEqual([Decimal(20), Decimal(15)], between.volumes)
+
+    def test_portfolio_as_of(self):
+        hold_pools = self.create().as_of(datetime(2020, 1, 3))
+
+        self.assertEqual([self.asset], list(hold_pools.keys()))
+
+    def test_daily(self):
+        daily = self.create()[self.asset].daily(date(2020, 1, 1), date(2020, 1, 4))
+
+        self.assertEqual([date(2020, 1, 1), date(2020, 1, 2), date(2020, 1, 3), date(2020, 1, 4)], daily.dates())
+        self.assertEqual([None, Decimal(20), Decimal(20), Decimal(20)], daily.volumes)
+        self.assertEqual([None, Decimal(3000), Decimal(3000), Decimal(3000)], daily.costs)
+
+    def test_daily_reversed(self):
+        with self.assertRaises(ValueError):
+            self.create()[self.asset].daily(date(2020, 1, 2), date(2020, 1, 1))
+
+    def test_prices(self):
+        daily = self.create()[self.asset].daily(date(2020, 1, 1), date(2020, 1, 7))
+
+        self.assertEqual([None, None, Decimal(160), Decimal(160), Decimal(160), Decimal(170), Decimal(170)],
+                         daily.prices(self.prices))
+
+    def test_unrealised_gains(self):
+        gains = self.create().unrealised_gains(date(2020, 1, 1), date(2020, 1, 6), {'a': self.prices})
+
+        self.assertEqual([self.asset], list(gains.keys()))
+        self.assertEqual([None, None, Decimal(200), Decimal(200), Decimal(200), Decimal(400)], gains[self.asset])
+
+    def test_market_values(self):
+        daily = self.create()[self.other].daily(date(2020, 1, 3), date(2020, 1, 6))
+
+        self.assertEqual([None, None, Decimal(160), Decimal(170)], daily.market_values(self.prices))
+
+    def test_columnar(self):
+        for asset in [self.asset, self.other]:
+            expected = self.create()[asset]
+            actual = self.create(columnar_history=True)[asset]
+
+            self.assertEqual(expected.moments, actual.moments)
+            self.assertEqual(expected.volumes, actual.volumes)
+            self.assertEqual(expected.costs, actual.costs)
+
+    def test_against_hold_pools(self):
+        hold_pools = TransactionProcessor().process(self.transactions)[0].hold_pools
+        series = HoldSeries.of(TransactionProcessor().process(self.transactions)[0])
+
+        for hold_pool in hold_pools:
+            self.assertEqual(hold_pool.volume, series.as_of(hold_pool.date).volume)
+            self.assertEqual(hold_pool.cost, series.as_of(hold_pool.date).cost)
+
+
+if __name__ == '__main__':
+    unittest.main()
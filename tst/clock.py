@@ -0,0 +1,13 @@
+# Clock of the tests, time only moves when a test moves it or sleeps. Sleeps are recorded
+class FakeClock(object):
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+        self.slept = list()
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.slept.append(seconds)
+        self.now += seconds
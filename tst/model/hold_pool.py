@@ -2,7 +2,7 @@ import unittest
 from datetime import datetime
 from decimal import Decimal
 
-from src.model.hold_pool import HoldPool
+from src.model.hold_pool import HoldPool, HoldHistory, split_decimal, join_decimal
 from src.model.tax import TaxableRecord
 from src.model.transaction import Asset, Transaction
 
@@ -127,4 +127,41 @@ class TestHoldPool(unittest.TestCase):
         self.assertEqual(pool3, HoldPool(date3, asset1, Decimal("3"), Decimal("6")))
 
         self.assertEqual(record2, TaxableRecord(date2, "2020/2021", "LOSS", Decimal(abs((0.50 - 2.00) * 5))))
-        self.assertEqual(record3, TaxableRecord(date3, "2020/2021", "GAIN", Decimal(abs((3.00 - 2.00) * 2))))
\ No newline at end of file
+        self.assertEqual(record3, TaxableRecord(date3, "2020/2021", "GAIN", Decimal(abs((3.00 - 2.00) * 2))))
+
+
+class TestHoldHistory(unittest.TestCase):
+
+    def test_append(self):
+        asset = Asset('group-1', 'a', 'b')
+        pool1 = HoldPool(datetime(2020, 1, 2), asset, Decimal("10"), Decimal("20.50"))
+        pool2 = pool1.deposit(Transaction(datetime(2020, 1, 3), "BUY", asset, Decimal("0.001"), Decimal("3"), None))
+        pool3, record = pool2.dispose(Transaction(datetime(2020, 1, 4), "SELL", asset, Decimal("7"), Decimal("1"), None))
+
+        history = HoldHistory(asset)
+        for pool in [pool1, pool2, pool3]:
+            history.append(pool)
+
+        self.assertEqual(3, len(history))
+        self.assertEqual([pool1, pool2, pool3], list(history))
+        self.assertEqual([str(x.cost) for x in [pool1, pool2, pool3]], [str(x.cost) for x in history])
+        self.assertEqual(pool3, history[-1])
+        self.assertEqual(2, history[-1].pool_index)
+        self.assertEqual(pool1.pool_id, history[0].pool_id)
+
+        with self.assertRaises(IndexError):
+            history[3]
+
+        with self.assertRaises(ValueError):
+            history.append(HoldPool(datetime(2020, 1, 5), asset, Decimal("1"), Decimal("1")))
+
+    def test_split_decimal(self):
+        for text in ["0", "-0.50", "20.50", "1E+3", "1.5E-9", "-123456789.123456789012345678", "0E-7"]:
+            value = Decimal(text)
+            coefficient, exponent = split_decimal(value)
+
+            self.assertEqual(value.as_tuple().exponent, exponent)
+            self.assertEqual(str(value), str(join_decimal(coefficient, exponent)))
+
+        with self.assertRaises(ValueError):
+            split_decimal(Decimal("NaN"))
@@ -1,7 +1,9 @@
 import unittest
-from datetime import date
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
 
 from config import TAX_PERIOD
+from src.model.tax import MatchRecord, TaxPeriod, TaxableRecord
 
 class TestTaxPeriod(unittest.TestCase):
 
@@ -13,3 +15,68 @@ class TestTaxPeriod(unittest.TestCase):
         self.assertEqual(tax_period.tax_year(date(2021, 4, 6)), "2021/2022")
         self.assertEqual(tax_period.tax_year(date(2021, 12, 30)), "2021/2022")
 
+    def test_tax_year_matches_date_comparison(self):
+        tax_period = TaxPeriod("UK", 4, 6, 4, 5)
+
+        start = date(2017, 1, 1)
+        dates = [start + timedelta(days=x) for x in range(365 * 4)]
+        for value in dates:
+            if (value.month, value.day) < (4, 6):
+                expected = f"{value.year - 1}/{value.year}"
+            else:
+                expected = f"{value.year}/{value.year + 1}"
+
+            self.assertEqual(expected, tax_period.tax_year(value))
+            self.assertEqual(int(expected[:4]), tax_period.tax_year_key(value))
+
+        self.assertEqual([tax_period.tax_year(x) for x in dates], tax_period.tax_years(dates))
+        self.assertEqual([tax_period.tax_year_key(x) for x in reversed(dates)],
+                         tax_period.tax_year_keys(reversed(dates)))
+
+    def test_tax_year_of_datetime(self):
+        tax_period = TaxPeriod("UK", 4, 6, 4, 5)
+
+        self.assertEqual("2020/2021", tax_period.tax_year(datetime(2021, 4, 5, 23, 59, tzinfo=timezone.utc)))
+        self.assertEqual("2021/2022", tax_period.tax_year(datetime(2021, 4, 6)))
+
+    def test_tax_year_outside_calendar(self):
+        tax_period = TaxPeriod("UK", 4, 6, 4, 5)
+
+        self.assertEqual("1800/1801", tax_period.tax_year(date(1801, 1, 1)))
+        self.assertEqual("2200/2201", tax_period.tax_year(date(2200, 4, 6)))
+        self.assertEqual("2020/2021", tax_period.tax_year(date(2020, 4, 6)))
+        self.assertEqual(["2199/2200", "1799/1800"], tax_period.tax_years([date(2200, 1, 1), date(1800, 1, 1)]))
+
+    def test_tax_year_of_calendar_year_period(self):
+        tax_period = TaxPeriod("US", 1, 1, 12, 31)
+
+        self.assertEqual("2020", tax_period.tax_year(date(2020, 1, 1)))
+        self.assertEqual("2020", tax_period.tax_year(date(2020, 12, 31)))
+        self.assertEqual(2021, tax_period.tax_year_key(date(2021, 1, 1)))
+
+    def test_labels_are_interned(self):
+        tax_period = TaxPeriod("UK", 4, 6, 4, 5)
+
+        self.assertIs(tax_period.tax_year(date(2021, 1, 1)), tax_period.tax_year(date(2020, 5, 1)))
+
+
+class TestTaxableRecord(unittest.TestCase):
+
+    def test_tax_year_key(self):
+        self.assertEqual(2020, TaxableRecord(date(2021, 1, 1), "2020/2021", "GAIN", Decimal(1)).tax_year_key)
+        self.assertEqual(2020, TaxableRecord(date(2021, 1, 1), "2020", "GAIN", Decimal(1)).tax_year_key)
+        self.assertEqual(7, TaxableRecord(date(2021, 1, 1), "2020/2021", "GAIN", Decimal(1), 7).tax_year_key)
+
+
+
+class TestMatchRecord(unittest.TestCase):
+
+    def test_amount(self):
+        record = MatchRecord('SAME_DAY', datetime(2020, 1, 1), datetime(2020, 1, 1), Decimal(3), Decimal(10),
+                             Decimal('12.5'))
+
+        self.assertEqual(Decimal('7.5'), record.amount())
+
+    def test_rule(self):
+        with self.assertRaises(ValueError):
+            MatchRecord('FIFO', datetime(2020, 1, 1), datetime(2020, 1, 1), Decimal(3), Decimal(10), Decimal(12))
@@ -1,6 +1,11 @@
+import os
 import unittest
+import zlib
+from datetime import datetime
+from decimal import Decimal
 
-from src.model.transaction import Asset
+from config import DATE_TIME_FORMAT
+from src.model.transaction import Asset, Transaction, parse_date_time, transaction_id
 
 
 class TestAsset(unittest.TestCase):
@@ -16,3 +21,46 @@ class TestAsset(unittest.TestCase):
         self.assertNotEqual(Asset('a', 'b', 'c').__hash__(), Asset('b', 'a', 'c').__hash__())
         self.assertNotEqual(Asset('a', 'b', 'c').__hash__(), Asset('b', 'b', 'c').__hash__())
         self.assertNotEqual(Asset('a', 'b', 'c').__hash__(), Asset('a', 'a', 'c').__hash__())
+
+
+class TestTransaction(unittest.TestCase):
+
+    def test_eq(self):
+        asset = Asset('a', 'b', 'c')
+        transaction = Transaction(datetime(2020, 1, 1), 'BUY', asset, Decimal(1), Decimal(2), Decimal(3), 7)
+
+        self.assertEqual(transaction, transaction.copy())
+        self.assertEqual(hash(transaction), hash(transaction.copy()))
+        self.assertNotEqual(transaction,
+                            Transaction(datetime(2020, 1, 1), 'BUY', asset, Decimal(1), Decimal(2), Decimal(3), 8))
+        self.assertNotEqual(transaction,
+                            Transaction(datetime(2020, 1, 1), 'BUY', asset, Decimal(1), Decimal(2), Decimal(4), 7))
+
+    def test_parse_id(self):
+        row = ['2019-09-16T10:15:00Z', 'BUY', 'a', 'b', 'c', '1', '2', '3']
+
+        self.assertEqual(5, Transaction.parse(row, transaction_id=5).transaction_id)
+        self.assertEqual(9, Transaction.parse(row + ['9'], transaction_id=5).transaction_id)
+        self.assertIsNone(Transaction.parse(row).transaction_id)
+
+    def test_transaction_id_fits_int64(self):
+        # crc32 of a.tsv has its high bit set
+        self.assertTrue(zlib.crc32(b'a.tsv') >= 2 ** 31)
+
+        self.assertTrue(transaction_id('a.tsv', 2 ** 32 - 1) < 2 ** 63)
+        self.assertEqual(7, transaction_id(os.path.join('dir', 'a.tsv'), 7) & 0xffffffff)
+        self.assertNotEqual(transaction_id('a.tsv', 7), transaction_id('b.tsv', 7))
+
+
+class TestParseDateTime(unittest.TestCase):
+
+    def test_parse_date_time(self):
+        for value in ['2019-09-16T10:15:00Z', '2019-09-16T10:15:00+0100', '2019-09-16T10:15:00-01:30',
+                      '2019-9-6T1:5:0Z']:
+            self.assertEqual(datetime.strptime(value, DATE_TIME_FORMAT), parse_date_time(value))
+            self.assertEqual(datetime.strptime(value, DATE_TIME_FORMAT).tzinfo, parse_date_time(value).tzinfo)
+
+    def test_parse_date_time_invalid(self):
+        for value in ['2019-09-16T10:15:00', '2019-09-16T10:15:00+01:0x', '2019-13-16T10:15:00Z']:
+            with self.assertRaises(ValueError):
+                parse_date_time(value)